@@ -0,0 +1,430 @@
+# api.py
+# API REST (JSON) sobre ConstructionDB para integraciones (nóminas, RR. HH.)
+#
+# Usage:
+#   python api.py [--host 127.0.0.1] [--port 8503] [--db construction_system.db] [--verbose]
+#   API_TOKEN=secret python api.py          # exige "Authorization: Bearer secret"
+#
+# Endpoints (JSON):
+#   GET    /api/health
+#   GET    /api/sites | /api/employees         ?status=&search=&sort=&desc=1&limit=&columns=&after=
+#   GET    /api/sites/<id> | /api/employees/<id>
+#   POST   /api/sites | /api/employees         -> 201 {"id": ...}
+#   POST   /api/employees/upsert               (por employee_id) -> {"id": ...}
+#   PATCH  /api/sites/<id> | /api/employees/<id>    (If-Match: "<version>" opcional)
+#   DELETE /api/sites/<id> | /api/employees/<id>    (If-Match: "<version>" opcional)
+#   GET    /api/assignments                    {"<site_id>": [employee ids]}
+#   GET    /api/sites/<id>/employees | /api/employees/<id>/sites
+#   PUT    /api/sites/<id>/employees/<emp_id>  (asignar)   DELETE (quitar)
+#   POST   /api/assignments/bulk               {"assign": [[site_id, emp_id], ...], "unassign": [...]}
+#   GET    /metrics                            (Prometheus, ver metrics.py)
+#
+# Las lecturas llevan ETag W/"<data_version>": con If-None-Match la respuesta
+# es 304 sin cuerpo mientras nada haya cambiado. Las respuestas grandes van
+# con gzip si el cliente lo acepta.
+import argparse
+import base64
+import gzip
+import hmac
+import json
+import os
+import re
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from database import ConstructionDB, ConflictError, TABLE_COLUMNS
+from metrics import API_REQUEST_SECONDS, ASSIGNMENTS, registry
+
+API_PORT = 8503
+# Tamaño de página por defecto y máximo de los listados
+PAGE_SIZE = 50
+PAGE_SIZE_MAX = 500
+# Pares por llamada a /api/assignments/bulk
+BULK_MAX = 1000
+MAX_BODY_BYTES = 1024 * 1024
+# Por debajo de este tamaño gzip no compensa
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+TABLES = {"sites": "construction_sites", "employees": "employees"}
+
+
+class APIError(Exception):
+    """Error de la petición: se responde con status y {"error": message}"""
+
+    def __init__(self, status: int, message: str, **extra):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message, **extra}
+
+
+def encode_cursor(next_key) -> Optional[str]:
+    """Clave de paginación (sort, id) como cursor opaco para ?after="""
+    if next_key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(next_key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise APIError(400, "Invalid cursor")
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    # Comparación débil: W/"5" y "5" son la misma versión
+    return "*" in candidates or etag.lstrip("W/") in (c.lstrip("W/") for c in candidates)
+
+
+def _int_param(params: Dict[str, str], name: str, default: int, minimum: int, maximum: int) -> int:
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise APIError(400, f"{name} must be an integer")
+    if not minimum <= value <= maximum:
+        raise APIError(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def _pairs(items, field: str) -> list:
+    """[[site_id, emp_id], ...] o [{"site_id": .., "employee_id": ..}, ...] -> [(int, int)]"""
+    if not isinstance(items, list):
+        raise APIError(400, f"{field} must be a list")
+    pairs = []
+    for item in items:
+        try:
+            if isinstance(item, dict):
+                pairs.append((int(item["site_id"]), int(item["employee_id"])))
+            else:
+                site_id, emp_id = item
+                pairs.append((int(site_id), int(emp_id)))
+        except (KeyError, TypeError, ValueError):
+            raise APIError(400, f"Invalid {field} item: {item!r}")
+    return pairs
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """Una petición; la base de datos y el token viven en el servidor (APIServer)"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive: los integradores reutilizan la conexión
+    server_version = "ConstructionAPI/1.0"
+    # Cabeceras y cuerpo van en dos write(): sin TCP_NODELAY, Nagle + ACK
+    # retardado añaden ~40 ms a cada respuesta en una conexión keep-alive
+    disable_nagle_algorithm = True
+
+    # Tabla de rutas: (método, patrón, manejador)
+    ROUTES = [
+        ("GET", r"/api/health", "health"),
+        ("GET", r"/metrics", "metrics"),
+        ("GET", r"/api/(sites|employees)", "list_records"),
+        ("POST", r"/api/employees/upsert", "upsert_employee"),
+        ("POST", r"/api/(sites|employees)", "create_record"),
+        ("GET", r"/api/(sites|employees)/(\d+)", "get_record"),
+        ("PATCH", r"/api/(sites|employees)/(\d+)", "update_record"),
+        ("DELETE", r"/api/(sites|employees)/(\d+)", "delete_record"),
+        ("GET", r"/api/assignments", "list_assignments"),
+        ("GET", r"/api/sites/(\d+)/employees", "site_employees"),
+        ("GET", r"/api/employees/(\d+)/sites", "employee_sites"),
+        ("PUT", r"/api/sites/(\d+)/employees/(\d+)", "assign"),
+        ("DELETE", r"/api/sites/(\d+)/employees/(\d+)", "unassign"),
+        ("POST", r"/api/assignments/bulk", "bulk_assignments"),
+    ]
+    COMPILED_ROUTES = [(method, re.compile(pattern + "$"), name) for method, pattern, name in ROUTES]
+
+    @property
+    def db(self) -> ConstructionDB:
+        return self.server.db
+
+    # ========== DESPACHO ==========
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def do_HEAD(self):
+        # Como GET (mismas rutas, cabeceras y ETag); _send omite el cuerpo
+        self._dispatch("GET")
+
+    def _dispatch(self, method: str):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        self.params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = "unmatched"
+        status = 500
+        self.body_read = False
+        try:
+            handler, args = None, ()
+            path_exists = False
+            for route_method, pattern, name in self.COMPILED_ROUTES:
+                match = pattern.match(url.path)
+                if match:
+                    path_exists = True
+                    if route_method == method:
+                        handler, args, route = getattr(self, name), match.groups(), name
+                        break
+            if handler is None:
+                raise APIError(405 if path_exists else 404, "Method not allowed" if path_exists else "Not found")
+            self._check_token()
+            status = handler(*args)
+        except APIError as e:
+            status = self._send_json(e.status, e.payload)
+        except ConflictError as e:
+            status = self._send_json(409, {"error": str(e), "current": e.current})
+        except ValueError as e:
+            status = self._send_json(400, {"error": str(e)})
+        except Exception as e:  # noqa: BLE001 - nunca tumbar el hilo del servidor
+            self.log_error("Unhandled error on %s %s: %r", method, self.path, e)
+            status = self._send_json(500, {"error": "Internal server error"})
+        finally:
+            API_REQUEST_SECONDS.observe(time.perf_counter() - start, self.command, route, str(status))
+
+    def _check_token(self):
+        token = self.server.token
+        if token is None or self.path.startswith("/api/health"):
+            return
+        header = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+            raise APIError(401, "Missing or invalid API token")
+
+    # ========== PETICIÓN / RESPUESTA ==========
+    def _content_length(self) -> int:
+        try:
+            return int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return -1
+
+    def _read_json(self):
+        length = self._content_length()
+        if length < 0:
+            raise APIError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise APIError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        raw = self.rfile.read(length) if length else b""
+        self.body_read = True
+        try:
+            data = json.loads(raw or b"{}")
+        except ValueError:
+            raise APIError(400, "Body must be valid JSON")
+        if not isinstance(data, dict):
+            raise APIError(400, "Body must be a JSON object")
+        return data
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> int:
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        if not self.body_read and self._content_length():
+            # Error antes de leer el cuerpo: sus bytes siguen en el socket y
+            # la conexión ya no se puede reutilizar
+            self.close_connection = True
+            headers = dict(headers or {}, Connection="close")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Vary", "Accept-Encoding")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        return status
+
+    def _send_json(self, status: int, payload: Any, etag: Optional[str] = None) -> int:
+        headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+        body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+        return self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def _read_versioned(self, reader):
+        """
+        GET con ETag: 304 si If-None-Match coincide con la versión actual; si
+        no, reader() y 200. La versión se lee antes que los datos: el ETag
+        nunca es más nuevo que el cuerpo (a lo sumo el cliente vuelve a pedir).
+        """
+        etag = f'W/"{self.db.data_version()}"'
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return 304
+        return self._send_json(200, reader(), etag)
+
+    def _expected_version(self) -> Optional[int]:
+        header = self.headers.get("If-Match")
+        if header is None:
+            return None
+        try:
+            return int(header.strip().lstrip("W/").strip('"'))
+        except ValueError:
+            raise APIError(400, 'If-Match must be the record version, e.g. "3"')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # ========== MANEJADORES ==========
+    def health(self):
+        return self._send_json(200, {"status": "ok", "data_version": self.db.data_version()})
+
+    def metrics(self):
+        return self._send(200, registry.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+    def list_records(self, resource):
+        params = self.params
+        table = TABLES[resource]
+        columns = params["columns"].split(",") if params.get("columns") else None
+        sort = params.get("sort", "id")
+        if sort not in TABLE_COLUMNS[table]:
+            raise APIError(400, f"sort must be one of {', '.join(TABLE_COLUMNS[table])}")
+        query = self.db.query_sites if resource == "sites" else self.db.query_employees
+        kwargs = {
+            "status": params.get("status"),
+            "search": params.get("search"),
+            "sort": sort,
+            "columns": columns,
+            "after_key": decode_cursor(params["after"]) if params.get("after") else None,
+            "limit": _int_param(params, "limit", PAGE_SIZE, 1, PAGE_SIZE_MAX),
+            "descending": params.get("desc") in ("1", "true"),
+        }
+
+        def reader():
+            page = query(**kwargs)
+            return {"items": page["rows"], "total": page["total"], "next": encode_cursor(page["next_key"])}
+
+        return self._read_versioned(reader)
+
+    def get_record(self, resource, record_id):
+        getter = self.db.get_site_by_id if resource == "sites" else self.db.get_employee_by_id
+        record = getter(int(record_id))
+        if record is None:
+            raise APIError(404, f"{resource[:-1].capitalize()} {record_id} not found")
+        return self._send_json(200, record, etag=f'"{record["version"]}"')
+
+    def create_record(self, resource):
+        data = self._read_json()
+        creator = self.db.create_site if resource == "sites" else self.db.create_employee
+        return self._send_json(201, {"id": creator(data)})
+
+    def upsert_employee(self):
+        return self._send_json(200, {"id": self.db.upsert_employee(self._read_json())})
+
+    def update_record(self, resource, record_id):
+        data = self._read_json()
+        updater = self.db.update_site if resource == "sites" else self.db.update_employee
+        if not updater(int(record_id), data, expected_version=self._expected_version()):
+            raise APIError(404, f"{resource[:-1].capitalize()} {record_id} not found")
+        return self.get_record(resource, record_id)
+
+    def delete_record(self, resource, record_id):
+        deleter = self.db.delete_site if resource == "sites" else self.db.delete_employee
+        if not deleter(int(record_id), expected_version=self._expected_version()):
+            raise APIError(404, f"{resource[:-1].capitalize()} {record_id} not found")
+        return self._send_json(200, {"deleted": int(record_id)})
+
+    def list_assignments(self):
+        return self._read_versioned(lambda: {str(site): emps for site, emps in self.db.get_all_assignments().items()})
+
+    def site_employees(self, site_id):
+        return self._read_versioned(lambda: {"site_id": int(site_id),
+                                             "employee_ids": self.db.get_assignments_for_site(int(site_id))})
+
+    def employee_sites(self, emp_id):
+        return self._read_versioned(lambda: {"employee_id": int(emp_id),
+                                             "site_ids": self.db.get_sites_for_employee(int(emp_id))})
+
+    def assign(self, site_id, emp_id):
+        changed = self.db.assign_employee_to_site(int(site_id), int(emp_id))
+        return self._send_json(201 if changed else 200, {"assigned": changed})
+
+    def unassign(self, site_id, emp_id):
+        return self._send_json(200, {"removed": self.db.remove_assignment(int(site_id), int(emp_id))})
+
+    def bulk_assignments(self):
+        data = self._read_json()
+        assign = _pairs(data.get("assign", []), "assign")
+        unassign = _pairs(data.get("unassign", []), "unassign")
+        if len(assign) + len(unassign) > BULK_MAX:
+            raise APIError(413, f"At most {BULK_MAX} pairs per request")
+        result = self.db.bulk_assignments(assign=assign, remove=unassign)
+        for action, flags in (("assign", result["assigned"]), ("unassign", result["removed"])):
+            changed = sum(flags)
+            if changed:
+                ASSIGNMENTS.inc(action, "changed", amount=changed)
+            if len(flags) - changed:
+                ASSIGNMENTS.inc(action, "unchanged", amount=len(flags) - changed)
+        return self._send_json(200, {**result, "data_version": self.db.data_version()})
+
+
+class APIServer(ThreadingHTTPServer):
+    """Servidor multihilo: cada petición en su hilo, todas con el mismo ConstructionDB (pool)"""
+
+    daemon_threads = True
+
+    def __init__(self, address, db: ConstructionDB, token: Optional[str] = None, verbose: bool = False):
+        super().__init__(address, APIHandler)
+        self.db = db
+        self.token = token
+        self.verbose = verbose
+
+
+def create_server(host: str = "127.0.0.1", port: int = API_PORT, db_path: str = "construction_system.db",
+                  token: Optional[str] = None, verbose: bool = False) -> APIServer:
+    """
+    API server over db_path (port 0 = any free port, see server.server_address).
+
+    Raises:
+        FileNotFoundError: db_path does not exist (ConstructionDB would create
+            and seed a new database and serve it)
+    """
+    if not os.path.isfile(db_path):
+        raise FileNotFoundError(f"Database not found: {db_path}")
+    db = ConstructionDB(db_path, assignment_index=True)
+    return APIServer((host, port), db, token=token, verbose=verbose)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="REST API over the construction database")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=API_PORT, help="Port to listen on")
+    parser.add_argument("--db", default="construction_system.db", help="SQLite database file")
+    parser.add_argument("--verbose", action="store_true", help="Log every request to stderr")
+    args = parser.parse_args(argv)
+
+    try:
+        server = create_server(args.host, args.port, args.db, token=os.environ.get("API_TOKEN"), verbose=args.verbose)
+    except FileNotFoundError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    host, port = server.server_address[:2]
+    print(f"Construction API on http://{host}:{port}/api (db: {args.db})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,16 @@
 # app.py - CONSTRUCTION MANAGEMENT SYSTEM
 import streamlit as st
 from datetime import datetime
+import importlib
+import os
 import time
 from database import ConstructionDB
+from instrumentation import diagnostics_admin, monitor
+import metrics
+from startup import StartupPipeline
 
 # IMPORTAR UI HELPERS
-from ui_helpers import render_page_header, render_system_info_sidebar, apply_global_styles
+from ui_helpers import render_page_header, render_system_info_sidebar, reset_stylesheets, inject_stylesheet, monitored_rerun
 
 # ========== CONFIGURACIÓN ==========
 st.set_page_config(
@@ -15,195 +20,122 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# APLICAR ESTILOS GLOBALES
-apply_global_styles()
+# ========== ESTILOS (UNA SOLA HOJA POR RERUN) ==========
+# Hojas de assets/styles.css que necesita cada página; se envían juntas en un
+# único <style> y las llamadas posteriores de los módulos no reenvían nada.
+PAGE_STYLESHEETS = {
+    "Assignment Board": ["kanban"],
+    "Construction Sites": ["construction_sites"],
+    "Employees": ["employees"],
+    "Reports": ["reports"],
+    "Diagnostics": [],
+}
+
+reset_stylesheets()
+inject_stylesheet("global", "app_shell", *PAGE_STYLESHEETS.get(st.session_state.get('selected_page', 'Assignment Board'), []))
 
 
 # ========== INICIALIZAR BASE DE DATOS ==========
-@st.cache_resource
-def init_database():
-    return ConstructionDB()
+def warm_caches(results):
+    """Prime SQLite page cache and the data paths used by the first render"""
+    db = results["database"]
+    db.get_counts()
+    db.get_sites(status="Active", columns=["id", "name", "manager"])
+    db.get_employees(status="Active", columns=["id", "employee_id"])
+    db.get_assigned_employee_ids()  # carga el índice de asignaciones en memoria
+    return True
 
 
-db = init_database()
+def start_metrics_exporter(results):
+    """Prometheus endpoint (GET /metrics) on METRICS_PORT; METRICS_PORT=0 disables it"""
+    port = int(os.environ.get("METRICS_PORT", metrics.METRICS_PORT))
+    return metrics.start_http_server(port) if port else None
 
 
-# ========== LOADING SCREEN ==========
-def show_cool_loading_screen():
-    st.markdown("""
-    <style>
-    /* OCULTAR TODOS LOS ELEMENTOS DE STREAMLIT */
-    #MainMenu {visibility: hidden;}
-    header {visibility: hidden;}
-    footer {visibility: hidden;}
-
-    /* PANTALLA COMPLETA DE CARGA */
-    .loading-fullscreen {
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        justify-content: center;
-        z-index: 9999;
-        color: white;
-    }
-
-    /* MENSAJE DE BIENVENIDA */
-    .welcome-message {
-        font-size: 36px;
-        font-weight: 700;
-        margin-bottom: 10px;
-        text-align: center;
-        background: linear-gradient(135deg, #ffffff, #f0f0f0);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.2);
-    }
-
-    .welcome-subtitle {
-        font-size: 18px;
-        font-weight: 300;
-        margin-bottom: 40px;
-        text-align: center;
-        opacity: 0.9;
-    }
-
-    .pulse-container { 
-        display: flex; 
-        justify-content: center; 
-        align-items: center; 
-        margin: 30px 0; 
-    }
-
-    .pulse-circle {
-        width: 100px; 
-        height: 100px; 
-        background: white; 
-        border-radius: 50%; 
-        position: relative;
-        animation: pulse 2s infinite; 
-        display: flex; 
-        align-items: center; 
-        justify-content: center;
-        font-size: 50px; 
-        color: #764ba2;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-    }
-
-    .pulse-circle::before, .pulse-circle::after {
-        content: ''; 
-        position: absolute; 
-        border: 2px solid white; 
-        border-radius: 50%;
-        width: 100%; 
-        height: 100%; 
-        animation: ripple 2s infinite;
-        opacity: 0.7;
-    }
-
-    .pulse-circle::after { 
-        animation-delay: 0.5s; 
-    }
-
-    @keyframes pulse { 
-        0% { 
-            transform: scale(0.95); 
-            box-shadow: 0 0 0 0 rgba(255,255,255,0.7); 
-        }
-        70% { 
-            transform: scale(1); 
-            box-shadow: 0 0 0 30px rgba(255,255,255,0); 
-        }
-        100% { 
-            transform: scale(0.95); 
-            box-shadow: 0 0 0 0 rgba(255,255,255,0); 
-        } 
-    }
-
-    @keyframes ripple { 
-        0% { 
-            transform: scale(1); 
-            opacity: 1; 
-        } 
-        100% { 
-            transform: scale(2); 
-            opacity: 0; 
-        } 
-    }
-
-    .loading-text { 
-        font-size: 20px; 
-        font-weight: 300; 
-        margin-top: 30px; 
-        text-align: center; 
-        opacity: 0.8;
-    }
-
-    .progress-container { 
-        width: 400px; 
-        height: 6px; 
-        background: rgba(255,255,255,0.2); 
-        border-radius: 3px; 
-        margin-top: 30px; 
-        overflow: hidden; 
-    }
-
-    .progress-bar { 
-        height: 100%; 
-        background: linear-gradient(90deg, #ffffff, #f0f0f0); 
-        width: 0%; 
-        border-radius: 3px; 
-        animation: progress 2.5s ease-in-out; 
-    }
-
-    @keyframes progress { 
-        0% { 
-            width: 0%; 
-        } 
-        100% { 
-            width: 100%; 
-        } 
-    }
-
-    /* OCULTAR CONTENIDO MIENTRAS CARGA */
-    .app-content {
-        display: none;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+def start_report_scheduler(results):
+    """Scheduled report jobs (scheduler.py) in background threads; SCHEDULER_ENABLED=0 disables it"""
+    if os.environ.get("SCHEDULER_ENABLED", "1") == "0":
+        return None
+    from scheduler import Scheduler
+    return Scheduler(results["database"]).start()
 
-    # PANTALLA DE CARGA CON MENSAJE DE BIENVENIDA
-    st.markdown("""
-    <div class='loading-fullscreen'>
-        <div class='welcome-message'>🚧 Construction Management System</div>
-        <div class='welcome-subtitle'>Professional Site & Employee Management</div>
-        <div class='pulse-container'>
-            <div class='pulse-circle'>🏗️</div>
-        </div>
-        <div class='loading-text'>Initializing system components...</div>
-        <div class='progress-container'>
-            <div class='progress-bar'></div>
-        </div>
-        <div style='margin-top: 20px; font-size: 12px; opacity: 0.6;'>
-            Loading sites, employees and assignments...
+
+@st.cache_resource
+def get_startup_pipeline():
+    """Startup work shared by all sessions, executed in a background thread"""
+    pipeline = StartupPipeline()
+    pipeline.add_stage("database", lambda results: ConstructionDB(assignment_index=True), "Initializing database...")
+    pipeline.add_stage("warm_caches", warm_caches, "Loading sites, employees and assignments...")
+    # Etapas opcionales: si fallan, la app arranca sin ellas
+    pipeline.add_stage("metrics", start_metrics_exporter, "Starting metrics exporter...", optional=True)
+    pipeline.add_stage("scheduler", start_report_scheduler, "Starting report scheduler...", optional=True)
+    return pipeline.start()
+
+
+# ========== LOADING SCREEN ==========
+def show_cool_loading_screen(pipeline):
+    """Show the loading screen only while the startup pipeline has pending work"""
+    loading = st.empty()
+    with loading.container():
+        inject_stylesheet("loading")
+        body = st.empty()
+
+    while not pipeline.wait(timeout=0.05):
+        completed, total, current = pipeline.progress()
+        percent = int(completed * 100 / total) if total else 100
+        body.markdown(f"""
+        <div class='loading-fullscreen'>
+            <div class='welcome-message'>🚧 Construction Management System</div>
+            <div class='welcome-subtitle'>Professional Site & Employee Management</div>
+            <div class='pulse-container'>
+                <div class='pulse-circle'>🏗️</div>
+            </div>
+            <div class='loading-text'>{current or "Initializing system components..."}</div>
+            <div class='progress-container'>
+                <div class='progress-bar' style='width: {percent}%;'></div>
+            </div>
+            <div style='margin-top: 20px; font-size: 12px; opacity: 0.6;'>
+                Step {min(completed + 1, total)} of {total}
+            </div>
         </div>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
+    loading.empty()
 
-    # Esperar 3 segundos
-    time.sleep(3)
 
+startup = get_startup_pipeline()
 
-# ========== IMPORTAR MÓDULOS ==========
-from construction_module import show_construction_site
-from employees_module import show_employees
-from report_module import show_report_generator
+if not startup.done:
+    session_wait_start = time.perf_counter()
+    show_cool_loading_screen(startup)
+    st.session_state.startup_wait_ms = round((time.perf_counter() - session_wait_start) * 1000, 1)
+
+if startup.failed:
+    # No dejar el fallo en caché (p. ej. base de datos bloqueada): el siguiente rerun reintenta
+    get_startup_pipeline.clear()
+    st.error(f"❌ Startup failed: {startup.error}")
+    if st.button("🔄 Retry"):
+        st.rerun()
+    st.stop()
+
+db = startup.result("database")
+
+
+# ========== MÓDULOS DE PÁGINA (CARGA DIFERIDA) ==========
+# Cada página se importa en su primera navegación: pandas, streamlit_searchbox,
+# smtplib/email y openpyxl solo se cargan cuando la página que los usa se abre.
+PAGE_MODULES = {
+    "Construction Sites": ("construction_module", "show_construction_site"),
+    "Employees": ("employees_module", "show_employees"),
+    "Reports": ("report_module", "show_report_generator"),
+    "Diagnostics": ("diagnostics_module", "show_diagnostics"),
+}
+
+
+def load_page(page):
+    """Import the page module on first navigation and return its view function"""
+    module_name, func_name = PAGE_MODULES[page]
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)
 
 
 # ========== KANBAN BOARD PRINCIPAL ==========
@@ -218,11 +150,11 @@ def show_kanban_board():
 
     # ========== FILTROS SOLO ACTIVOS ==========
     # SOLO sitios ACTIVOS para el Kanban
-    sites = [s for s in db.get_sites() if s.get("status") == "Active" and s.get("id") is not None]
+    sites = [s for s in db.get_sites(status="Active", columns=["id", "name", "manager"]) if s.get("id") is not None]
 
     # SOLO empleados ACTIVOS para el Kanban
-    all_employees = db.get_employees()
-    employees = [e for e in all_employees if e.get("status") == "Active" and e.get("id") is not None]
+    all_employees = db.get_employees(status="Active", columns=["id", "employee_id"])
+    employees = [e for e in all_employees if e.get("id") is not None]
 
     if not sites:
         st.warning("⚠️ No active construction sites available.")
@@ -232,66 +164,7 @@ def show_kanban_board():
         return
 
     # CSS con hover y estilo profesional
-    st.markdown("""
-    <style>
-    .kanban-container { display: flex; gap: 15px; overflow-x: auto; padding: 10px 0; }
-    .kanban-column { flex: 1; min-width: 250px; background: #f8f9fa; border-radius: 12px; padding: 15px; border: 2px solid #e9ecef; display: flex; flex-direction: column; }
-    .available-column { background: #f0f7ff; border: 2px dashed #1E88E5; }
-    .employee-card-compact {
-        display: flex; justify-content: space-between; align-items: center;
-        background: white; border-radius: 8px; padding: 8px 10px; margin: 4px 0;
-        border-left: 4px solid #4CAF50; box-shadow: 0 1px 3px rgba(0,0,0,0.08);
-        transition: all 0.25s ease;
-    }
-    .employee-card-compact:hover { transform: translateY(-2px); box-shadow: 0 4px 12px rgba(0,0,0,0.15); }
-    .assigned-employee-card { border-left: 4px solid #1E88E5; }
-    .employee-info { display: flex; align-items: center; gap: 8px; }
-    .remove-x {
-        background: #f44336 !important; color: white !important;
-        border-radius: 50% !important; width: 28px !important; height: 28px !important;
-        font-size: 16px !important; line-height: 28px !important; padding: 0 !important;
-        min-width: unset !important; border: none !important;
-    }
-    .remove-x:hover { background: #d32f2f !important; transform: scale(1.1); }
-    .site-buttons-row { display: flex; flex-wrap: wrap; gap: 6px; margin-top: 8px; }
-    .site-header {
-        text-align: center; padding: 12px; border-radius: 10px; margin-bottom: 15px;
-        border-bottom: 3px solid; min-height: 100px; display: flex; flex-direction: column;
-        justify-content: center; transition: all 0.3s ease;
-    }
-    .site-header:hover { transform: translateY(-2px); box-shadow: 0 4px 12px rgba(0,0,0,0.1); }
-    .available-header { background: linear-gradient(135deg, #e8f5e9, #c8e6c9); border-bottom-color: #4CAF50; }
-    .site-name { font-size: 15px; font-weight: 600; margin: 0; line-height: 1.3; }
-    .site-manager { font-size: 12px; color: #555; margin: 4px 0 0 0; }
-    .site-id { font-size: 10px; color: #777; background: #f0f0f0; padding: 2px 6px; border-radius: 4px; margin-top: 4px; display: inline-block; }
-    .employee-name { font-size: 13px; font-weight: 600; color: #222; }
-    .employee-id { font-size: 11px; color: #666; background: #f5f5f5; padding: 2px 6px; border-radius: 6px; }
-    .assign-button { background: #2196F3 !important; color: white !important; font-size: 13px !important; padding: 4px 10px !important; }
-    .assign-button:hover { background: #1976D2 !important; }
-    .refresh-button { 
-        background: linear-gradient(135deg, #42A5F5, #2196F3) !important;
-        color: white !important; 
-        border: none !important;
-        font-weight: 600 !important;
-    }
-    .refresh-button:hover { 
-        background: linear-gradient(135deg, #2196F3, #1976D2) !important; 
-        transform: translateY(-1px);
-        box-shadow: 0 4px 12px rgba(33, 150, 243, 0.3) !important;
-    }
-    .report-button { 
-        background: linear-gradient(135deg, #1E88E5, #1565C0) !important;
-        color: white !important; 
-        border: none !important;
-        font-weight: 600 !important;
-    }
-    .report-button:hover { 
-        background: linear-gradient(135deg, #1565C0, #0D47A1) !important; 
-        transform: translateY(-1px);
-        box-shadow: 0 4px 12px rgba(21, 101, 192, 0.3) !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    inject_stylesheet("kanban")
 
     columns = st.columns(len(sites) + 1)
 
@@ -304,14 +177,8 @@ def show_kanban_board():
         </div>
         """, unsafe_allow_html=True)
 
-        # Obtener TODAS las asignaciones de TODOS los sitios (activos e inactivos)
-        all_assigned_ids = set()
-        all_sites_in_db = db.get_sites()  # Todos los sitios (activos e inactivos)
-
-        for site in all_sites_in_db:
-            site_id = site.get("id")
-            if site_id:
-                all_assigned_ids.update(db.get_assignments_for_site(site_id))
+        # Empleados asignados a CUALQUIER sitio (activos e inactivos), desde el índice en memoria
+        all_assigned_ids = db.get_assigned_employee_ids()
 
         # Solo empleados ACTIVOS que NO estén asignados a NINGÚN sitio
         avail = [e for e in employees if e["id"] not in all_assigned_ids]
@@ -502,7 +369,7 @@ def render_sidebar():
 
         # Navegación
         st.markdown("### 🧭 Navigation")
-        pages = ["Assignment Board", "Construction Sites", "Employees", "Reports"]
+        pages = ["Assignment Board", "Construction Sites", "Employees", "Reports", "Diagnostics"]
         sel = st.selectbox("Go to:", pages,
                            index=pages.index(st.session_state.get('selected_page', pages[0])),
                            label_visibility="collapsed")
@@ -517,11 +384,21 @@ def render_sidebar():
         st.markdown("### 📊 System Info")
         st.markdown(render_system_info_sidebar(), unsafe_allow_html=True)
 
-        # Información adicional del sistema
-        total_sites = len(db.get_sites())
-        active_sites = len([s for s in db.get_sites() if s.get("status") == "Active"])
-        total_employees = len(db.get_employees())
-        active_employees = len([e for e in db.get_employees() if e.get("status") == "Active"])
+        # Tiempos de arranque reales
+        with st.expander("⏱️ Startup timing"):
+            for stage, ms in startup.timings().items():
+                st.caption(f"{stage}: {ms} ms")
+            for stage, error in startup.stage_errors().items():
+                st.caption(f"⚠️ {stage} failed: {error}")
+            if 'startup_wait_ms' in st.session_state:
+                st.caption(f"session wait: {st.session_state.startup_wait_ms} ms")
+
+        # Información adicional del sistema (una sola consulta agregada)
+        counts = db.get_counts()
+        total_sites = counts["sites"]["total"]
+        active_sites = counts["sites"]["Active"]
+        total_employees = counts["employees"]["total"]
+        active_employees = counts["employees"]["Active"]
 
         st.markdown(f"""
         <div style='
@@ -546,55 +423,17 @@ def render_sidebar():
 
 
 def main():
-    # ========== PANTALLA DE CARGA INICIAL ==========
+    # ========== BIENVENIDA (SIN ESPERAS ARTIFICIALES) ==========
     if 'initial_loaded' not in st.session_state:
-        # Mostrar pantalla de carga completa
-        show_cool_loading_screen()
         st.session_state.initial_loaded = True
-
-        # Mostrar mensaje de bienvenida después de cargar
-        welcome_msg = st.empty()
-        welcome_msg.success("✅ Sistema cargado exitosamente | Construction Management System")
-        time.sleep(1.5)
-        welcome_msg.empty()
-
-        st.rerun()
+        st.toast("✅ Sistema cargado exitosamente | Construction Management System")
 
     # ========== SIDEBAR ==========
     render_sidebar()
 
     # ========== MOSTRAR CONTENIDO PRINCIPAL ==========
     # Agregar CSS para mostrar contenido después de cargar
-    st.markdown("""
-    <style>
-    /* Mostrar contenido después de cargar */
-    .app-content {
-        display: block !important;
-        animation: fadeIn 0.5s ease-in;
-    }
-
-    @keyframes fadeIn {
-        from { opacity: 0; }
-        to { opacity: 1; }
-    }
-
-    /* Mejorar botones Refresh y Report */
-    div[data-testid="stButton"] > button[kind="secondary"] {
-        background: linear-gradient(135deg, #42A5F5, #2196F3) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        border-radius: 8px !important;
-        transition: all 0.3s ease !important;
-    }
-
-    div[data-testid="stButton"] > button[kind="secondary"]:hover {
-        background: linear-gradient(135deg, #2196F3, #1976D2) !important;
-        transform: translateY(-2px) !important;
-        box-shadow: 0 4px 8px rgba(33, 150, 243, 0.3) !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    inject_stylesheet("app_shell")
 
     # Envolver contenido principal en div para control de visibilidad
     st.markdown('<div class="app-content">', unsafe_allow_html=True)
@@ -611,7 +450,7 @@ def main():
             "Manage your construction sites and projects",
             icon="🏗️"
         ), unsafe_allow_html=True)
-        show_construction_site(db)
+        load_page("Construction Sites")(db)
 
     elif page == "Employees":
         st.markdown(render_page_header(
@@ -619,7 +458,7 @@ def main():
             "Manage employee information and assignments",
             icon="👷"
         ), unsafe_allow_html=True)
-        show_employees(db)
+        load_page("Employees")(db)
 
     elif page == "Reports":
         st.markdown(render_page_header(
@@ -627,7 +466,15 @@ def main():
             "Generate reports and analytics",
             icon="📄"
         ), unsafe_allow_html=True)
-        show_report_generator(db)
+        load_page("Reports")(db)
+
+    elif page == "Diagnostics":
+        st.markdown(render_page_header(
+            "Diagnostics",
+            "Rerun times, queries, caches and payloads of this server",
+            icon="🩺"
+        ), unsafe_allow_html=True)
+        load_page("Diagnostics")(db)
 
     # Cerrar div del contenido
     st.markdown('</div>', unsafe_allow_html=True)
@@ -651,5 +498,21 @@ def main():
     """, unsafe_allow_html=True)
 
 
+def profiling_requested():
+    """?profile=1 in the URL or the toggle of the Diagnostics page (this session), admin only"""
+    if not diagnostics_admin():
+        return False  # perfilar escribe en disco del servidor: solo con DIAGNOSTICS_ADMIN=1
+    return st.query_params.get("profile") == "1" or st.session_state.get("profile_reruns", False)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    current_page = st.session_state.get('selected_page', 'Assignment Board')
+    # Duración, llamadas a ConstructionDB, SQL y payloads de este rerun (página Diagnostics)
+    with monitored_rerun(monitor, current_page):
+        if profiling_requested():
+            # Carga diferida: sin perfilado no se importa ni se ejecuta nada de profiling.py
+            from profiling import profile_run
+            with profile_run(current_page):
+                main()
+        else:
+            main()
@@ -0,0 +1,138 @@
+# async_database.py
+# Fachada asíncrona de ConstructionDB (informes, email, API...)
+import asyncio
+import copy
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from database import ConstructionDB
+
+
+# Métodos de solo lectura: las llamadas idénticas concurrentes se agrupan en una
+READ_METHODS = (
+    "get_counts", "data_version",
+    "query_sites", "query_employees",
+    "get_sites", "get_site_by_id",
+    "get_employees", "get_employee_by_id",
+    "get_assignments_for_site", "get_all_assignments",
+    "get_sites_for_employee", "get_assigned_employee_ids",
+)
+
+# Métodos que escriben: nunca se agrupan e invalidan las lecturas en curso
+WRITE_METHODS = (
+    "create_site", "update_site", "delete_site",
+    "create_employee", "update_employee", "upsert_employee", "bulk_upsert_employees", "delete_employee",
+    "assign_employee_to_site", "remove_assignment", "bulk_assignments",
+    "reset_database",
+)
+
+
+def _freeze(value):
+    """Clave hashable para los argumentos de una lectura (listas -> tuplas)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class AsyncConstructionDB:
+    """
+    Los métodos de ConstructionDB como corrutinas.
+
+    Las llamadas se ejecutan en un pool de hilos dedicado (sqlite3 libera el
+    GIL mientras consulta, así que las lecturas avanzan en paralelo) y nunca
+    bloquean el event loop.
+
+    - Cola acotada: como mucho max_pending llamadas en vuelo; el resto espera
+      su turno en el loop (back-pressure) en lugar de acumular hilos.
+    - Agrupación: lecturas idénticas (mismo método y argumentos) lanzadas
+      mientras otra igual está en curso esperan ese mismo resultado. Cada
+      escritura termina el grupo, así una lectura posterior a una escritura
+      nunca recibe datos anteriores a ella.
+
+    Uso:
+        async with AsyncConstructionDB() as adb:
+            sites = await adb.get_sites(status="Active")
+    """
+
+    def __init__(self, db: Optional[ConstructionDB] = None, db_path: str = "construction_system.db",
+                 max_workers: int = 4, max_pending: int = 64):
+        self.db = db if db is not None else ConstructionDB(db_path)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="construction-db")
+        self._slots = None  # asyncio.Semaphore, creado en el loop que lo usa
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._stats = {"calls": 0, "coalesced": 0, "executed": 0}
+
+    async def _run(self, name: str, args: tuple, kwargs: dict):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            self._stats["executed"] += 1
+            loop = asyncio.get_running_loop()
+            call = functools.partial(getattr(self.db, name), *args, **kwargs)
+            return await loop.run_in_executor(self._executor, call)
+
+    async def _read(self, name: str, args: tuple, kwargs: dict):
+        self._stats["calls"] += 1
+        try:
+            key = (name, _freeze(args), _freeze(kwargs))
+            hash(key)
+        except TypeError:
+            return await self._run(name, args, kwargs)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            # Copia: quien agrupa no debe ver las modificaciones de otro llamador
+            return copy.deepcopy(await asyncio.shield(pending))
+
+        future = asyncio.ensure_future(self._run(name, args, kwargs))
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _write(self, name: str, args: tuple, kwargs: dict):
+        self._stats["calls"] += 1
+        try:
+            return await self._run(name, args, kwargs)
+        finally:
+            # Las lecturas que empiecen a partir de aquí no se agrupan con las anteriores
+            self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Llamadas recibidas, agrupadas y ejecutadas realmente en el pool"""
+        return dict(self._stats, pending=len(self._inflight))
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def _async_method(name: str, read: bool):
+    sync_method = getattr(ConstructionDB, name)
+
+    @functools.wraps(sync_method)
+    async def method(self, *args, **kwargs):
+        if read:
+            return await self._read(name, args, kwargs)
+        return await self._write(name, args, kwargs)
+
+    return method
+
+
+for _name in READ_METHODS:
+    setattr(AsyncConstructionDB, _name, _async_method(_name, read=True))
+for _name in WRITE_METHODS:
+    setattr(AsyncConstructionDB, _name, _async_method(_name, read=False))
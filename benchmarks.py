@@ -0,0 +1,859 @@
+# benchmarks.py
+# Performance benchmarks for Construction Management System
+#
+# Usage:
+#   python benchmarks.py importtime [--repeat 5] [--output results.json] [--baseline old.json]
+#   python benchmarks.py css
+#   python benchmarks.py writes [--repeat 5] [--rows 500]
+#   python benchmarks.py async [--repeat 5] [--rows 500]
+#   python benchmarks.py assignments [--repeat 5] [--rows 500]   (exit 1 if the index is inconsistent)
+#   python benchmarks.py scaling [--repeat 3] [--scales 1000,10000,100000]
+#   python benchmarks.py instrumentation [--repeat 5] [--rows 500]
+#   python benchmarks.py metrics [--repeat 5] [--rows 500]
+#   python benchmarks.py api [--repeat 5] [--rows 500]           (seconds of load; exit 1 on 5xx)
+#   python benchmarks.py render [--repeat 3] [--scales 100,1000]
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ========== IMPORT TIME (COLD START) ==========
+# Modules every session imports before the first page is shown
+APP_SHELL_MODULES = ["streamlit", "database", "startup", "ui_helpers", "instrumentation", "metrics"]
+
+# Modules imported on first navigation to each page (see PAGE_MODULES in app.py)
+PAGE_IMPORTS = {
+    "Assignment Board": [],
+    "Construction Sites": ["construction_module"],
+    "Employees": ["employees_module"],
+    "Reports": ["report_module"],
+    "Diagnostics": ["diagnostics_module"],
+}
+
+
+def measure_import_time(modules):
+    """
+    Import modules in a fresh interpreter with `python -X importtime`.
+
+    Args:
+        modules (list): Module names imported in order
+
+    Returns:
+        float: Total import time in milliseconds (sum of self times)
+    """
+    code = "; ".join(f"import {m}" for m in modules) or "pass"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import failed for {modules}:\n{proc.stderr[-2000:]}")
+
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us = line.split(":", 1)[1].split("|")[0]
+        total_us += int(self_us)
+    return total_us / 1000
+
+
+def bench_importtime(repeat):
+    """Cold-start import cost of the app shell and of each page"""
+    shell_runs = [measure_import_time(APP_SHELL_MODULES) for _ in range(repeat)]
+    shell_ms = statistics.median(shell_runs)
+
+    results = {"app_shell": {"median_ms": round(shell_ms, 1), "runs_ms": [round(r, 1) for r in shell_runs]}}
+    for page, modules in PAGE_IMPORTS.items():
+        runs = [measure_import_time(APP_SHELL_MODULES + modules) for _ in range(repeat)]
+        page_ms = statistics.median(runs)
+        results[page] = {
+            "median_ms": round(page_ms, 1),
+            "incremental_ms": round(page_ms - shell_ms, 1),
+            "runs_ms": [round(r, 1) for r in runs],
+        }
+    return results
+
+
+# ========== CSS ENVIADO POR RERUN ==========
+APP_PAGES = ["Assignment Board", "Construction Sites", "Employees", "Reports", "Diagnostics"]
+
+
+def bench_css_bytes():
+    """
+    Bytes of <style> markup sent per rerun of each page.
+
+    Runs app.py headless with Streamlit's AppTest in a temporary directory
+    (fresh seeded database) and measures every markdown element emitted.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            for page in APP_PAGES:
+                at = AppTest.from_file(os.path.join(PROJECT_DIR, "app.py"), default_timeout=60)
+                at.session_state["initial_loaded"] = True
+                at.session_state["selected_page"] = page
+                at.run()
+                markdown = [m.value.encode("utf-8") for m in at.markdown]
+                styles = [m for m in markdown if b"<style" in m]
+                results[page] = {
+                    "style_blocks": len(styles),
+                    "css_bytes": sum(len(m) for m in styles),
+                    "markdown_bytes": sum(len(m) for m in markdown),
+                }
+        finally:
+            os.chdir(previous_cwd)
+    return results
+
+
+# ========== ESCRITURAS (INSERT/UPDATE) ==========
+def _time_writes(db, rows):
+    """Seconds spent by each write path of ConstructionDB for `rows` records"""
+    timings = {}
+
+    start = time.perf_counter()
+    site_ids = [
+        db.create_site({"status": "Active", "name": f"Bench Site {i}", "manager": "Bench", "phone": None})
+        for i in range(rows)
+    ]
+    timings["create_site"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, site_id in enumerate(site_ids):
+        # Orden de claves distinto en cada llamada: el SQL canónico es el mismo
+        data = {"manager": f"Manager {i}", "name": f"Bench Site {i}b"} if i % 2 else \
+            {"name": f"Bench Site {i}b", "manager": f"Manager {i}"}
+        db.update_site(site_id, data)
+    timings["update_site"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    emp_ids = [
+        db.create_employee({"name": "Bench", "surname": f"Worker {i}", "employee_id": f"BENCH-{i}", "status": "Active"})
+        for i in range(rows)
+    ]
+    timings["create_employee"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, emp_id in enumerate(emp_ids):
+        db.update_employee(emp_id, {"surname": f"Worker {i}b", "status": "Inactive"})
+    timings["update_employee"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(rows):
+        db.upsert_employee({"name": "Bench", "surname": f"Worker {i}c", "employee_id": f"BENCH-{i}", "status": "Active"})
+    timings["upsert_employee"] = time.perf_counter() - start
+    return timings
+
+
+def bench_writes(repeat, rows):
+    """
+    Insert/update throughput with the connection pool (prepared statements
+    reused per connection) vs. a new connection per call (pool_size=0).
+    """
+    from database import ConstructionDB
+
+    runs = {"pooled": [], "unpooled": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for run in range(repeat):
+            for mode, pool_size in (("pooled", None), ("unpooled", 0)):
+                db = ConstructionDB(os.path.join(workdir, f"{mode}_{run}.db"), pool_size=pool_size)
+                runs[mode].append(_time_writes(db, rows))
+                db.close()
+
+    results = {}
+    for mode, mode_runs in runs.items():
+        for operation in mode_runs[0]:
+            seconds = statistics.median(r[operation] for r in mode_runs)
+            results[f"{operation}[{mode}]"] = {
+                "median_ms": round(seconds * 1000, 1),
+                "ops_per_s": round(rows / seconds),
+            }
+    return results
+
+
+# ========== LECTURAS CONCURRENTES (ASYNC) ==========
+def _seed_sites(db_path, count):
+    """Fast bulk insert of `count` sites (one transaction) for read benchmarks"""
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO construction_sites (name, manager, phone, creation_date, status) VALUES (?, ?, ?, ?, ?)",
+            [(f"Site {i:05d}", f"Manager {i % 97}", None, "2024-01-01", "Active" if i % 3 else "Inactive")
+             for i in range(count)]
+        )
+    conn.close()
+
+
+def _read_workload(count, duplicates):
+    """(method, args, kwargs) reads; with duplicates most requests repeat a few queries"""
+    distinct = 8 if duplicates else count
+    requests = []
+    for i in range(count):
+        n = i % distinct
+        if n % 4 == 3:
+            requests.append(("get_site_by_id", (n + 1,), {}))
+        else:
+            # Página ordenada por una columna sin índice: consulta de informe típica
+            requests.append(("query_sites", (), {"status": "Active", "sort": "manager", "limit": 50,
+                                                  "after_key": (f"Manager {n % 97}", n)}))
+    return requests
+
+
+def bench_async(repeat, rows):
+    """
+    Throughput of `rows` concurrent reads: ConstructionDB called one after
+    another vs. AsyncConstructionDB with asyncio.gather (thread pool +
+    coalescing of identical reads).
+    """
+    import asyncio
+    from async_database import AsyncConstructionDB
+    from database import ConstructionDB
+
+    async def run_async(adb, requests):
+        return await asyncio.gather(*(getattr(adb, name)(*args, **kwargs) for name, args, kwargs in requests))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "reads.db")
+        db = ConstructionDB(db_path)
+        _seed_sites(db_path, 20000)
+
+        for workload, duplicates in (("distinct", False), ("duplicates", True)):
+            requests = _read_workload(rows, duplicates)
+            sync_runs, async_runs, coalesced = [], [], 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for name, args, kwargs in requests:
+                    getattr(db, name)(*args, **kwargs)
+                sync_runs.append(time.perf_counter() - start)
+
+                adb = AsyncConstructionDB(db=ConstructionDB(db_path))
+                start = time.perf_counter()
+                asyncio.run(run_async(adb, requests))
+                async_runs.append(time.perf_counter() - start)
+                coalesced = adb.stats()["coalesced"]
+                asyncio.run(adb.close())
+
+            for mode, runs in (("sync", sync_runs), ("async", async_runs)):
+                seconds = statistics.median(runs)
+                results[f"{workload}[{mode}]"] = {
+                    "median_ms": round(seconds * 1000, 1),
+                    "reads_per_s": round(rows / seconds),
+                }
+            results[f"{workload}[async]"]["coalesced"] = coalesced
+        db.close()
+    return results
+
+
+# ========== ÍNDICE DE ASIGNACIONES EN MEMORIA ==========
+def _seed_employees(db_path, count):
+    """Fast bulk insert of `count` active employees (one transaction)"""
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO employees (name, surname, employee_id, creation_date, status) VALUES (?, ?, ?, ?, ?)",
+            [(f"Worker{i}", f"Bench{i}", f"BENCH-{i}", "2024-01-01", "Active") for i in range(count)]
+        )
+    conn.close()
+
+
+def _check_assignment_consistency(indexed, plain, operations, seed=42):
+    """
+    Random assign/remove operations through the indexed ConstructionDB and,
+    interleaved, through a second connection (another "process"). After each
+    operation the index lookups must match the SQL answers.
+    """
+    rng = random.Random(seed)
+    site_ids = [s["id"] for s in plain.get_sites(columns=["id"])]
+    emp_ids = [e["id"] for e in plain.get_employees(columns=["id"])]
+    errors = []
+    external_writes = 0
+
+    for step in range(operations):
+        site_id, emp_id = rng.choice(site_ids), rng.choice(emp_ids)
+        # 15% de las escrituras llegan por otra conexión: el índice debe enterarse
+        writer = plain if rng.random() < 0.15 else indexed
+        external_writes += writer is plain
+        if rng.random() < 0.6:
+            writer.assign_employee_to_site(site_id, emp_id)
+        else:
+            writer.remove_assignment(site_id, emp_id)
+
+        probe_site, probe_emp = rng.choice(site_ids), rng.choice(emp_ids)
+        checks = (
+            ("site", probe_site, indexed.get_assignments_for_site, plain.get_assignments_for_site),
+            ("employee", probe_emp, indexed.get_sites_for_employee, plain.get_sites_for_employee),
+        )
+        for kind, key, from_index, from_sql in checks:
+            if sorted(from_index(key)) != sorted(from_sql(key)):
+                errors.append(f"step {step}: {kind} {key} index={sorted(from_index(key))} sql={sorted(from_sql(key))}")
+        if indexed.get_assigned_employee_ids() != plain.get_assigned_employee_ids():
+            errors.append(f"step {step}: assigned employee ids differ")
+        if step % 100 == 0:
+            errors.extend(f"step {step}: {problem}" for problem in indexed.check_assignment_index())
+
+    errors.extend(f"final: {problem}" for problem in indexed.check_assignment_index())
+    return {
+        "operations": operations,
+        "external_writes": external_writes,
+        "errors": errors[:20],
+        "consistent": not errors,
+    }
+
+
+def bench_assignments(repeat, rows):
+    """
+    Board lookups (employees on a site, sites of an employee) served by the
+    in-memory AssignmentIndex vs. SQLite, plus a randomized consistency check
+    of the index against the database.
+    """
+    from database import ConstructionDB
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "assignments.db")
+        plain = ConstructionDB(db_path)
+        _seed_sites(db_path, 200)
+        _seed_employees(db_path, 2000)
+        indexed = ConstructionDB(db_path, assignment_index=True)
+
+        results["consistency"] = _check_assignment_consistency(indexed, plain, rows * 4)
+
+        site_ids = [s["id"] for s in plain.get_sites(columns=["id"])]
+        lookups = [site_ids[i % len(site_ids)] for i in range(rows * 10)]
+        for mode, db in (("index", indexed), ("sql", plain)):
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for site_id in lookups:
+                    db.get_assignments_for_site(site_id)
+                    db.get_sites_for_employee(site_id)
+                runs.append(time.perf_counter() - start)
+            seconds = statistics.median(runs)
+            results[f"lookups[{mode}]"] = {
+                "median_ms": round(seconds * 1000, 1),
+                "lookups_per_s": round(2 * len(lookups) / seconds),
+            }
+        results["consistency"]["index_reloads"] = indexed._assignment_index.loads
+        indexed.close()
+        plain.close()
+    return results
+
+
+# ========== ESCALA (DATOS SINTÉTICOS) ==========
+# Escala = número de empleados; sitios = escala / 10; 70% de empleados asignados
+SCALES = (1000, 10000, 100000)
+SCALING_DENSITY = 0.7
+
+
+def _scaling_cases():
+    """
+    name -> (setup, run). setup(db, runs) returns one argument per run
+    (or None); run(db, arg) is the timed call.
+    """
+    from construction_module import load_sites_page, pick_construction_sites, search_construction_sites
+    from employees_module import load_employees_page, pick_employees, search_employees
+    from report_core import (build_report, build_csv_export, build_excel_export, build_json_export,
+                             build_parquet_export, generate_basic_report, generate_clean_dataframe,
+                             generate_display_dataframe)
+
+    def site_ids(db, runs):
+        return [1 + i * 7 for i in range(runs)]
+
+    def new_sites(db, runs):
+        return [db.create_site({"name": f"Bench delete {i}", "status": "Active"}) for i in range(runs)]
+
+    def new_employees(db, runs):
+        return [db.create_employee({"name": "Bench", "surname": "Delete", "employee_id": f"BENCH-DEL-{i}-{time.time_ns()}",
+                                    "status": "Active"}) for i in range(runs)]
+
+    def cached_report(db, runs):
+        return [build_report(db)] * runs
+
+    versions = iter(range(10 ** 9))  # data_version distinto en cada llamada: siempre sin caché
+
+    def kanban_queries(db, _):
+        # Consultas que hace show_kanban_board en cada rerun
+        sites = db.get_sites(status="Active", columns=["id", "name", "manager"])
+        db.get_employees(status="Active", columns=["id", "employee_id"])
+        db.get_assigned_employee_ids()
+        for site in sites:
+            db.get_assignments_for_site(site["id"])
+
+    return {
+        # ConstructionDB: lecturas
+        "db.get_counts": (None, lambda db, _: (db._invalidate_counts(), db.get_counts())),
+        "db.data_version": (None, lambda db, _: db.data_version()),
+        "db.get_sites": (None, lambda db, _: db.get_sites()),
+        "db.get_sites(active,projected)": (None, lambda db, _: db.get_sites(status="Active", columns=["id", "name"])),
+        "db.get_employees": (None, lambda db, _: db.get_employees()),
+        "db.get_site_by_id": (site_ids, lambda db, site_id: db.get_site_by_id(site_id)),
+        "db.get_employee_by_id": (site_ids, lambda db, emp_id: db.get_employee_by_id(emp_id)),
+        "db.query_sites(page)": (None, lambda db, _: db.query_sites(sort="name", limit=50)),
+        "db.query_sites(search)": (None, lambda db, _: db.query_sites(search="Bri", sort="name", limit=50)),
+        "db.query_employees(search)": (None, lambda db, _: db.query_employees(search="Ana Gó", limit=50)),
+        "db.get_all_assignments": (None, lambda db, _: db.get_all_assignments()),
+        "db.get_assignments_for_site": (site_ids, lambda db, site_id: db.get_assignments_for_site(site_id)),
+        "db.get_sites_for_employee": (site_ids, lambda db, emp_id: db.get_sites_for_employee(emp_id)),
+        "db.get_assigned_employee_ids": (None, lambda db, _: db.get_assigned_employee_ids()),
+        "db.snapshot(report reads)": (None, lambda db, _: generate_basic_report(db)),
+        # ConstructionDB: escrituras
+        "db.create_site": (None, lambda db, i: db.create_site({"name": "Bench create", "status": "Active"})),
+        "db.update_site": (site_ids, lambda db, site_id: db.update_site(site_id, {"manager": "Bench"})),
+        "db.delete_site": (new_sites, lambda db, site_id: db.delete_site(site_id)),
+        "db.create_employee": (None, lambda db, _: db.create_employee(
+            {"name": "Bench", "surname": "Create", "employee_id": f"BENCH-{time.time_ns()}", "status": "Active"})),
+        "db.update_employee": (site_ids, lambda db, emp_id: db.update_employee(emp_id, {"surname": "Bench"})),
+        "db.upsert_employee": (None, lambda db, _: db.upsert_employee(
+            {"name": "Bench", "surname": f"Upsert {time.time_ns()}", "employee_id": "SS-100000", "status": "Active"})),
+        "db.delete_employee": (new_employees, lambda db, emp_id: db.delete_employee(emp_id)),
+        "db.assign+remove": (site_ids, lambda db, emp_id: (db.assign_employee_to_site(1, emp_id),
+                                                           db.remove_assignment(1, emp_id))),
+        # Páginas: consultas del tablero, búsquedas y tablas CRUD
+        "kanban_queries": (None, kanban_queries),
+        "search_construction_sites": (None, lambda db, _: search_construction_sites("Sch", db)),
+        "pick_construction_sites": (None, lambda db, _: pick_construction_sites("12", db)),
+        "search_employees": (None, lambda db, _: search_employees("Lu", db)),
+        "pick_employees": (None, lambda db, _: pick_employees("Ana", db)),
+        "load_sites_page": (None, lambda db, _: load_sites_page(
+            next(versions), None, "", "name", ("id", "name", "manager", "phone", "creation_date", "status"),
+            None, 50, False, db)),
+        "load_employees_page": (None, lambda db, _: load_employees_page(
+            next(versions), "Active", "", "surname", ("id", "name", "surname", "employee_id", "creation_date", "status"),
+            None, 50, False, db)),
+        # Informes y exportaciones
+        "generate_basic_report": (None, lambda db, _: generate_basic_report(db)),
+        "generate_clean_dataframe": (None, lambda db, _: generate_clean_dataframe(db)),
+        "generate_display_dataframe": (None, lambda db, _: generate_display_dataframe(db)),
+        "build_report": (None, lambda db, _: build_report(db)),
+        "build_report(no display)": (None, lambda db, _: build_report(db, display=False)),
+        "build_excel_export": (cached_report, lambda db, report: build_excel_export(report)),
+        "build_csv_export": (cached_report, lambda db, report: build_csv_export(report)),
+        "build_json_export": (cached_report, lambda db, report: build_json_export(report)),
+        "build_parquet_export": (cached_report, lambda db, report: build_parquet_export(report)),
+    }
+
+
+def _measure(db, setup, run, repeat):
+    """Median wall time over `repeat` runs, plus peak Python memory of one extra run"""
+    args = setup(db, repeat + 1) if setup else [None] * (repeat + 1)
+    runs = []
+    for arg in args[:repeat]:
+        start = time.perf_counter()
+        run(db, arg)
+        runs.append(time.perf_counter() - start)
+
+    # tracemalloc ralentiza: el pico de memoria se mide en una ejecución aparte
+    tracemalloc.start()
+    try:
+        run(db, args[repeat])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_ms": round(statistics.median(runs) * 1000, 2),
+        "min_ms": round(min(runs) * 1000, 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def bench_scaling(repeat, scales):
+    """
+    Every ConstructionDB method and every report/export function against
+    synthetic databases of each scale (see synthetic_data.py).
+    """
+    from database import ConstructionDB
+    from synthetic_data import populate
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            db_path = os.path.join(workdir, f"scale_{scale}.db")
+            counts = populate(db_path, max(scale // 10, 1), scale, SCALING_DENSITY)
+            results[f"{scale}/dataset"] = counts
+            for indexed in (False, True):
+                db = ConstructionDB(db_path, assignment_index=indexed)
+                for name, (setup, run) in _scaling_cases().items():
+                    # Con índice solo cambian las consultas de asignaciones
+                    if indexed and "assign" not in name and name != "kanban_queries":
+                        continue
+                    label = f"{scale}/{name}" + ("[index]" if indexed else "")
+                    results[label] = _measure(db, setup, run, repeat)
+                    print(f"{label}: {results[label]['median_ms']} ms", file=sys.stderr)
+                db.close()
+    return results
+
+
+# ========== COSTE DE LA INSTRUMENTACIÓN ==========
+INSTRUMENTATION_MODES = (
+    ("off", {"enabled": False}),
+    ("on", {"enabled": True, "trace_sql": False}),
+    ("trace_sql", {"enabled": True, "trace_sql": True, "sample_rate": 1.0}),
+)
+
+
+def bench_instrumentation(repeat, rows):
+    """
+    Overhead of the query monitor on cheap reads (the worst case): per-call
+    cost with the monitor off, on (default sampling) and tracing every
+    statement. Also checks that a slow call reaches the slow-query log with
+    its EXPLAIN QUERY PLAN.
+    """
+    from database import ConstructionDB
+    from instrumentation import monitor
+
+    previous = {"enabled": monitor.enabled, "slow_ms": monitor.slow_ms,
+                "sample_rate": monitor.sample_rate, "trace_sql": monitor.trace_sql}
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, "instrumentation.db")
+            ConstructionDB(db_path).close()
+            _seed_sites(db_path, 1000)
+
+            for mode, settings in INSTRUMENTATION_MODES:
+                # El trace callback se instala al abrir la conexión: un ConstructionDB por modo
+                monitor.configure(slow_ms=float("inf"), **settings)
+                db = ConstructionDB(db_path)
+                runs = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    for i in range(rows):
+                        db.get_site_by_id(i % 1000 + 1)
+                        db.query_sites(status="Active", limit=20)
+                    runs.append(time.perf_counter() - start)
+                db.close()
+                results[mode] = {"us_per_call": round(statistics.median(runs) * 1e6 / (2 * rows), 1)}
+
+            monitor.reset()
+            monitor.configure(enabled=True, slow_ms=0.0, trace_sql=False)
+            db = ConstructionDB(db_path)
+            db.query_sites(search="Site 00", sort="manager", limit=20)
+            db.close()
+            monitor.wait_for_plans(timeout=10)
+            entry = monitor.slow[-1] if monitor.slow else {}
+            results["slow_query_log"] = {
+                "method": entry.get("method"),
+                "plans": [step for plan in entry.get("plans", []) for step in plan.get("plan", [])],
+                "consistent": entry.get("method") == "query_sites" and bool(entry.get("plans")),
+            }
+    finally:
+        monitor.reset()
+        monitor.configure(**previous)
+    return results
+
+
+# ========== MÉTRICAS PROMETHEUS ==========
+# Línea de muestra del formato de texto 0.0.4: nombre{etiquetas} valor
+SAMPLE_LINE = r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? (\+Inf|-?[0-9.e+-]+)$'
+
+
+def bench_metrics(repeat, rows):
+    """
+    Cost of one histogram observation and of a full scrape, plus a check
+    that /metrics answers with well-formed Prometheus text format.
+    """
+    import re
+    import urllib.request
+    from metrics import Histogram, registry, start_http_server
+
+    histogram = registry.register(Histogram("bench_seconds", "Benchmark histogram.", ["method"]))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(rows):
+            histogram.observe(i / rows, "get_sites")
+        runs.append(time.perf_counter() - start)
+
+    server = start_http_server(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        scrapes = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode("utf-8")
+                content_type = response.headers["Content-Type"]
+            scrapes.append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    malformed = [line for line in body.splitlines()
+                 if not line.startswith("#") and not re.match(SAMPLE_LINE, line)]
+    return {
+        "observe": {"us_per_call": round(statistics.median(runs) * 1e6 / rows, 2)},
+        "scrape": {
+            "median_ms": round(statistics.median(scrapes) * 1000, 2),
+            "bytes": len(body),
+            "families": len(registry.render().split("# TYPE")) - 1,
+            "malformed": malformed[:5],
+            "consistent": not malformed and content_type.startswith("text/plain; version=0.0.4"),
+        },
+    }
+
+
+# ========== API REST (CARGA) ==========
+API_CONCURRENCY = 4
+
+
+def bench_api(repeat, rows):
+    """
+    Load test of api.py on a synthetic database (rows sites and employees):
+    `repeat` seconds of API_CONCURRENCY keep-alive clients listing with
+    cursors, polling /api/assignments with If-None-Match and writing in bulk.
+    Consistent when no request fails and pollers actually get 304s.
+    """
+    import threading
+
+    import load_test
+    from api import create_server
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "api.db")
+        server = create_server(port=0, db_path=db_path)
+        _seed_sites(db_path, rows)
+        _seed_employees(db_path, rows)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            summary = load_test.run(url, concurrency=API_CONCURRENCY, duration=max(repeat, 1), write_ratio=0.1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.db.close()
+
+    failed = sum(count for code, count in summary["status"].items() if code == "0" or code.startswith("5"))
+    results = {name: {"median_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"], "count": stats["count"]}
+               for name, stats in summary["endpoints"].items()}
+    results["load"] = {
+        "rps": summary["rps"],
+        "status": summary["status"],
+        "not_modified_ratio": summary["not_modified_ratio"],
+        "consistent": failed == 0 and summary["not_modified_ratio"] > 0,
+    }
+    return results
+
+
+# ========== RENDER DE PÁGINAS (APPTEST) ==========
+# El Kanban dibuja un botón por empleado disponible y sitio activo: escalas pequeñas
+RENDER_SCALES = (100, 1000)
+
+
+@contextlib.contextmanager
+def _render_harness():
+    """
+    Stub time.sleep (click handlers, loading screen) and enable the query
+    monitor: app.py records each rerun in monitor.reruns.
+
+    Yields:
+        QueryMonitor: The process-wide monitor
+    """
+    from unittest import mock
+    from instrumentation import monitor
+
+    previous = {"enabled": monitor.enabled, "slow_ms": monitor.slow_ms}
+    monitor.configure(enabled=True, slow_ms=60_000.0)  # sin EXPLAIN durante la medición
+    try:
+        with mock.patch("time.sleep", lambda seconds: None):
+            yield monitor
+    finally:
+        monitor.configure(**previous)
+
+
+def _count_elements(node):
+    """Leaf elements emitted in an AppTest element tree"""
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return sum(_count_elements(child) for child in children.values())
+
+
+def _render_actions(at):
+    """
+    Interactions per page: (label, callable(at) or None for a plain rerun).
+    Buttons are looked up at run time because their keys depend on the data.
+    """
+    def click_first(prefix):
+        def action(at):
+            for button in at.button:
+                if button.key and button.key.startswith(prefix):
+                    button.click()
+                    return
+            raise LookupError(f"No button with key prefix {prefix!r}")
+        return action
+
+    return {
+        "Assignment Board": [("render", None), ("assign", click_first("assign_")), ("remove", click_first("rm_"))],
+        "Construction Sites": [("render", None), ("next_page", click_first("sites_pager_next"))],
+        "Employees": [("render", None), ("next_page", click_first("emp_pager_next"))],
+        "Reports": [("render", None), ("generate_report", click_first("btn_generate_report")),
+                    ("rerun_cached_report", None)],
+        "Diagnostics": [("render", None)],
+    }
+
+
+def bench_render(repeat, scales):
+    """
+    Full rerun of app.py for each page and interaction, against synthetic
+    databases of each scale: script run time, ConstructionDB calls, SQL
+    statements and emitted elements.
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from synthetic_data import populate
+
+    results = {}
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, _render_harness() as monitor:
+        os.chdir(workdir)
+        try:
+            for scale in scales:
+                populate("construction_system.db", max(scale // 10, 1), scale, SCALING_DENSITY, replace=True)
+                # Recursos compartidos (ConstructionDB, cachés) de la escala anterior fuera
+                st.cache_resource.clear()
+                st.cache_data.clear()
+
+                for page, actions in _render_actions(None).items():
+                    runs = {label: [] for label, _ in actions}
+                    for _ in range(repeat):
+                        at = AppTest.from_file(os.path.join(PROJECT_DIR, "app.py"), default_timeout=600)
+                        at.session_state["initial_loaded"] = True
+                        at.session_state["selected_page"] = page
+                        at.run()  # calentamiento: arranque y carga del módulo de la página
+                        for label, action in actions:
+                            if action is not None:
+                                action(at)
+                            last_rerun = monitor.reruns[-1] if monitor.reruns else None
+                            start = time.perf_counter()
+                            at.run()
+                            elapsed = time.perf_counter() - start
+                            if at.exception:
+                                raise RuntimeError(f"{page}/{label}: {at.exception[0].value}")
+                            # Un click con st.rerun() son dos ejecuciones del script: se suman
+                            reruns = list(itertools.takewhile(lambda r: r is not last_rerun,
+                                                              reversed(monitor.reruns)))
+                            runs[label].append((elapsed, sum(r["queries"] for r in reruns),
+                                                sum(r["statements"] for r in reruns),
+                                                _count_elements(at._tree)))
+
+                    for label, samples in runs.items():
+                        name = f"{scale}/{page}/{label}"
+                        results[name] = {
+                            "median_ms": round(statistics.median(s[0] for s in samples) * 1000, 1),
+                            "db_calls": int(statistics.median(s[1] for s in samples)),
+                            "statements": int(statistics.median(s[2] for s in samples)),
+                            "elements": int(statistics.median(s[3] for s in samples)),
+                        }
+                        print(f"{name}: {results[name]}", file=sys.stderr)
+        finally:
+            os.chdir(previous_cwd)
+    return results
+
+
+# ========== COMPARACIÓN CON BASELINE ==========
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compare median timings against a previous results file.
+
+    Returns:
+        list: Human readable regression messages (empty when all good)
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            continue
+        if "median_ms" not in current or "median_ms" not in previous:
+            continue
+        limit = previous["median_ms"] * (1 + tolerance)
+        if current["median_ms"] > limit:
+            regressions.append(
+                f"{name}: {current['median_ms']} ms > {previous['median_ms']} ms (+{int(tolerance * 100)}% allowed)"
+            )
+    return regressions
+
+
+BENCHMARKS = {
+    "importtime": lambda args: bench_importtime(args.repeat),
+    "css": lambda args: bench_css_bytes(),
+    "writes": lambda args: bench_writes(args.repeat, args.rows),
+    "async": lambda args: bench_async(args.repeat, args.rows),
+    "assignments": lambda args: bench_assignments(args.repeat, args.rows),
+    "scaling": lambda args: bench_scaling(args.repeat, _scales(args, SCALES)),
+    "instrumentation": lambda args: bench_instrumentation(args.repeat, args.rows),
+    "metrics": lambda args: bench_metrics(args.repeat, args.rows),
+    "api": lambda args: bench_api(args.repeat, args.rows),
+    "render": lambda args: bench_render(args.repeat, _scales(args, RENDER_SCALES)),
+}
+
+
+def _scales(args, default):
+    return [int(s) for s in args.scales.split(",")] if args.scales else list(default)
+
+
+def _git_commit():
+    """Current commit of the project (results can be compared across commits)"""
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True)
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construction Management System benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement")
+    parser.add_argument("--rows", type=int, default=500, help="Records written per operation (writes) / concurrent reads (async)")
+    parser.add_argument("--scales", help="Comma separated dataset sizes in employees (scaling, render)")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = BENCHMARKS[args.benchmark](args)
+    report = json.dumps({
+        "benchmark": args.benchmark,
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "results": results,
+    }, indent=2, ensure_ascii=False)
+    print(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+    if any(isinstance(r, dict) and r.get("consistent") is False for r in results.values()):
+        print("INCONSISTENT results (see 'errors')", file=sys.stderr)
+        return 1
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
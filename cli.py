@@ -0,0 +1,354 @@
+# cli.py
+# Herramienta de línea de comandos (cron, integraciones): informes, importaciones y email
+#
+# Usage:
+#   python cli.py report [--format xlsx,csv,json,parquet] [--output-dir reports]
+#   python cli.py email --to a@example.com,b@example.com [--format xlsx] [--subject "..."] [--simulate]
+#   python cli.py import-employees employees.csv      # name,surname,employee_id[,status][,creation_date]
+#   python cli.py assign assignments.csv              # site (nombre) o site_id, employee_id (SS)
+#   python cli.py unassign assignments.csv | --site "Site name" | --inactive-employees
+#
+# Opciones de todos los comandos: --db construction_system.db, --quiet (sin progreso en stderr)
+#
+# Códigos de salida:
+#   0 todo correcto
+#   1 terminó, pero algunas filas se rechazaron (detalle en stderr)
+#   2 uso incorrecto o fichero de entrada ilegible
+#   3 fallo: base de datos, escritura de ficheros o envío del email
+#
+# crontab (informe nocturno):
+#   0 2 * * * cd /srv/construction && python cli.py report --format xlsx,parquet --quiet
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from database import ConstructionDB, WRITABLE_COLUMNS
+from report_core import (EXPORT_FORMATS, ReportCache, default_email_body, export_filename,
+                         send_email_simulation, send_email_smtp)
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+
+# Filas por transacción en importaciones y asignaciones masivas
+BATCH_SIZE = 1000
+# Errores de fila que se listan en stderr (el resto solo se cuentan)
+MAX_REPORTED_ERRORS = 20
+
+
+class UsageError(Exception):
+    """Bad arguments or unreadable input: exit code 2"""
+
+
+class Progress:
+    """Timestamped progress lines on stderr (silent with --quiet)"""
+
+    # Segundos mínimos entre dos líneas de progreso de un mismo lote
+    BATCH_INTERVAL_S = 1.0
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.start = time.perf_counter()
+        self._last_batch = 0.0
+
+    def __call__(self, message):
+        if not self.quiet:
+            elapsed = time.perf_counter() - self.start
+            print(f"[{elapsed:7.2f}s] {message}", file=sys.stderr, flush=True)
+
+    def batch(self, label, done, total):
+        now = time.perf_counter()
+        if done < total and now - self._last_batch < self.BATCH_INTERVAL_S:
+            return
+        self._last_batch = now
+        self(f"{label}: {done}/{total} ({done / total:.0%})" if total else f"{label}: {done}")
+
+
+def _report_errors(errors, label):
+    """Print the first rejected rows; returns EXIT_PARTIAL if there was any"""
+    for line, message in sorted(errors)[:MAX_REPORTED_ERRORS]:
+        print(f"{label} line {line}: {message}", file=sys.stderr)
+    if len(errors) > MAX_REPORTED_ERRORS:
+        print(f"... and {len(errors) - MAX_REPORTED_ERRORS} more rejected rows", file=sys.stderr)
+    return EXIT_PARTIAL if errors else EXIT_OK
+
+
+def _read_csv(path, required_any):
+    """
+    Rows of a CSV file with a header line.
+
+    Args:
+        required_any (list): Groups of columns; the header must contain at
+            least one column of each group
+
+    Returns:
+        tuple: (header, list of (line number, row dict))
+    """
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            header = [name.strip() for name in reader.fieldnames or []]
+            reader.fieldnames = header
+            for group in required_any:
+                if not any(column in header for column in group):
+                    raise UsageError(f"{path}: missing column {' or '.join(group)}")
+            # La línea 1 es la cabecera
+            rows = [(index + 2, row) for index, row in enumerate(reader)]
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        raise UsageError(f"Cannot read {path}: {e}")
+    return header, rows
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write_atomic(path, data):
+    """Write the whole file or nothing (readers never see a half-written report); returns bytes written"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        size = f.write(data.encode("utf-8") if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+    return size
+
+
+def _parse_formats(value):
+    formats = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in EXPORT_FORMATS]
+    if unknown or not formats:
+        raise UsageError(f"Unknown format(s): {', '.join(unknown) or value}. "
+                         f"Choose from {', '.join(EXPORT_FORMATS)}")
+    return formats
+
+
+# ========== COMANDOS ==========
+def cmd_report(db, args, progress):
+    """Build the report once and write one file per format"""
+    formats = _parse_formats(args.format)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    cache = ReportCache(display=False)
+    progress("Building report...")
+    report = cache.get(db)
+    stats = report["stats"]
+    progress(f"Report built: {stats['total_employees']} employees, {stats['total_sites']} sites, "
+             f"{stats['assigned']} assignments")
+
+    stamp = args.stamp or report["generated_at"].strftime("%Y%m%d")
+    for name in formats:
+        builder = EXPORT_FORMATS[name][0]
+        data = cache.export(report, name, builder)
+        path = os.path.join(args.output_dir, export_filename(name, stamp))
+        size = _write_atomic(path, data)
+        progress(f"{name}: {path} ({size:,} bytes)")
+        print(path)
+    return EXIT_OK
+
+
+def cmd_email(db, args, progress):
+    """Build the report, attach it in one format and send it"""
+    name = _parse_formats(args.format)[0]
+    cache = ReportCache(display=False)
+    progress("Building report...")
+    report = cache.get(db)
+    builder, attachment_type, _ = EXPORT_FORMATS[name]
+    data = cache.export(report, name, builder)
+    subject = args.subject or f"Employee Assignments Report - {datetime.now():%Y-%m-%d}"
+
+    send = send_email_simulation if args.simulate else send_email_smtp
+    kwargs = {"delay": 0} if args.simulate else {}
+    progress(f"Sending {name} attachment ({len(data):,} bytes) to {args.to}...")
+    result = send(args.to, subject, default_email_body(), attachment_data=data,
+                  attachment_filename=export_filename(name), attachment_type=attachment_type, **kwargs)
+    print(result["message"])
+    if result["status"] in ("sent", "sent_simulation"):
+        return EXIT_OK
+    if result["status"] == "demo_mode":
+        print("Set EMAIL_USER and EMAIL_PASSWORD to send real email (or use --simulate)", file=sys.stderr)
+    return EXIT_FAILED
+
+
+def cmd_import_employees(db, args, progress):
+    """Upsert employees by employee_id from a CSV file, BATCH_SIZE rows per transaction"""
+    header, rows = _read_csv(args.file, [["name"], ["surname"], ["employee_id"]])
+    unknown = [c for c in header if c not in WRITABLE_COLUMNS["employees"]]
+    if unknown:
+        raise UsageError(f"{args.file}: unknown column(s) {', '.join(unknown)}")
+
+    changed = unchanged = 0
+    errors = []
+    done = 0
+    for batch in _batches(rows):
+        lines, records = [], []
+        for line, row in batch:
+            record = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k in header}
+            if not all(record.get(k) for k in ("name", "surname", "employee_id")):
+                errors.append((line, "name, surname and employee_id are required"))
+                continue
+            record["status"] = record.get("status") or "Active"
+            if not record.get("creation_date"):
+                record.pop("creation_date", None)
+            lines.append(line)
+            records.append(record)
+        result = db.bulk_upsert_employees(records)
+        changed += result["changed"]
+        unchanged += result["unchanged"]
+        errors.extend((lines[index], message) for index, message in result["errors"])
+        done += len(batch)
+        progress.batch("Employees", done, len(rows))
+
+    print(f"Employees: {changed} inserted/updated, {unchanged} unchanged, {len(errors)} rejected")
+    return _report_errors(errors, args.file)
+
+
+def _resolve_pairs(db, path):
+    """
+    (site_id, emp_id) pairs of an assignments CSV: site by name (site) or
+    internal id (site_id), employee by Social Security number (employee_id).
+
+    Returns:
+        tuple: ([(line, (site_id, emp_id))], [(line, error message)])
+    """
+    _, rows = _read_csv(path, [["site", "site_id"], ["employee_id"]])
+    sites = db.get_sites(columns=["id", "name"])
+    site_ids = {site["id"] for site in sites}
+    sites_by_name = {site["name"]: site["id"] for site in sites}
+    employees_by_ss = {emp["employee_id"]: emp["id"] for emp in db.get_employees(columns=["id", "employee_id"])}
+
+    pairs, errors = [], []
+    for line, row in rows:
+        site_value = (row.get("site_id") or "").strip()
+        if site_value:
+            site_id = int(site_value) if site_value.isdigit() and int(site_value) in site_ids else None
+        else:
+            site_value = (row.get("site") or "").strip()
+            site_id = sites_by_name.get(site_value)
+        emp_value = (row.get("employee_id") or "").strip()
+        emp_id = employees_by_ss.get(emp_value)
+        if site_id is None:
+            errors.append((line, f"unknown site {site_value!r}"))
+        elif emp_id is None:
+            errors.append((line, f"unknown employee {emp_value!r}"))
+        else:
+            pairs.append((line, (site_id, emp_id)))
+    return pairs, errors
+
+
+def _apply_in_batches(db, pairs, key, progress, label):
+    """bulk_assignments over pairs in BATCH_SIZE transactions; returns changed count"""
+    changed = done = 0
+    for batch in _batches(pairs):
+        only_pairs = [pair for _, pair in batch]
+        if key == "assigned":
+            result = db.bulk_assignments(assign=only_pairs)
+        else:
+            result = db.bulk_assignments(remove=only_pairs)
+        changed += sum(result[key])
+        done += len(batch)
+        progress.batch(label, done, len(pairs))
+    return changed
+
+
+def cmd_assign(db, args, progress):
+    pairs, errors = _resolve_pairs(db, args.file)
+    progress(f"{len(pairs)} valid rows, {len(errors)} rejected")
+    assigned = _apply_in_batches(db, pairs, "assigned", progress, "Assign")
+    print(f"Assignments: {assigned} created, {len(pairs) - assigned} already present, {len(errors)} rejected")
+    return _report_errors(errors, args.file)
+
+
+def cmd_unassign(db, args, progress):
+    errors = []
+    if args.file:
+        pairs, errors = _resolve_pairs(db, args.file)
+    elif args.site:
+        site = next((s for s in db.get_sites(columns=["id", "name"]) if s["name"] == args.site), None)
+        if site is None:
+            raise UsageError(f"Unknown site {args.site!r}")
+        pairs = [(0, (site["id"], emp_id)) for emp_id in db.get_assignments_for_site(site["id"])]
+    else:
+        inactive = {emp["id"] for emp in db.get_employees(status="Inactive", columns=["id"])}
+        pairs = [(0, (site_id, emp_id)) for site_id, emp_ids in db.get_all_assignments().items()
+                 for emp_id in emp_ids if emp_id in inactive]
+    progress(f"{len(pairs)} assignments to remove")
+    removed = _apply_in_batches(db, pairs, "removed", progress, "Unassign")
+    print(f"Assignments: {removed} removed, {len(pairs) - removed} not found, {len(errors)} rejected")
+    return _report_errors(errors, args.file)
+
+
+COMMANDS = {
+    "report": cmd_report,
+    "email": cmd_email,
+    "import-employees": cmd_import_employees,
+    "assign": cmd_assign,
+    "unassign": cmd_unassign,
+}
+
+
+def build_parser():
+    # Opciones de todos los comandos (van después del nombre del comando)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default="construction_system.db", help="SQLite database file")
+    common.add_argument("--quiet", action="store_true", help="No progress output on stderr")
+
+    parser = argparse.ArgumentParser(description="Construction Management System batch tool")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", parents=[common], help="Write the assignments report to files")
+    report.add_argument("--format", default="xlsx", help=f"Comma separated: {', '.join(EXPORT_FORMATS)}")
+    report.add_argument("--output-dir", default="reports", help="Directory for the report files")
+    report.add_argument("--stamp", help="File name stamp instead of the report date (YYYYMMDD)")
+
+    email = commands.add_parser("email", parents=[common], help="Email the assignments report")
+    email.add_argument("--to", required=True, help="Recipient(s), comma separated")
+    email.add_argument("--format", default="xlsx_assignments", help="Attachment format")
+    email.add_argument("--subject", help="Email subject")
+    email.add_argument("--simulate", action="store_true", help="Do not connect to SMTP")
+
+    import_employees = commands.add_parser("import-employees", parents=[common],
+                                           help="Insert/update employees from a CSV file")
+    import_employees.add_argument("file", help="CSV with name,surname,employee_id[,status][,creation_date]")
+
+    assign = commands.add_parser("assign", parents=[common], help="Create assignments from a CSV file")
+    assign.add_argument("file", help="CSV with site (or site_id) and employee_id columns")
+
+    unassign = commands.add_parser("unassign", parents=[common], help="Remove assignments in bulk")
+    target = unassign.add_mutually_exclusive_group(required=True)
+    target.add_argument("file", nargs="?", help="CSV with site (or site_id) and employee_id columns")
+    target.add_argument("--site", help="Remove every assignment of this site (by name)")
+    target.add_argument("--inactive-employees", action="store_true",
+                        help="Remove every assignment of inactive employees")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    progress = Progress(quiet=args.quiet)
+    db = None
+    try:
+        # ConstructionDB crea y siembra una base nueva si el fichero no existe:
+        # una ruta mal escrita no debe dar un lote "correcto" sobre datos de ejemplo
+        if not os.path.isfile(args.db):
+            raise UsageError(f"Database not found: {args.db}")
+        db = ConstructionDB(args.db)
+        return COMMANDS[args.command](db, args, progress)
+    except UsageError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except (sqlite3.Error, OSError) as e:
+        print(f"failed: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    finally:
+        if db is not None:
+            db.close()
+        progress("Done")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
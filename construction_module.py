@@ -6,17 +6,77 @@ from streamlit_searchbox import st_searchbox
 import time
 
 # IMPORTAR UI HELPERS
-from ui_helpers import apply_global_styles, render_page_header, metric_card_simple, get_current_date
+from ui_helpers import apply_global_styles, inject_stylesheet, render_page_header, metric_card_simple, get_current_date, \
+    keyset_pager_state, render_keyset_pager, status_badge_frame, status_column_config, record_picker, \
+    editing_version, render_conflict_message
+from database import ConflictError
+
+
+SITE_COLUMN_LABELS = {
+    "id": "ID",
+    "name": "Construction Site",
+    "manager": "Manager",
+    "phone": "Phone Number",
+    "creation_date": "Creation Date",
+    "status": "Status"
+}
+
+# Valores mostrados cuando otra sesión modificó el registro editado
+SITE_CONFLICT_FIELDS = {"name": "Name", "manager": "Manager", "phone": "Phone", "status": "Status"}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_sites_page(data_version, status, record_id, sort, columns, after_key, limit, descending, _db):
+    """
+    One page of the table as a display-ready DataFrame.
+
+    Cached per data version: reruns that do not change data or filters skip
+    the query and the DataFrame build.
+
+    Returns:
+        tuple: (DataFrame, next_key)
+    """
+    page = _db.query_sites(
+        status=status,
+        record_id=record_id,
+        sort=sort,
+        columns=list(columns),
+        after_key=after_key,
+        limit=limit,
+        descending=descending,
+        with_total=False
+    )
+    df = pd.DataFrame(page["rows"], columns=list(columns))
+    df.columns = [SITE_COLUMN_LABELS.get(col, col) for col in columns]
+    return status_badge_frame(df), page["next_key"]
+
+
+# Máximo de coincidencias que devuelve el selector de registros
+PICKER_LIMIT = 15
+
+
+def format_site_label(site: dict) -> str:
+    return f"{site['name']} (ID: {site['id']}) • {site['status']}"
+
+
+def pick_construction_sites(search_term: str, db) -> list:
+    """Search function for the Edit/Delete record picker: (label, id) tuples"""
+    term = search_term.strip()
+    results = []
+    if term.isdigit():
+        site = db.get_site_by_id(int(term), columns=["id", "name", "status"])
+        if site:
+            results.append((format_site_label(site), site["id"]))
+    page = db.query_sites(search=term, sort="name", columns=["id", "name", "status"], limit=PICKER_LIMIT)
+    exact_ids = {record_id for _, record_id in results}
+    results.extend((format_site_label(site), site["id"]) for site in page["rows"] if site["id"] not in exact_ids)
+    return results
 
 
 def search_construction_sites(search_term: str, db) -> list:
-    """Search function for st_searchbox"""
-    sites = db.get_sites()
-    results = []
-    for site in sites:
-        if search_term.lower() in site['name'].lower():
-            results.append(f"{site['name']} (ID: {site['id']})")
-    return results
+    """Search function for st_searchbox: (label, id) tuples, indexed name-prefix query, 10 results max"""
+    page = db.query_sites(search=search_term, sort="name", columns=["id", "name"], limit=10)
+    return [(f"{site['name']} (ID: {site['id']})", site["id"]) for site in page["rows"]]
 
 
 def show_construction_site(db):
@@ -25,14 +85,15 @@ def show_construction_site(db):
     # APLICAR ESTILOS GLOBALES
     apply_global_styles()
 
-    # Fetch fresh data from DB
-    sites = db.get_sites()
+    # Conteos agregados (una sola consulta) y versión de datos para las cachés
+    counts = db.get_counts()["sites"]
+    data_version = db.data_version()
 
     # ========== MÉTRICAS MEJORADAS CON UI HELPERS ==========
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        total_sites = len(sites)
+        total_sites = counts["total"]
         st.markdown(metric_card_simple(
             value=total_sites,
             label="Total Sites",
@@ -41,7 +102,7 @@ def show_construction_site(db):
         ), unsafe_allow_html=True)
 
     with col2:
-        active_sites = len([s for s in sites if s.get("status") == "Active"])
+        active_sites = counts["Active"]
         st.markdown(metric_card_simple(
             value=active_sites,
             label="Active Sites",
@@ -50,7 +111,7 @@ def show_construction_site(db):
         ), unsafe_allow_html=True)
 
     with col3:
-        inactive_sites = len([s for s in sites if s.get("status") == "Inactive"])
+        inactive_sites = counts["Inactive"]
         st.markdown(metric_card_simple(
             value=inactive_sites,
             label="Inactive Sites",
@@ -61,74 +122,7 @@ def show_construction_site(db):
     st.markdown("---")
 
     # ========== FILTROS HORIZONTALES ==========
-    st.markdown("""
-    <style>
-    .filters-section {
-        background: linear-gradient(135deg, #f8fafc, #e2e8f0);
-        padding: 15px;
-        border-radius: 12px;
-        margin-bottom: 20px;
-        border: 1px solid #cbd5e1;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.06);
-    }
-    .filter-header {
-        color: #1e40af;
-        font-weight: 700;
-        margin-bottom: 10px;
-        font-size: 14px;
-    }
-    .dataframe-container {
-        border-radius: 10px;
-        overflow: hidden;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.08);
-        border: 1px solid #e2e8f0;
-        margin-top: 15px;
-    }
-
-    /* BOTONES CON HOVER COOL */
-    .create-button-cool {
-        background: linear-gradient(135deg, #10b981, #059669) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        border-radius: 8px !important;
-    }
-    .create-button-cool:hover {
-        background: linear-gradient(135deg, #059669, #047857) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(16, 185, 129, 0.3) !important;
-    }
-
-    .update-button-cool {
-        background: linear-gradient(135deg, #3b82f6, #1d4ed8) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        border-radius: 8px !important;
-    }
-    .update-button-cool:hover {
-        background: linear-gradient(135deg, #2563eb, #1e40af) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(59, 130, 246, 0.3) !important;
-    }
-
-    .delete-button-cool {
-        background: linear-gradient(135deg, #ef4444, #dc2626) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        border-radius: 8px !important;
-    }
-    .delete-button-cool:hover {
-        background: linear-gradient(135deg, #dc2626, #b91c1c) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(239, 68, 68, 0.3) !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    inject_stylesheet("construction_sites")
 
     st.markdown('<p class="filter-header">🔍 FILTERS & CONTROLS</p>', unsafe_allow_html=True)
 
@@ -154,96 +148,67 @@ def show_construction_site(db):
     with columns_col:
         columns_to_show = st.multiselect(
             "Show columns:",
-            ["id", "name", "manager", "phone", "creation_date", "status"],
+            list(SITE_COLUMN_LABELS),
             default=["id", "name", "manager", "status"],
             key="columns_selector",
             label_visibility="visible"
         )
 
+    sort_col, order_col, size_col = st.columns([3, 2, 3])
+
+    with sort_col:
+        sort_by = st.selectbox(
+            "Sort by:",
+            list(SITE_COLUMN_LABELS),
+            format_func=SITE_COLUMN_LABELS.get,
+            key="sites_sort_by"
+        )
+
+    with order_col:
+        sort_order = st.selectbox("Order:", ["Ascending", "Descending"], key="sites_sort_order")
+
+    with size_col:
+        page_size = st.selectbox("Rows per page:", [25, 50, 100, 250], index=1, key="sites_page_size")
+
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # ========== DATAFRAME CON FILTROS APLICADOS ==========
-    df = pd.DataFrame(sites)
-    filtered_df = df.copy()
-
-    if status_filter != "All":
-        filtered_df = filtered_df[filtered_df["status"] == status_filter]
-
-    if selected_site:
-        site_name = selected_site.split(" (ID: ")[0]
-        filtered_df = filtered_df[filtered_df["name"] == site_name]
-
-    if columns_to_show:
-        display_columns = []
-        for col in columns_to_show:
-            if col == "id":
-                display_columns.append("ID")
-            elif col == "name":
-                display_columns.append("Construction Site")
-            elif col == "manager":
-                display_columns.append("Manager")
-            elif col == "phone":
-                display_columns.append("Phone Number")
-            elif col == "creation_date":
-                display_columns.append("Creation Date")
-            elif col == "status":
-                display_columns.append("Status")
-            else:
-                display_columns.append(col)
-
-        filtered_df = filtered_df[columns_to_show]
-        filtered_df.columns = display_columns
-
-    # Función para estilizar el DataFrame
-    def style_dataframe(df):
-        if df.empty:
-            return df.style
-
-        # Estilizar celdas basado en status
-        def color_status(val):
-            if val == "Active":
-                return 'background-color: #d1fae5; color: #065f46; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
-            elif val == "Inactive":
-                return 'background-color: #fee2e2; color: #991b1b; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
-            return ''
-
-        # Aplicar estilos
-        if 'Status' in df.columns:
-            styled = df.style.applymap(color_status, subset=['Status'])
-        else:
-            styled = df.style
-
-        # Estilo general para la tabla
-        styled = styled.set_properties(**{
-            'border': '1px solid #e2e8f0',
-            'padding': '8px',
-            'border-radius': '4px'
-        })
-
-        # Estilo para encabezados
-        styled = styled.set_table_styles([{
-            'selector': 'th',
-            'props': [
-                ('background-color', '#1E88E5'),
-                ('color', 'white'),
-                ('font-weight', 'bold'),
-                ('padding', '10px'),
-                ('border-radius', '8px 8px 0 0')
-            ]
-        }])
-
-        return styled
-
-    # Mostrar DataFrame con estilos
+    # ========== CONSULTA PAGINADA (FILTROS, COLUMNAS Y ORDEN EN SQL) ==========
+    status_value = None if status_filter == "All" else status_filter
+    quick_search_id = selected_site  # id del registro elegido (st_searchbox devuelve el valor de la tupla)
+    columns_value = columns_to_show or list(SITE_COLUMN_LABELS)
+
+    cursors = keyset_pager_state(
+        "sites_pager",
+        (status_value, quick_search_id, tuple(columns_value), sort_by, sort_order, page_size)
+    )
+    filtered_df, next_key = load_sites_page(
+        data_version,
+        status_value,
+        quick_search_id,
+        sort_by,
+        tuple(columns_value),
+        cursors[-1],
+        page_size,
+        sort_order == "Descending",
+        db
+    )
+    # Total para el paginador: los conteos por estado ya cargados, o la única fila elegida
+    if quick_search_id is not None:
+        total_rows = len(filtered_df)
+    else:
+        total_rows = counts["total"] if status_value is None else counts[status_value]
+
+    # Mostrar DataFrame (estado como badges de color)
     if not filtered_df.empty:
-        styled_df = style_dataframe(filtered_df)
         st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
-        st.dataframe(styled_df, use_container_width=True, height=400)
+        st.dataframe(filtered_df, use_container_width=True, height=400, hide_index=True,
+                     column_config=status_column_config())
         st.markdown('</div>', unsafe_allow_html=True)
     else:
         st.info("📭 No construction sites found with the current filters")
 
-    st.caption(f"📋 Showing {len(filtered_df)} of {len(sites)} construction sites")
+    render_keyset_pager("sites_pager", cursors, next_key, total_rows, page_size,
+                        len(filtered_df), noun="construction sites")
 
     # ========== SECTION 2: TABS (CRUD) MEJORADOS ==========
     st.divider()
@@ -325,20 +290,21 @@ def show_construction_site(db):
     with tab2:
         st.markdown("<h4 style='color: #1d4ed8;'>Edit Existing Construction Site</h4>", unsafe_allow_html=True)
 
-        site_ids = [site["id"] for site in sites]
-
-        if site_ids:
-            # Selección del sitio
-            selected_id = st.selectbox(
-                "Select Site ID to edit:",
-                site_ids,
-                key="modify_select_id",
-                help="Choose a site ID from the list"
+        if counts["total"]:
+            # Selección del sitio (búsqueda por nombre o ID)
+            selected_site = record_picker(
+                "Search site to edit:",
+                key="modify_site_picker",
+                search_function=lambda term: pick_construction_sites(term, db),
+                load_record=db.get_site_by_id,
+                format_label=format_site_label,
+                data_version=data_version,
+                placeholder="Type a site name or ID..."
             )
-
-            selected_site = db.get_site_by_id(selected_id)
+            selected_id = selected_site["id"] if selected_site else None
 
             if selected_site:
+                expected_version = editing_version("modify_base_version", selected_site)
                 st.info(f"📝 Editing: **{selected_site['name']}** (ID: `{selected_id}`)")
 
                 # Formulario de edición
@@ -381,12 +347,15 @@ def show_construction_site(db):
                         "status": new_status
                     }
                     try:
-                        if db.update_site(selected_id, updated_data):
+                        if db.update_site(selected_id, updated_data, expected_version=expected_version):
                             st.success(f"✅ Site **'{new_name}'** updated successfully!")
+                            st.session_state.pop("modify_base_version", None)
                             time.sleep(1)
                             st.rerun()
                         else:
                             st.warning("ℹ️ No changes applied or site not found.")
+                    except ConflictError as e:
+                        render_conflict_message(e, SITE_CONFLICT_FIELDS, key="modify_base_version")
                     except Exception as e:
                         st.error(f"❌ Update error: {str(e)}")
         else:
@@ -396,18 +365,18 @@ def show_construction_site(db):
     with tab3:
         st.markdown("<h4 style='color: #dc2626;'>Delete Construction Site</h4>", unsafe_allow_html=True)
 
-        site_ids = [site["id"] for site in sites]
-
-        if site_ids:
-            # Selección del sitio a eliminar
-            delete_id = st.selectbox(
-                "Select Site ID to delete:",
-                site_ids,
-                key="delete_select_id",
-                help="Choose a site ID to delete"
+        if counts["total"]:
+            # Selección del sitio a eliminar (búsqueda por nombre o ID)
+            selected_site = record_picker(
+                "Search site to delete:",
+                key="delete_site_picker",
+                search_function=lambda term: pick_construction_sites(term, db),
+                load_record=db.get_site_by_id,
+                format_label=format_site_label,
+                data_version=data_version,
+                placeholder="Type a site name or ID..."
             )
-
-            selected_site = db.get_site_by_id(delete_id)
+            delete_id = selected_site["id"] if selected_site else None
 
             if selected_site:
                 # Mostrar información del sitio seleccionado
@@ -434,12 +403,15 @@ def show_construction_site(db):
                                  type="primary",
                                  key="delete_button",
                                  use_container_width=True):
-                        if db.delete_site(delete_id):
-                            st.success("✅ Site deleted successfully!")
-                            time.sleep(1)
-                            st.rerun()
-                        else:
-                            st.error("❌ Could not delete the site.")
+                        try:
+                            if db.delete_site(delete_id, expected_version=selected_site["version"]):
+                                st.success("✅ Site deleted successfully!")
+                                time.sleep(1)
+                                st.rerun()
+                            else:
+                                st.error("❌ Could not delete the site.")
+                        except ConflictError as e:
+                            render_conflict_message(e, SITE_CONFLICT_FIELDS)
                 else:
                     st.info("🔒 Please check the confirmation box to enable deletion")
         else:
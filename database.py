@@ -1,24 +1,416 @@
 # database.py
+import contextlib
+import functools
+import queue
 import sqlite3
-import pandas as pd
+import threading
+import time
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Optional, Any
 
+from instrumentation import monitor
+
+
+# Columnas consultables por tabla (lista blanca para proyección y ordenación)
+SITE_COLUMNS = ("id", "name", "manager", "phone", "creation_date", "status", "version")
+EMPLOYEE_COLUMNS = ("id", "name", "surname", "employee_id", "creation_date", "status", "version")
+
+TABLE_COLUMNS = {
+    "construction_sites": SITE_COLUMNS,
+    "employees": EMPLOYEE_COLUMNS,
+}
+
+# Columnas escribibles por tabla, en orden canónico (id y version los gestiona la BD)
+WRITABLE_COLUMNS = {
+    "construction_sites": ("name", "manager", "phone", "creation_date", "status"),
+    "employees": ("name", "surname", "employee_id", "creation_date", "status"),
+}
+
+# Columnas que pueden ser NULL: se ordenan con IFNULL para que la paginación por clave funcione
+NULLABLE_SORT_COLUMNS = {"manager", "phone", "creation_date", "status", "employee_id"}
+# Columnas de texto libre: se ordenan sin distinguir mayúsculas (usa los índices NOCASE)
+NOCASE_SORT_COLUMNS = {"name", "surname"}
+
+
+def _sort_expression(column: str) -> str:
+    """Expresión de ORDER BY de una columna; coincide con la de su índice de ordenación"""
+    if column in NOCASE_SORT_COLUMNS:
+        return f"{column} COLLATE NOCASE"
+    if column in NULLABLE_SORT_COLUMNS:
+        return f"IFNULL({column}, '')"
+    return column
+
+
+def _select_list(table: str, columns: Optional[List[str]] = None) -> List[str]:
+    """Valida las columnas pedidas contra la lista blanca de la tabla.
+
+    Sin columnas se devuelven todas las de la lista blanca (nunca SELECT *),
+    así las columnas nuevas no salen de SQLite salvo que se pidan.
+    """
+    allowed = TABLE_COLUMNS[table]
+    if not columns:
+        return list(allowed)
+    invalid = [c for c in columns if c not in allowed]
+    if invalid:
+        raise ValueError(f"Columnas no válidas: {', '.join(invalid)}")
+    return list(dict.fromkeys(columns))
+
+
+def _write_columns(table: str, data: Dict[str, Any]) -> tuple:
+    """Valida las claves de data y las devuelve en el orden canónico de la tabla.
+
+    Mismo conjunto de columnas => misma tupla => mismo texto SQL, sea cual sea
+    el orden de las claves del dict. "id" y "version" se ignoran (no son escribibles).
+    """
+    allowed = WRITABLE_COLUMNS[table]
+    invalid = [k for k in data if k not in allowed and k not in ("id", "version")]
+    if invalid:
+        raise ValueError(f"Columnas no válidas: {', '.join(invalid)}")
+    return tuple(c for c in allowed if c in data)
+
+
+@functools.lru_cache(maxsize=None)
+def _insert_sql(table: str, columns: tuple) -> str:
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+@functools.lru_cache(maxsize=None)
+def _update_sql(table: str, columns: tuple, checked: bool = False) -> str:
+    """UPDATE que incrementa version; checked añade la comparación "AND version = ?" """
+    sets = ", ".join(f"{c} = ?" for c in columns)
+    return f"UPDATE {table} SET {sets}, version = version + 1 WHERE id = ?{' AND version = ?' if checked else ''}"
+
+
+@functools.lru_cache(maxsize=None)
+def _upsert_employee_sql(columns: tuple) -> str:
+    # creation_date solo se fija al insertar; si nada cambia la fila no se reescribe
+    update_columns = [c for c in columns if c not in ("employee_id", "creation_date")]
+    sets = ", ".join([f"{c} = excluded.{c}" for c in update_columns] + ["version = employees.version + 1"])
+    changed = " OR ".join(f"employees.{c} IS NOT excluded.{c}" for c in update_columns)
+    return (f"{_insert_sql('employees', columns)} "
+            f"ON CONFLICT(employee_id) DO UPDATE SET {sets} WHERE {changed} RETURNING id")
+
+
+def _check_upsert_employee(data: Dict[str, Any]):
+    """Valida una fila de upsert: employee_id es la clave, no puede faltar ni estar vacío.
+
+    Con NULL, ON CONFLICT(employee_id) nunca coincide (cada llamada insertaría
+    un duplicado); con "" todas las filas sin ID se fundirían en una.
+    """
+    if not all(k in data for k in ("name", "surname", "employee_id", "status")):
+        raise ValueError("Faltan campos requeridos")
+    employee_id = data["employee_id"]
+    if employee_id is None or not str(employee_id).strip():
+        raise ValueError("El ID Seguridad Social es obligatorio para crear o actualizar por employee_id")
+
+
+def _like_prefix(term: str) -> str:
+    """Patrón LIKE 'term%' con los comodines escapados"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+class ConflictError(Exception):
+    """El registro cambió (o se borró) desde que se leyó: la escritura no se aplicó.
+
+    current contiene el registro tal y como está ahora en la base de datos.
+    """
+
+    def __init__(self, table: str, current: Dict[str, Any]):
+        super().__init__(
+            f"El registro {current['id']} de {table} fue modificado por otra sesión "
+            f"(versión actual {current['version']})"
+        )
+        self.table = table
+        self.current = current
+
+
+def _employee_integrity_error(error: sqlite3.IntegrityError, duplicate_message: str) -> ValueError:
+    """Traduce un IntegrityError de employees a un ValueError con mensaje legible"""
+    if "employees.employee_id" in str(error):
+        return ValueError(duplicate_message)
+    if "CHECK constraint failed" in str(error):
+        return ValueError("Estado no válido: debe ser 'Active' o 'Inactive'")
+    if "NOT NULL constraint failed" in str(error):
+        return ValueError("Faltan campos requeridos")
+    return ValueError(f"Datos de empleado no válidos: {error}")
+
+
+class _PooledConnection:
+    """Conexión prestada por el pool: close() la devuelve en lugar de cerrarla"""
+
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn: sqlite3.Connection, pool: "ConnectionPool"):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Pool LIFO de conexiones SQLite.
+
+    Reutilizar conexiones evita abrir el fichero en cada llamada y, sobre todo,
+    conserva la caché de sentencias preparadas de cada conexión (sqlite3 la
+    guarda por conexión), así el SQL repetido no se vuelve a compilar.
+    Cada conexión la usa un solo hilo a la vez (se presta en exclusiva).
+    """
+
+    def __init__(self, db_path: str, size: int):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=max(size, 1))
+
+    def _connect(self) -> sqlite3.Connection:
+        return monitor.attach(sqlite3.connect(self.db_path, check_same_thread=False))
+
+    def acquire(self):
+        if self.size <= 0:
+            return self._connect()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        return _PooledConnection(conn, self)
+
+    def release(self, conn: sqlite3.Connection):
+        # Nunca devolver al pool una transacción a medias
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class AssignmentIndex:
+    """
+    Espejo en memoria de la tabla assignments (sitio -> empleados y
+    empleado -> sitios) para que el Kanban y los informes pregunten sin ir
+    a SQLite.
+
+    - Se carga entero una vez (una consulta) y las lecturas son O(1).
+    - Las altas/bajas de asignaciones (también las masivas) se escriben a
+      través del índice, en su propia conexión y en una transacción
+      IMMEDIATE, y se aplican al espejo tras el commit (write-through).
+    - db_meta.assignments_version (triggers de assignments) solo cambia
+      cuando cambian las asignaciones: si otra conexión u otro proceso las
+      modifica, el espejo se recarga en la siguiente lectura. Las escrituras
+      de sitios, empleados o del planificador no lo invalidan.
+
+    Los conjuntos son dicts con valor None: O(1) y con el orden de inserción.
+    """
+
+    def __init__(self, db_path: str):
+        self._conn = monitor.attach(sqlite3.connect(db_path, check_same_thread=False, isolation_level=None))
+        self._lock = threading.RLock()
+        self._by_site: Dict[int, Dict[int, None]] = {}
+        self._by_employee: Dict[int, Dict[int, None]] = {}
+        self._version = None  # assignments_version reflejada en el espejo
+        self.loads = 0
+        self.lookups = 0
+
+    def _read_version(self) -> int:
+        row = self._conn.execute("SELECT value FROM db_meta WHERE key = 'assignments_version'").fetchone()
+        return row[0] if row else 0
+
+    def _refresh(self):
+        self.lookups += 1
+        version = self._read_version()
+        if version == self._version:
+            return
+        by_site, by_employee = {}, {}
+        for site_id, emp_id in self._conn.execute("SELECT site_id, employee_id FROM assignments ORDER BY id"):
+            by_site.setdefault(site_id, {})[emp_id] = None
+            by_employee.setdefault(emp_id, {})[site_id] = None
+        self._by_site, self._by_employee = by_site, by_employee
+        self._version = version
+        self.loads += 1
+
+    def employees_for_site(self, site_id: int) -> List[int]:
+        with self._lock:
+            self._refresh()
+            return list(self._by_site.get(site_id, ()))
+
+    def sites_for_employee(self, emp_id: int) -> List[int]:
+        with self._lock:
+            self._refresh()
+            return list(self._by_employee.get(emp_id, ()))
+
+    def assigned_employee_ids(self) -> set:
+        with self._lock:
+            self._refresh()
+            return set(self._by_employee)
+
+    def all(self) -> Dict[int, List[int]]:
+        with self._lock:
+            self._refresh()
+            return {site_id: list(emps) for site_id, emps in sorted(self._by_site.items())}
+
+    def assign(self, site_id: int, emp_id: int, assignment_date: str) -> bool:
+        return self.bulk([(site_id, emp_id)], (), assignment_date)["assigned"][0]
+
+    def remove(self, site_id: int, emp_id: int) -> bool:
+        return self.bulk((), [(site_id, emp_id)], None)["removed"][0]
+
+    def bulk(self, assign, remove, assignment_date: Optional[str]) -> Dict[str, List[bool]]:
+        """
+        Remove then assign (site_id, emp_id) pairs in one IMMEDIATE transaction
+        on the index connection, then apply the changes to the mirror.
+
+        Inside the transaction no other connection can write, so the mirror
+        is brought up to date first and the version read after the writes
+        is exactly the one the updated mirror reflects.
+        """
+        assigned, removed = [], []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                for site_id, emp_id in remove:
+                    cursor = self._conn.execute(
+                        "DELETE FROM assignments WHERE site_id = ? AND employee_id = ?", (site_id, emp_id)
+                    )
+                    removed.append(cursor.rowcount > 0)
+                for site_id, emp_id in assign:
+                    try:
+                        cursor = self._conn.execute(
+                            "INSERT OR IGNORE INTO assignments (site_id, employee_id, assignment_date) "
+                            "VALUES (?, ?, ?)",
+                            (site_id, emp_id, assignment_date)
+                        )
+                        assigned.append(cursor.rowcount > 0)
+                    except sqlite3.IntegrityError:
+                        # Solo se deshace esta sentencia; la transacción sigue
+                        assigned.append(False)
+                version = self._read_version()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            for (site_id, emp_id), done in zip(remove, removed):
+                if done:
+                    for mapping, key, value in ((self._by_site, site_id, emp_id),
+                                                (self._by_employee, emp_id, site_id)):
+                        members = mapping.get(key)
+                        if members is not None:
+                            members.pop(value, None)
+                            if not members:
+                                del mapping[key]
+            for (site_id, emp_id), done in zip(assign, assigned):
+                if done:
+                    self._by_site.setdefault(site_id, {})[emp_id] = None
+                    self._by_employee.setdefault(emp_id, {})[site_id] = None
+            self._version = version
+        return {"assigned": assigned, "removed": removed}
+
+    def check(self, conn) -> List[str]:
+        """Diferencias entre el espejo y la tabla leída con conn (lista vacía = consistente)"""
+        with self._lock:
+            self._refresh()
+            expected = {}
+            for site_id, emp_id in conn.execute("SELECT site_id, employee_id FROM assignments"):
+                expected.setdefault(site_id, set()).add(emp_id)
+
+            problems = []
+            for site_id in sorted(set(expected) | set(self._by_site)):
+                in_db = expected.get(site_id, set())
+                in_index = set(self._by_site.get(site_id, ()))
+                if in_db != in_index:
+                    problems.append(f"site {site_id}: db={sorted(in_db)} index={sorted(in_index)}")
+            reverse = {(site_id, emp_id) for emp_id, sites in self._by_employee.items() for site_id in sites}
+            forward = {(site_id, emp_id) for site_id, emps in self._by_site.items() for emp_id in emps}
+            if reverse != forward:
+                problems.append(f"employee->site map out of sync: {sorted(reverse ^ forward)}")
+            return problems
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 
 class ConstructionDB:
-    def __init__(self, db_path: str = "construction_system.db"):
+    # Conexiones inactivas que se conservan abiertas (0 = una conexión nueva por llamada)
+    POOL_SIZE = 8
+
+    def __init__(self, db_path: str = "construction_system.db", pool_size: Optional[int] = None,
+                 assignment_index: bool = False):
         self.db_path = db_path
+        self._pool = ConnectionPool(db_path, self.POOL_SIZE if pool_size is None else pool_size)
+        self._counts_cache = None  # (data_version, counts)
+        self.counts_hits = self.counts_misses = 0
+        self._assignment_index = None
         self.init_database()
         self._seed_initial_data()  # datos de ejemplo solo si está vacío
+        if assignment_index:
+            # Espejo en memoria de assignments (ver AssignmentIndex)
+            self._assignment_index = AssignmentIndex(db_path)
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._pool.acquire()
+
+    def close(self):
+        """Cierra las conexiones inactivas del pool (y la del índice de asignaciones)"""
+        self._pool.close_all()
+        if self._assignment_index is not None:
+            self._assignment_index.close()
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """Vista de solo lectura y consistente de toda la base de datos.
+
+        Abre una conexión read-only (file:...?mode=ro) y una única transacción
+        de lectura: todas las consultas hechas con el objeto devuelto ven los
+        datos tal y como estaban al empezar, aunque otras sesiones escriban
+        mientras tanto. Con WAL la lectura no bloquea a los escritores ni
+        espera por ellos.
+
+        Uso:
+            with db.snapshot() as snap:
+                sites = snap.get_sites()
+                assignments = snap.get_all_assignments()
+        """
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = monitor.attach(sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False))
+        try:
+            conn.execute("BEGIN")
+            yield ReadSnapshot(self.db_path, conn)
+        finally:
+            # Cerrar sin COMMIT termina la transacción de lectura
+            conn.close()
 
     def init_database(self):
         """Crear tablas si no existen – ahora con AUTOINCREMENT"""
         conn = self._get_connection()
         cursor = conn.cursor()
 
+        # WAL: los lectores (informes, snapshots) no bloquean a los escritores
+        cursor.execute("PRAGMA journal_mode=WAL")
+
         # Tabla construction_sites – ID autoincremental
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS construction_sites (
@@ -56,12 +448,64 @@ class ConstructionDB:
             )
         ''')
 
+        # Versión de fila para control de concurrencia optimista (migración de BDs existentes)
+        for table in ("construction_sites", "employees"):
+            existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+            if "version" not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+        # Versión de datos: contador global que los triggers incrementan en cada
+        # cambio de sitios, empleados o asignaciones (claves de caché baratas)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS db_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('data_version', 0)")
+        # Contador propio de assignments: el índice en memoria solo se recarga
+        # cuando cambian las asignaciones, no con cualquier escritura
+        cursor.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('assignments_version', 0)")
+        for table in ("construction_sites", "employees", "assignments"):
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE db_meta SET value = value + 1 WHERE key = 'data_version';
+                    END
+                """)
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_assignments_{event.lower()}_assignments_version
+                AFTER {event} ON assignments
+                BEGIN
+                    UPDATE db_meta SET value = value + 1 WHERE key = 'assignments_version';
+                END
+            """)
+
+        # Índices por estado: los conteos agregados se resuelven sobre el índice
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sites_status ON construction_sites(status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_status ON employees(status)")
+
+        # Índices NOCASE: búsquedas por prefijo (LIKE 'abc%') y ordenación por nombre
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sites_name ON construction_sites(name COLLATE NOCASE)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_name ON employees(name COLLATE NOCASE)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_surname ON employees(surname COLLATE NOCASE)")
+
+        # Índices de ordenación con la misma expresión que el ORDER BY de _query_table
+        # (IFNULL(col, '')): cada página lee solo sus filas, sin ordenar todo el filtro
+        for table, prefix in (("construction_sites", "sites"), ("employees", "employees")):
+            for column in sorted(NULLABLE_SORT_COLUMNS & set(TABLE_COLUMNS[table])):
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{prefix}_sort_{column} "
+                               f"ON {table}({_sort_expression(column)})")
+
         conn.commit()
         conn.close()
 
     def _seed_initial_data(self):
         """Inserta datos de ejemplo SOLO si las tablas están vacías"""
-        if len(self.get_sites()) == 0:
+        if len(self.get_sites(columns=["id"])) == 0:
             initial_sites = [
                 {"name": "12 Buildings in Minnesota", "manager": "Juan Pérez", "phone": "555-0101", "creation_date": "2024-01-15", "status": "Active"},
                 {"name": "Soccer Camp NYC", "manager": "María Gómez", "phone": "555-0102", "creation_date": "2024-02-20", "status": "Active"},
@@ -70,7 +514,7 @@ class ConstructionDB:
             for site in initial_sites:
                 self.create_site(site)
 
-        if len(self.get_employees()) == 0:
+        if len(self.get_employees(columns=["id"])) == 0:
             initial_employees = [
                 {"name": "Luis", "surname": "Fernández", "employee_id": "SS-12345", "creation_date": "2024-01-10", "status": "Active"},
                 {"name": "Sofía", "surname": "Martínez", "employee_id": "SS-12346", "creation_date": "2024-02-15", "status": "Active"},
@@ -80,25 +524,211 @@ class ConstructionDB:
             for emp in initial_employees:
                 self.create_employee(emp)
 
+    # ────────────────────────────────────────────────
+    # ESTADÍSTICAS
+    # ────────────────────────────────────────────────
+
+    def get_counts(self) -> Dict[str, Dict[str, int]]:
+        """Conteos por estado de sitios y empleados en una sola consulta agregada.
+
+        El resultado se reutiliza mientras no cambie data_version, es decir,
+        hasta la siguiente escritura de cualquier instancia o proceso: los
+        totales del paginador coinciden siempre con las filas mostradas.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM db_meta WHERE key = 'data_version'")
+        row = cursor.fetchone()
+        version = row[0] if row else 0
+        cached = self._counts_cache
+        if cached and cached[0] == version:
+            conn.close()
+            self.counts_hits += 1
+            return {table: dict(values) for table, values in cached[1].items()}
+        self.counts_misses += 1
+
+        counts = {
+            "sites": {"total": 0, "Active": 0, "Inactive": 0},
+            "employees": {"total": 0, "Active": 0, "Inactive": 0},
+        }
+        # La versión se leyó antes que los conteos: si otra escritura llega en
+        # medio, la siguiente llamada verá otra versión y volverá a contar
+        cursor.execute("""
+            SELECT 'sites', status, COUNT(*) FROM construction_sites GROUP BY status
+            UNION ALL
+            SELECT 'employees', status, COUNT(*) FROM employees GROUP BY status
+        """)
+        for table, status, count in cursor.fetchall():
+            counts[table]["total"] += count
+            if status in counts[table]:
+                counts[table][status] = count
+        conn.close()
+
+        self._counts_cache = (version, counts)
+        return {table: dict(values) for table, values in counts.items()}
+
+    def _invalidate_counts(self):
+        self._counts_cache = None
+
+    def data_version(self) -> int:
+        """Versión actual de los datos; cambia con cualquier escritura, de cualquier proceso"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM db_meta WHERE key = 'data_version'")
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else 0
+
+    def _raise_if_conflict(self, conn, table: str, record_id: int, expected_version: Optional[int]):
+        """Tras una escritura condicionada que no afectó filas: ConflictError si el registro existe"""
+        if expected_version is None:
+            return
+        columns = _select_list(table)
+        row = conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (record_id,)).fetchone()
+        if row is not None:
+            raise ConflictError(table, dict(zip(columns, row)))
+
+    def _exists_unchanged(self, table: str, record_id: int, expected_version: Optional[int]) -> bool:
+        """Actualización sin columnas escribibles: no escribe, pero comprueba como el UPDATE.
+
+        Retorna si el registro existe; con expected_version lanza ConflictError
+        si la versión guardada es otra.
+        """
+        conn = self._get_connection()
+        try:
+            row = conn.execute(f"SELECT version FROM {table} WHERE id = ?", (record_id,)).fetchone()
+            if row is not None and expected_version is not None and row[0] != expected_version:
+                self._raise_if_conflict(conn, table, record_id, expected_version)
+        finally:
+            conn.close()
+        return row is not None
+
+    # ────────────────────────────────────────────────
+    # CONSULTAS PAGINADAS (filtros, proyección y orden en SQL)
+    # ────────────────────────────────────────────────
+
+    def _query_table(self, table: str, where: List[str], params: List[Any],
+                     sort: str, columns: Optional[List[str]], after_key: Optional[tuple],
+                     limit: int, descending: bool, with_total: bool = True) -> Dict[str, Any]:
+        """Una página de resultados con paginación por clave (sort, id).
+
+        Retorna {"rows": [...], "total": int | None, "next_key": tuple | None}.
+        next_key se pasa como after_key para pedir la página siguiente. Con
+        with_total=False no se cuenta el filtro completo (total es None).
+        """
+        if sort not in TABLE_COLUMNS[table]:
+            raise ValueError(f"Columna de orden no válida: {sort}")
+        columns = _select_list(table, columns)
+
+        sort_expr = _sort_expression(sort)
+        # Además de las columnas pedidas solo se leen id y la columna de orden
+        # (la clave de paginación); se descartan antes de devolver las filas
+        select_columns = list(dict.fromkeys(["id", sort] + columns))
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+        page_where = list(where)
+        page_params = list(params)
+        if after_key is not None:
+            # El primer término es un rango sobre el índice de ordenación (la
+            # comparación de tuplas sola no lo aprovecha y recorre desde el inicio)
+            operator = "<" if descending else ">"
+            page_where.append(f"{sort_expr} {operator}= ? AND ({sort_expr}, id) {operator} (?, ?)")
+            page_params.extend([after_key[0], *after_key])
+        page_where_sql = f" WHERE {' AND '.join(page_where)}" if page_where else ""
+        direction = "DESC" if descending else "ASC"
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        total = None
+        if with_total:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}{where_sql}", params)
+            total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT {', '.join(select_columns)} FROM {table}{page_where_sql} "
+            f"ORDER BY {sort_expr} {direction}, id {direction} LIMIT ?",
+            page_params + [limit + 1]
+        )
+        fetched = [dict(zip(select_columns, row)) for row in cursor.fetchall()]
+        conn.close()
+
+        has_more = len(fetched) > limit
+        fetched = fetched[:limit]
+        next_key = None
+        if has_more and fetched:
+            last = fetched[-1]
+            next_key = ("" if last[sort] is None and sort in NULLABLE_SORT_COLUMNS else last[sort], last["id"])
+
+        rows = [{c: row[c] for c in columns} for row in fetched]
+        return {"rows": rows, "total": total, "next_key": next_key}
+
+    def query_sites(self, status: Optional[str] = None, search: Optional[str] = None, sort: str = "id",
+                    columns: Optional[List[str]] = None, after_key: Optional[tuple] = None,
+                    limit: int = 50, descending: bool = False, record_id: Optional[int] = None,
+                    with_total: bool = True) -> Dict[str, Any]:
+        """Página de sitios filtrada por estado, prefijo de nombre o id (registro elegido en la búsqueda)"""
+        where, params = [], []
+        if record_id is not None:
+            where.append("id = ?")
+            params.append(record_id)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if search:
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(search.strip()))
+        return self._query_table("construction_sites", where, params,
+                                 sort, columns, after_key, limit, descending, with_total)
+
+    def query_employees(self, status: Optional[str] = None, search: Optional[str] = None, sort: str = "id",
+                        columns: Optional[List[str]] = None, after_key: Optional[tuple] = None,
+                        limit: int = 50, descending: bool = False,
+                        record_id: Optional[int] = None, with_total: bool = True) -> Dict[str, Any]:
+        """Página de empleados filtrada por estado, prefijo de nombre/apellido o id.
+
+        "Ana" busca por prefijo en nombre o apellido; "Ana Gó" busca nombre
+        "Ana%" y apellido "Gó%". record_id limita la página a ese empleado.
+        """
+        where, params = [], []
+        if record_id is not None:
+            where.append("id = ?")
+            params.append(record_id)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if search:
+            parts = search.split()
+            if len(parts) >= 2:
+                where.append("name LIKE ? ESCAPE '\\' AND surname LIKE ? ESCAPE '\\'")
+                params.extend([_like_prefix(parts[0]), _like_prefix(" ".join(parts[1:]))])
+            elif parts:
+                where.append("(name LIKE ? ESCAPE '\\' OR surname LIKE ? ESCAPE '\\')")
+                params.extend([_like_prefix(parts[0]), _like_prefix(parts[0])])
+        return self._query_table("employees", where, params,
+                                 sort, columns, after_key, limit, descending, with_total)
+
     # ────────────────────────────────────────────────
     # CONSTRUCTION_SITES
     # ────────────────────────────────────────────────
 
-    def get_sites(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
-        query = "SELECT * FROM construction_sites"
+    def get_sites(self, status: Optional[str] = None, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        query = f"SELECT {', '.join(_select_list('construction_sites', columns))} FROM construction_sites"
         params = []
         if status:
             query += " WHERE status = ?"
             params.append(status)
         conn = self._get_connection()
-        df = pd.read_sql_query(query, conn, params=params)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
         conn.close()
-        return df.to_dict(orient="records")
+        return rows
 
-    def get_site_by_id(self, site_id: int) -> Optional[Dict[str, Any]]:
+    def get_site_by_id(self, site_id: int, columns: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        select = ", ".join(_select_list("construction_sites", columns))
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM construction_sites WHERE id = ?", (site_id,))
+        cursor.execute(f"SELECT {select} FROM construction_sites WHERE id = ?", (site_id,))
         row = cursor.fetchone()
         conn.close()
         if row:
@@ -112,63 +742,85 @@ class ConstructionDB:
         if not all(k in data for k in required):
             raise ValueError("Faltan campos requeridos: name, status")
 
-        fields = ", ".join(data.keys())
-        placeholders = ", ".join("?" * len(data))
-        values = tuple(data.values())
+        columns = _write_columns("construction_sites", data)
+        values = tuple(data[c] for c in columns)
 
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute(f"INSERT INTO construction_sites ({fields}) VALUES ({placeholders})", values)
+        cursor.execute(_insert_sql("construction_sites", columns), values)
         new_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        self._invalidate_counts()
         return new_id
 
-    def update_site(self, site_id: int, data: Dict[str, Any]) -> bool:
-        if "id" in data:
-            del data["id"]
-        if not data:
-            return True
+    def update_site(self, site_id: int, data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Actualiza un sitio e incrementa su versión.
 
-        sets = ", ".join(f"{k} = ?" for k in data)
-        values = tuple(data.values()) + (site_id,)
+        Con expected_version la escritura es compare-and-swap: si la versión
+        guardada no coincide se lanza ConflictError con el registro actual.
+        Retorna False si el sitio no existe.
+        """
+        columns = _write_columns("construction_sites", data)
+        if not columns:
+            return self._exists_unchanged("construction_sites", site_id, expected_version)
+        values = tuple(data[c] for c in columns) + (site_id,)
+        if expected_version is not None:
+            values += (expected_version,)
 
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"UPDATE construction_sites SET {sets} WHERE id = ?", values)
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                cursor = conn.execute(_update_sql("construction_sites", columns, expected_version is not None), values)
+                updated = cursor.rowcount > 0
+                if not updated:
+                    self._raise_if_conflict(conn, "construction_sites", site_id, expected_version)
+        finally:
+            conn.close()
+        self._invalidate_counts()
         return updated
 
-    def delete_site(self, site_id: int) -> bool:
+    def delete_site(self, site_id: int, expected_version: Optional[int] = None) -> bool:
+        """Borra un sitio; con expected_version lanza ConflictError si cambió desde que se leyó"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM construction_sites WHERE id = ?", (site_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                if expected_version is None:
+                    cursor = conn.execute("DELETE FROM construction_sites WHERE id = ?", (site_id,))
+                else:
+                    cursor = conn.execute("DELETE FROM construction_sites WHERE id = ? AND version = ?",
+                                          (site_id, expected_version))
+                deleted = cursor.rowcount > 0
+                if not deleted:
+                    self._raise_if_conflict(conn, "construction_sites", site_id, expected_version)
+        finally:
+            conn.close()
+        self._invalidate_counts()
         return deleted
 
     # ────────────────────────────────────────────────
     # EMPLOYEES (mismo patrón)
     # ────────────────────────────────────────────────
 
-    def get_employees(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
-        query = "SELECT * FROM employees"
+    def get_employees(self, status: Optional[str] = None, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        query = f"SELECT {', '.join(_select_list('employees', columns))} FROM employees"
         params = []
         if status:
             query += " WHERE status = ?"
             params.append(status)
         conn = self._get_connection()
-        df = pd.read_sql_query(query, conn, params=params)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
         conn.close()
-        return df.to_dict(orient="records")
+        return rows
 
-    def get_employee_by_id(self, emp_id: int) -> Optional[Dict[str, Any]]:
+    def get_employee_by_id(self, emp_id: int, columns: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        select = ", ".join(_select_list("employees", columns))
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM employees WHERE id = ?", (emp_id,))
+        cursor.execute(f"SELECT {select} FROM employees WHERE id = ?", (emp_id,))
         row = cursor.fetchone()
         conn.close()
         if row:
@@ -177,74 +829,149 @@ class ConstructionDB:
         return None
 
     def create_employee(self, data: Dict[str, Any]) -> int:
+        """Inserta y retorna el ID generado.
+
+        La unicidad de employee_id la garantiza la restricción UNIQUE dentro
+        de la misma transacción (sin SELECT previo ni segunda conexión).
+        """
         required = {"name", "surname", "employee_id", "status"}
         if not all(k in data for k in required):
             raise ValueError("Faltan campos requeridos")
 
-        conn_check = self._get_connection()
-        cursor_check = conn_check.cursor()
-        cursor_check.execute("SELECT 1 FROM employees WHERE employee_id = ?", (data["employee_id"],))
-        if cursor_check.fetchone():
-            conn_check.close()
-            raise ValueError(f"El ID Seguridad Social {data['employee_id']} ya está en uso")
-        conn_check.close()
-
-        fields = ", ".join(data.keys())
-        placeholders = ", ".join("?" * len(data))
-        values = tuple(data.values())
+        columns = _write_columns("employees", data)
+        values = tuple(data[c] for c in columns)
 
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"INSERT INTO employees ({fields}) VALUES ({placeholders})", values)
-        new_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                cursor = conn.execute(_insert_sql("employees", columns), values)
+                new_id = cursor.lastrowid
+        except sqlite3.IntegrityError as e:
+            raise _employee_integrity_error(e, f"El ID Seguridad Social {data['employee_id']} ya está en uso") from None
+        finally:
+            conn.close()
+        self._invalidate_counts()
         return new_id
 
-    def update_employee(self, emp_id: int, data: Dict[str, Any]) -> bool:
-        if "id" in data:
-            del data["id"]
+    def update_employee(self, emp_id: int, data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Actualiza un empleado e incrementa su versión (compare-and-swap con expected_version)"""
+        columns = _write_columns("employees", data)
+        if not columns:
+            return self._exists_unchanged("employees", emp_id, expected_version)
+        values = tuple(data[c] for c in columns) + (emp_id,)
+        if expected_version is not None:
+            values += (expected_version,)
 
-        if "employee_id" in data:
-            conn_check = self._get_connection()
-            cursor_check = conn_check.cursor()
-            cursor_check.execute(
-                "SELECT 1 FROM employees WHERE employee_id = ? AND id != ?",
-                (data["employee_id"], emp_id)
-            )
-            if cursor_check.fetchone():
-                conn_check.close()
-                raise ValueError("El ID Seguridad Social ya está en uso por otro empleado")
-            conn_check.close()
+        conn = self._get_connection()
+        try:
+            with conn:
+                cursor = conn.execute(_update_sql("employees", columns, expected_version is not None), values)
+                updated = cursor.rowcount > 0
+                if not updated:
+                    self._raise_if_conflict(conn, "employees", emp_id, expected_version)
+        except sqlite3.IntegrityError as e:
+            raise _employee_integrity_error(e, "El ID Seguridad Social ya está en uso por otro empleado") from None
+        finally:
+            conn.close()
+        self._invalidate_counts()
+        return updated
 
-        if not data:
-            return True
+    def upsert_employee(self, data: Dict[str, Any]) -> int:
+        """Inserta o actualiza un empleado identificado por employee_id.
 
-        sets = ", ".join(f"{k} = ?" for k in data)
-        values = tuple(data.values()) + (emp_id,)
+        Una sola sentencia INSERT ... ON CONFLICT(employee_id) DO UPDATE; si
+        los datos no cambian la fila no se reescribe (no cambia data_version).
+        Retorna el ID interno del empleado.
+        """
+        _check_upsert_employee(data)
+        columns = _write_columns("employees", data)
+        values = tuple(data[c] for c in columns)
 
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"UPDATE employees SET {sets} WHERE id = ?", values)
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        try:
+            with conn:
+                cursor = conn.execute(_upsert_employee_sql(columns), values)
+                row = cursor.fetchone()
+                if row is None:
+                    # Sin cambios: la fila existente no se tocó
+                    row = conn.execute("SELECT id FROM employees WHERE employee_id = ?",
+                                       (data["employee_id"],)).fetchone()
+        except sqlite3.IntegrityError as e:
+            raise _employee_integrity_error(e, f"El ID Seguridad Social {data['employee_id']} ya está en uso") from None
+        finally:
+            conn.close()
+        self._invalidate_counts()
+        return row[0]
+
+    def bulk_upsert_employees(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Upsert de muchos empleados (importaciones) en una sola transacción.
 
-    def delete_employee(self, emp_id: int) -> bool:
+        Cada fila se trata como en upsert_employee, pero un solo commit para
+        todas; una fila no válida no detiene el resto. Retorna
+        {"changed": int, "unchanged": int, "errors": [(índice, mensaje), ...]}.
+        """
+        changed, unchanged, errors = 0, 0, []
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM employees WHERE id = ?", (emp_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                for index, data in enumerate(rows):
+                    try:
+                        _check_upsert_employee(data)
+                        columns = _write_columns("employees", data)
+                        cursor = conn.execute(_upsert_employee_sql(columns), tuple(data[c] for c in columns))
+                        if cursor.fetchone() is None:
+                            unchanged += 1
+                        else:
+                            changed += 1
+                    except ValueError as e:
+                        errors.append((index, str(e)))
+                    except sqlite3.IntegrityError as e:
+                        # Solo se deshace esta sentencia; la transacción sigue
+                        message = f"El ID Seguridad Social {data['employee_id']} ya está en uso"
+                        errors.append((index, str(_employee_integrity_error(e, message))))
+        finally:
+            conn.close()
+        self._invalidate_counts()
+        return {"changed": changed, "unchanged": unchanged, "errors": errors}
+
+    def delete_employee(self, emp_id: int, expected_version: Optional[int] = None) -> bool:
+        """Borra un empleado; con expected_version lanza ConflictError si cambió desde que se leyó"""
+        conn = self._get_connection()
+        try:
+            with conn:
+                if expected_version is None:
+                    cursor = conn.execute("DELETE FROM employees WHERE id = ?", (emp_id,))
+                else:
+                    cursor = conn.execute("DELETE FROM employees WHERE id = ? AND version = ?",
+                                          (emp_id, expected_version))
+                deleted = cursor.rowcount > 0
+                if not deleted:
+                    self._raise_if_conflict(conn, "employees", emp_id, expected_version)
+        finally:
+            conn.close()
+        self._invalidate_counts()
         return deleted
 
     # ────────────────────────────────────────────────
-    # ASSIGNMENTS (sin cambios por ahora)
+    # ASSIGNMENTS
     # ────────────────────────────────────────────────
 
+    def get_all_assignments(self) -> Dict[int, List[int]]:
+        """Todas las asignaciones en una sola consulta: {site_id: [employee_id, ...]}"""
+        if self._assignment_index is not None:
+            return self._assignment_index.all()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT site_id, employee_id FROM assignments ORDER BY site_id, id")
+        assignments = {}
+        for site_id, emp_id in cursor.fetchall():
+            assignments.setdefault(site_id, []).append(emp_id)
+        conn.close()
+        return assignments
+
     def get_assignments_for_site(self, site_id: int) -> List[int]:
+        if self._assignment_index is not None:
+            return self._assignment_index.employees_for_site(site_id)
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT employee_id FROM assignments WHERE site_id = ?", (site_id,))
@@ -252,9 +979,52 @@ class ConstructionDB:
         conn.close()
         return [row[0] for row in rows]
 
+    def get_sites_for_employee(self, emp_id: int) -> List[int]:
+        """Sitios a los que está asignado un empleado (vacío = sin asignar)"""
+        if self._assignment_index is not None:
+            return self._assignment_index.sites_for_employee(emp_id)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT site_id FROM assignments WHERE employee_id = ?", (emp_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def get_assigned_employee_ids(self) -> set:
+        """IDs de los empleados asignados a algún sitio (activo o inactivo)"""
+        if self._assignment_index is not None:
+            return self._assignment_index.assigned_employee_ids()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT employee_id FROM assignments")
+        rows = cursor.fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Aciertos y fallos de las cachés de esta instancia (conteos e índice de asignaciones)"""
+        stats = {"counts": {"hits": self.counts_hits, "misses": self.counts_misses}}
+        index = self._assignment_index
+        if index is not None:
+            # Cada lectura del índice comprueba data_version; solo recarga si cambió
+            stats["assignment_index"] = {"hits": index.lookups - index.loads, "misses": index.loads}
+        return stats
+
+    def check_assignment_index(self) -> List[str]:
+        """Compara el índice en memoria con la tabla assignments (lista vacía = consistente)"""
+        if self._assignment_index is None:
+            return []
+        conn = self._get_connection()
+        try:
+            return self._assignment_index.check(conn)
+        finally:
+            conn.close()
+
     def assign_employee_to_site(self, site_id: int, emp_id: int, assignment_date: Optional[str] = None) -> bool:
         if assignment_date is None:
             assignment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self._assignment_index is not None:
+            return self._assignment_index.assign(site_id, emp_id, assignment_date)
 
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -272,6 +1042,8 @@ class ConstructionDB:
             conn.close()
 
     def remove_assignment(self, site_id: int, emp_id: int) -> bool:
+        if self._assignment_index is not None:
+            return self._assignment_index.remove(site_id, emp_id)
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM assignments WHERE site_id = ? AND employee_id = ?", (site_id, emp_id))
@@ -280,6 +1052,42 @@ class ConstructionDB:
         conn.close()
         return deleted
 
+    def bulk_assignments(self, assign: Optional[List[tuple]] = None, remove: Optional[List[tuple]] = None,
+                         assignment_date: Optional[str] = None) -> Dict[str, List[bool]]:
+        """Quita y asigna pares (site_id, emp_id) en una sola transacción.
+
+        Primero se quitan y luego se asignan, así un traslado (quitar de un
+        sitio y asignar a otro) va en una sola llamada. Retorna
+        {"assigned": [...], "removed": [...]} con un bool por par, en el orden
+        recibido (False = ya estaba asignado / no existía). Con el índice de
+        asignaciones activo se escribe a través de él (write-through).
+        """
+        if assignment_date is None:
+            assignment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self._assignment_index is not None:
+            return self._assignment_index.bulk(list(assign or ()), list(remove or ()), assignment_date)
+        assigned, removed = [], []
+        conn = self._get_connection()
+        try:
+            with conn:
+                for site_id, emp_id in remove or ():
+                    cursor = conn.execute("DELETE FROM assignments WHERE site_id = ? AND employee_id = ?",
+                                          (site_id, emp_id))
+                    removed.append(cursor.rowcount > 0)
+                for site_id, emp_id in assign or ():
+                    try:
+                        cursor = conn.execute(
+                            "INSERT OR IGNORE INTO assignments (site_id, employee_id, assignment_date) VALUES (?, ?, ?)",
+                            (site_id, emp_id, assignment_date)
+                        )
+                        assigned.append(cursor.rowcount > 0)
+                    except sqlite3.IntegrityError:
+                        # Solo se deshace esta sentencia; la transacción sigue
+                        assigned.append(False)
+        finally:
+            conn.close()
+        return {"assigned": assigned, "removed": removed}
+
     def reset_database(self):
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -288,5 +1096,55 @@ class ConstructionDB:
         cursor.execute("DROP TABLE IF EXISTS construction_sites")
         conn.commit()
         conn.close()
+        self._invalidate_counts()
         self.init_database()
-        self._seed_initial_data()
\ No newline at end of file
+        self._seed_initial_data()
+
+
+class _PinnedConnection(_PooledConnection):
+    """La conexión de un snapshot: close() no la cierra (la cierra snapshot())"""
+
+    __slots__ = ()
+
+    def close(self):
+        self._conn = None
+
+
+class ReadSnapshot(ConstructionDB):
+    """
+    Los métodos de lectura de ConstructionDB sobre una única transacción de
+    lectura (ver ConstructionDB.snapshot()). La conexión es read-only: los
+    métodos de escritura fallan con sqlite3.OperationalError.
+    """
+
+    def __init__(self, db_path: str, conn: sqlite3.Connection):
+        self.db_path = db_path
+        self._conn = conn
+        self._counts_cache = None
+        self.counts_hits = self.counts_misses = 0
+        self._assignment_index = None  # siempre se lee la transacción fijada
+        # La primera lectura fija la instantánea de la transacción
+        self.version = self.data_version()
+
+    def _get_connection(self):
+        return _PinnedConnection(self._conn, None)
+
+    def close(self):
+        pass
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """Un snapshot dentro de otro es el mismo snapshot"""
+        yield self
+
+
+# Tiempo, filas y llamador de cada llamada pública (ver instrumentation.py)
+for _name in (
+    "get_counts", "data_version", "query_sites", "query_employees",
+    "get_sites", "get_site_by_id", "create_site", "update_site", "delete_site",
+    "get_employees", "get_employee_by_id", "create_employee", "update_employee", "upsert_employee",
+    "bulk_upsert_employees", "delete_employee", "get_all_assignments", "get_assignments_for_site",
+    "get_sites_for_employee", "get_assigned_employee_ids", "assign_employee_to_site", "remove_assignment",
+    "bulk_assignments", "reset_database",
+):
+    setattr(ConstructionDB, _name, monitor.timed(getattr(ConstructionDB, _name)))
@@ -0,0 +1,293 @@
+# diagnostics_module.py - Performance diagnostics of this server
+import sys
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+# IMPORTAR UI HELPERS
+from ui_helpers import apply_global_styles, metric_card_simple, render_info_message
+from instrumentation import ADMIN_ENV_VAR, diagnostics_admin, monitor
+from profiling import PROFILE_DIR, PROFILES_MAX, list_profiles, top_functions
+
+# Claves de session_state más pesadas que se muestran
+TOP_STATE_KEYS = 10
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _deep_size(value):
+    """Deep size in bytes (the same measure Streamlit uses for its own stats)"""
+    from streamlit.vendor.pympler.asizeof import asizeof
+    try:
+        return asizeof(value)
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def cache_hit_rates(db):
+    """
+    Hits/misses of every cache the app keeps.
+
+    Returns:
+        list: [{"Cache", "Hits", "Misses", "Hit rate"}]
+    """
+    db_stats = db.cache_stats()
+    stats = {"Site/employee counts (TTL)": db_stats["counts"]}
+    if "assignment_index" in db_stats:
+        stats["Assignment index"] = db_stats["assignment_index"]
+    # El informe solo tiene caché si la página Reports ya se abrió en este proceso
+    report_module = sys.modules.get("report_module")
+    if report_module is not None:
+        report_stats = report_module.get_report_cache().stats()
+        stats["Reports (by data version)"] = {"hits": report_stats["hits"], "misses": report_stats["misses"]}
+
+    rows = []
+    for name, values in stats.items():
+        total = values["hits"] + values["misses"]
+        rows.append({
+            "Cache": name,
+            "Hits": values["hits"],
+            "Misses": values["misses"],
+            "Hit rate": f"{values['hits'] / total:.0%}" if total else "—",
+        })
+    return rows
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def server_memory_stats():
+    """
+    Active sessions and memory of every session_state and st.cache_* of the
+    server, from Streamlit's runtime stats (None outside `streamlit run`).
+    Measuring walks every session, so the result is reused for 10 seconds.
+    """
+    from streamlit import runtime
+
+    if not runtime.exists():
+        return None
+    stats = runtime.get_instance().stats_mgr.get_stats()
+    memory = stats.get("cache_memory_bytes", [])
+    session_states = [s.byte_length for s in memory if s.category_name == "st_session_state"]
+    caches = {}
+    for stat in memory:
+        if stat.category_name != "st_session_state":
+            caches[stat.category_name] = caches.get(stat.category_name, 0) + stat.byte_length
+    return {
+        "active_sessions": sum(s.value for s in stats.get("active_sessions", [])),
+        "session_state_bytes": sum(session_states),
+        "largest_session_state_bytes": max(session_states, default=0),
+        "caches": caches,
+    }
+
+
+def session_state_sizes():
+    """Deep size of each key of the current session's state, largest first"""
+    sizes = [(key, _deep_size(value)) for key, value in st.session_state.to_dict().items()]
+    return sorted(sizes, key=lambda item: item[1], reverse=True)
+
+
+def show_rerun_tab():
+    reruns = monitor.rerun_stats()
+    if not reruns:
+        st.info("No reruns recorded yet.")
+        return
+    df = pd.DataFrame(reruns).rename(columns={
+        "page": "Page", "reruns": "Reruns", "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)",
+        "queries_p50": "DB calls p50", "queries_max": "DB calls max", "query_ms_avg": "DB time avg (ms)",
+        "statements_avg": "SQL statements avg", "payload_kb_avg": "Payload avg (KB)",
+    })
+    st.dataframe(df.round(1), width="stretch", hide_index=True)
+    st.caption(f"Last {len(monitor.reruns)} reruns of every session (bounded buffer).")
+
+
+def show_queries_tab():
+    methods = monitor.method_stats()
+    if methods:
+        df = pd.DataFrame(methods)[["method", "calls", "total_s", "avg_ms", "max_s", "rows"]]
+        df["total_s"] = df["total_s"] * 1000
+        df["max_s"] = df["max_s"] * 1000
+        df = df.rename(columns={"method": "Method", "calls": "Calls", "total_s": "Total (ms)",
+                                "avg_ms": "Avg (ms)", "max_s": "Max (ms)", "rows": "Rows"})
+        st.dataframe(df.round(2), width="stretch", hide_index=True)
+    else:
+        st.info("No ConstructionDB calls recorded yet.")
+
+    st.markdown(f"#### 🐢 Slow queries (≥ {monitor.slow_ms:g} ms)")
+    slow = list(monitor.slow)
+    if not slow:
+        st.caption("No slow calls.")
+    for entry in reversed(slow):
+        title = (f"{datetime.fromtimestamp(entry['time']):%H:%M:%S} • {entry['method']} • "
+                 f"{entry['ms']:.0f} ms • {entry['rows']} rows • {entry['caller']}")
+        with st.expander(title):
+            if entry["plans"] is None:
+                st.caption("EXPLAIN QUERY PLAN still running in the background...")
+            elif not entry["plans"]:
+                st.caption("No SQL captured for this call.")
+            for plan in entry["plans"] or []:
+                st.code(plan["sql"], language="sql")
+                st.text("\n".join(plan.get("plan", [])) or plan.get("error", ""))
+
+    recent = list(monitor.recent)
+    if recent:
+        st.markdown(f"#### 🕒 Recent calls (sampled {monitor.sample_rate:.0%})")
+        df = pd.DataFrame(recent[-100:][::-1])
+        df["time"] = df["time"].map(lambda t: f"{datetime.fromtimestamp(t):%H:%M:%S}")
+        st.dataframe(df.round(2), width="stretch", hide_index=True)
+
+    if monitor.trace_sql:
+        st.markdown("#### 🔎 Traced SQL")
+        traced = list(monitor.traced)[-100:][::-1]
+        st.dataframe(pd.DataFrame(traced or [{"time": None, "caller": None, "sql": None}]),
+                     width="stretch", hide_index=True)
+
+
+def show_memory_tab(db):
+    st.markdown("#### 🎯 Cache hit rates")
+    st.dataframe(pd.DataFrame(cache_hit_rates(db)), width="stretch", hide_index=True)
+
+    st.markdown("#### 👥 Sessions and memory")
+    server = server_memory_stats()
+    sizes = session_state_sizes()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sessions = server["active_sessions"] if server else monitor.sessions_seen()
+        st.markdown(metric_card_simple(value=sessions, label="Active Sessions" if server else "Sessions Seen",
+                                       color_scheme="blue", icon="👥"), unsafe_allow_html=True)
+    with col2:
+        total = server["session_state_bytes"] if server else sum(size for _, size in sizes)
+        st.markdown(metric_card_simple(value=_format_bytes(total), label="All session_state",
+                                       color_scheme="green", icon="🧠"), unsafe_allow_html=True)
+    with col3:
+        own = sum(size for _, size in sizes)
+        st.markdown(metric_card_simple(value=_format_bytes(own), label="This session_state",
+                                       color_scheme="yellow", icon="🙋"), unsafe_allow_html=True)
+
+    if server and server["caches"]:
+        st.caption("Streamlit caches: " + " • ".join(f"{name}: {_format_bytes(size)}"
+                                                      for name, size in server["caches"].items()))
+    if sizes:
+        df = pd.DataFrame([{"Key": key, "Size": _format_bytes(size)} for key, size in sizes[:TOP_STATE_KEYS]])
+        st.dataframe(df, width="stretch", hide_index=True)
+
+
+def show_payloads_tab():
+    payloads = monitor.largest_payloads()
+    if not payloads:
+        st.info("No element payloads recorded yet.")
+        return
+    df = pd.DataFrame(payloads)
+    df["size"] = df["bytes"].map(_format_bytes)
+    df = df.rename(columns={"page": "Page", "element": "Element", "path": "Position", "size": "Size"})
+    st.dataframe(df[["Page", "Element", "Position", "Size"]], width="stretch", hide_index=True)
+    st.caption("Largest single elements sent to the browser (protobuf bytes).")
+
+
+def show_settings_tab():
+    if not diagnostics_admin():
+        # Los ajustes afectan a todas las sesiones: en solo lectura sin permiso
+        st.markdown(render_info_message(
+            "🔒 Read-only",
+            f"These settings apply to every session of this server. Start it with "
+            f"{ADMIN_ENV_VAR}=1 to change them or clear the collected data.",
+            "info"
+        ), unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame([
+            {"Setting": "Instrumentation enabled", "Value": str(monitor.enabled)},
+            {"Setting": "Slow query threshold (ms)", "Value": f"{monitor.slow_ms:g}"},
+            {"Setting": "Sample rate", "Value": f"{monitor.sample_rate:.0%}"},
+            {"Setting": "Trace raw SQL", "Value": str(monitor.trace_sql)},
+        ]), width="stretch", hide_index=True)
+        return
+
+    with st.form("diagnostics_settings"):
+        enabled = st.checkbox("Instrumentation enabled", value=monitor.enabled)
+        slow_ms = st.number_input("Slow query threshold (ms)", min_value=0.0, value=float(monitor.slow_ms), step=50.0)
+        sample_rate = st.slider("Sample rate (recent calls / traced SQL)", 0.0, 1.0, float(monitor.sample_rate), 0.05)
+        trace_sql = st.checkbox("Trace raw SQL (set_trace_callback)", value=monitor.trace_sql)
+        if st.form_submit_button("💾 Apply", type="primary"):
+            monitor.configure(enabled=enabled, slow_ms=slow_ms, sample_rate=sample_rate, trace_sql=trace_sql)
+            st.success("✅ Settings applied to every session of this server.")
+    st.caption("Statements are captured on connections opened while instrumentation is enabled.")
+
+    if st.button("🗑️ Reset collected data", key="diagnostics_reset"):
+        monitor.reset()
+        st.success("✅ Diagnostics data cleared.")
+
+
+def show_profiles_tab():
+    admin = diagnostics_admin()
+    profiling = st.toggle("🔬 Profile every rerun of this session", disabled=not admin,
+                          value=admin and st.session_state.get("profile_reruns", False))
+    if admin and profiling != st.session_state.get("profile_reruns", False):
+        st.session_state.profile_reruns = profiling
+    if admin:
+        st.caption("Turn it on, reproduce the slow action on its page, then come back here. "
+                   "Adding `?profile=1` to the URL does the same. "
+                   f"Only the last {PROFILES_MAX} profiles are kept in `{PROFILE_DIR}/`.")
+    else:
+        st.caption(f"Profiling writes files on the server: start it with {ADMIN_ENV_VAR}=1 to enable it. "
+                   f"The last {PROFILES_MAX} profiles in `{PROFILE_DIR}/` are listed below.")
+
+    profiles = list_profiles()
+    if not profiles:
+        st.info("No profiles recorded yet.")
+        return
+
+    labels = {p["name"]: f"{p['created']} • {p['label']} • {p['duration_ms']:.0f} ms • {p['samples']} samples"
+              for p in profiles}
+    selected = st.selectbox("Profile", list(labels), format_func=labels.get, key="diagnostics_profile")
+    profile = next(p for p in profiles if p["name"] == selected)
+
+    try:
+        with open(profile["pstats"], "rb") as f:
+            pstats_data = f.read()
+        with open(profile["collapsed"], "rb") as f:
+            collapsed_data = f.read()
+    except OSError:
+        st.warning("⚠️ This profile was just rotated out; pick another one.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 pstats (cProfile)", pstats_data, file_name=f"{selected}.pstats",
+                           mime="application/octet-stream", key="download_pstats")
+    with col2:
+        st.download_button("📥 Collapsed stacks (flamegraph)", collapsed_data, file_name=f"{selected}.collapsed",
+                           mime="text/plain", key="download_collapsed")
+    with st.expander("Top functions (cumulative time)", expanded=True):
+        st.code(top_functions(profile["pstats"]), language=None)
+
+
+def show_diagnostics(db):
+    """Main view of the Diagnostics page"""
+    apply_global_styles()
+
+    if not monitor.enabled:
+        st.markdown(render_info_message(
+            "⚠️ Instrumentation Disabled",
+            "Enable it in the Settings tab to collect rerun and query data."
+            if diagnostics_admin() else f"Ask an administrator ({ADMIN_ENV_VAR}=1) to enable it.",
+            "warning"
+        ), unsafe_allow_html=True)
+
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["⏱️ Reruns", "🗃️ Queries", "🧠 Caches & Memory",
+                                                  "📦 Payloads", "🔬 Profiles", "⚙️ Settings"])
+    with tab1:
+        show_rerun_tab()
+    with tab2:
+        show_queries_tab()
+    with tab3:
+        show_memory_tab(db)
+    with tab4:
+        show_payloads_tab()
+    with tab5:
+        show_profiles_tab()
+    with tab6:
+        show_settings_tab()
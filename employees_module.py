@@ -6,18 +6,78 @@ from streamlit_searchbox import st_searchbox
 import time
 
 # IMPORTAR UI HELPERS
-from ui_helpers import apply_global_styles, render_page_header, metric_card_simple, get_current_date
+from ui_helpers import apply_global_styles, inject_stylesheet, render_page_header, metric_card_simple, get_current_date, \
+    keyset_pager_state, render_keyset_pager, status_badge_frame, status_column_config, record_picker, \
+    editing_version, render_conflict_message
+from database import ConflictError
+
+
+EMPLOYEE_COLUMN_LABELS = {
+    "id": "ID",
+    "name": "Name",
+    "surname": "Surname",
+    "employee_id": "Employee ID",
+    "creation_date": "Creation Date",
+    "status": "Status"
+}
+
+# Valores mostrados cuando otra sesión modificó el registro editado
+EMPLOYEE_CONFLICT_FIELDS = {"name": "Name", "surname": "Surname", "employee_id": "Employee ID", "status": "Status"}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_employees_page(data_version, status, record_id, sort, columns, after_key, limit, descending, _db):
+    """
+    One page of the table as a display-ready DataFrame.
+
+    Cached per data version: reruns that do not change data or filters skip
+    the query and the DataFrame build.
+
+    Returns:
+        tuple: (DataFrame, next_key)
+    """
+    page = _db.query_employees(
+        status=status,
+        record_id=record_id,
+        sort=sort,
+        columns=list(columns),
+        after_key=after_key,
+        limit=limit,
+        descending=descending,
+        with_total=False
+    )
+    df = pd.DataFrame(page["rows"], columns=list(columns))
+    df.columns = [EMPLOYEE_COLUMN_LABELS.get(col, col) for col in columns]
+    return status_badge_frame(df), page["next_key"]
+
+
+# Máximo de coincidencias que devuelve el selector de registros
+PICKER_LIMIT = 15
+
+
+def format_employee_label(emp: dict) -> str:
+    return f"{emp['name']} {emp['surname']} (ID: {emp['id']}) • {emp['status']}"
+
+
+def pick_employees(search_term: str, db) -> list:
+    """Search function for the Edit/Delete record picker: (label, id) tuples"""
+    term = search_term.strip()
+    columns = ["id", "name", "surname", "status"]
+    results = []
+    if term.isdigit():
+        emp = db.get_employee_by_id(int(term), columns=columns)
+        if emp:
+            results.append((format_employee_label(emp), emp["id"]))
+    page = db.query_employees(search=term, sort="name", columns=columns, limit=PICKER_LIMIT)
+    exact_ids = {record_id for _, record_id in results}
+    results.extend((format_employee_label(emp), emp["id"]) for emp in page["rows"] if emp["id"] not in exact_ids)
+    return results
 
 
 def search_employees(search_term: str, db):
-    """Search function for st_searchbox"""
-    employees = db.get_employees()
-    results = []
-    for emp in employees:
-        full_name = f"{emp['name']} {emp['surname']}"
-        if search_term.lower() in full_name.lower():
-            results.append(f"{full_name} (ID: {emp['id']})")
-    return results
+    """Search function for st_searchbox: (label, id) tuples, indexed name-prefix query, 10 results max"""
+    page = db.query_employees(search=search_term, sort="name", columns=["id", "name", "surname"], limit=10)
+    return [(f"{emp['name']} {emp['surname']} (ID: {emp['id']})", emp["id"]) for emp in page["rows"]]
 
 
 def show_employees(db):
@@ -26,14 +86,15 @@ def show_employees(db):
     # APLICAR ESTILOS GLOBALES
     apply_global_styles()
 
-    # Get fresh data from DB
-    employees = db.get_employees()
+    # Conteos agregados (una sola consulta) y versión de datos para las cachés
+    counts = db.get_counts()["employees"]
+    data_version = db.data_version()
 
     # ========== MÉTRICAS MEJORADAS CON UI HELPERS ==========
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        total_employees = len(employees)
+        total_employees = counts["total"]
         st.markdown(metric_card_simple(
             value=total_employees,
             label="Total Employees",
@@ -42,7 +103,7 @@ def show_employees(db):
         ), unsafe_allow_html=True)
 
     with col2:
-        active_employees = len([e for e in employees if e.get("status") == "Active"])
+        active_employees = counts["Active"]
         st.markdown(metric_card_simple(
             value=active_employees,
             label="Active Employees",
@@ -51,7 +112,7 @@ def show_employees(db):
         ), unsafe_allow_html=True)
 
     with col3:
-        inactive_employees = len([e for e in employees if e.get("status") == "Inactive"])
+        inactive_employees = counts["Inactive"]
         st.markdown(metric_card_simple(
             value=inactive_employees,
             label="Inactive Employees",
@@ -62,90 +123,7 @@ def show_employees(db):
     st.markdown("---")
 
     # ========== FILTROS HORIZONTALES ==========
-    st.markdown("""
-    <style>
-    .filters-section-employees {
-        background: linear-gradient(135deg, #f8fafc, #e2e8f0);
-        padding: 15px;
-        border-radius: 12px;
-        margin-bottom: 20px;
-        border: 1px solid #cbd5e1;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.06);
-    }
-    .filter-header-employees {
-        color: #1e40af;
-        font-weight: 700;
-        margin-bottom: 10px;
-        font-size: 14px;
-    }
-    .dataframe-container-employees {
-        border-radius: 10px;
-        overflow: hidden;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.08);
-        border: 1px solid #e2e8f0;
-        margin-top: 15px;
-    }
-
-    /* BOTONES CON HOVER COOL - EMPLEADOS */
-    .create-button-employees {
-        background: linear-gradient(135deg, #10b981, #059669) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        border-radius: 8px !important;
-    }
-    .create-button-employees:hover {
-        background: linear-gradient(135deg, #059669, #047857) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(16, 185, 129, 0.3) !important;
-    }
-
-    .update-button-employees {
-        background: linear-gradient(135deg, #3b82f6, #1d4ed8) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        border-radius: 8px !important;
-    }
-    .update-button-employees:hover {
-        background: linear-gradient(135deg, #2563eb, #1e40af) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(59, 130, 246, 0.3) !important;
-    }
-
-    .delete-button-employees {
-        background: linear-gradient(135deg, #ef4444, #dc2626) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        border-radius: 8px !important;
-    }
-    .delete-button-employees:hover {
-        background: linear-gradient(135deg, #dc2626, #b91c1c) !important;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(239, 68, 68, 0.3) !important;
-    }
-
-    /* COLOR DE STATUS EN DATAFRAME */
-    .status-active {
-        background-color: #d1fae5 !important;
-        color: #065f46 !important;
-        font-weight: 600 !important;
-        border-radius: 4px !important;
-        padding: 4px 8px !important;
-    }
-    .status-inactive {
-        background-color: #fee2e2 !important;
-        color: #991b1b !important;
-        font-weight: 600 !important;
-        border-radius: 4px !important;
-        padding: 4px 8px !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    inject_stylesheet("employees")
 
     st.markdown('<p class="filter-header-employees">🔍 FILTERS & CONTROLS</p>', unsafe_allow_html=True)
 
@@ -171,109 +149,67 @@ def show_employees(db):
     with columns_col:
         columns_to_show = st.multiselect(
             "Show columns:",
-            ["id", "name", "surname", "employee_id", "creation_date", "status"],
+            list(EMPLOYEE_COLUMN_LABELS),
             default=["id", "name", "surname", "employee_id", "status"],
             key="emp_columns_selector",
             label_visibility="visible"
         )
 
+    sort_col, order_col, size_col = st.columns([3, 2, 3])
+
+    with sort_col:
+        sort_by = st.selectbox(
+            "Sort by:",
+            list(EMPLOYEE_COLUMN_LABELS),
+            format_func=EMPLOYEE_COLUMN_LABELS.get,
+            key="emp_sort_by"
+        )
+
+    with order_col:
+        sort_order = st.selectbox("Order:", ["Ascending", "Descending"], key="emp_sort_order")
+
+    with size_col:
+        page_size = st.selectbox("Rows per page:", [25, 50, 100, 250], index=1, key="emp_page_size")
+
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # ========== DATAFRAME CON FILTROS APLICADOS ==========
-    df = pd.DataFrame(employees)
-    filtered_df = df.copy()
-
-    # Aplicar filtros
-    if status_filter != "All":
-        filtered_df = filtered_df[filtered_df["status"] == status_filter]
-
-    if selected_employee:
-        employee_name = selected_employee.split(" (ID: ")[0]
-        name_parts = employee_name.split()
-        if len(name_parts) >= 2:
-            filtered_df = filtered_df[
-                (filtered_df["name"] == name_parts[0]) &
-                (filtered_df["surname"] == name_parts[1])
-                ]
-        elif len(name_parts) == 1:
-            filtered_df = filtered_df[
-                (filtered_df["name"] == name_parts[0]) |
-                (filtered_df["surname"] == name_parts[0])
-                ]
-
-    if columns_to_show:
-        display_columns = []
-        for col in columns_to_show:
-            if col == "id":
-                display_columns.append("ID")
-            elif col == "name":
-                display_columns.append("Name")
-            elif col == "surname":
-                display_columns.append("Surname")
-            elif col == "employee_id":
-                display_columns.append("Employee ID")
-            elif col == "creation_date":
-                display_columns.append("Creation Date")
-            elif col == "status":
-                display_columns.append("Status")
-            else:
-                display_columns.append(col)
-
-        filtered_df = filtered_df[columns_to_show]
-        filtered_df.columns = display_columns
-
-    # Función para estilizar el DataFrame
-    def style_employees_dataframe(df):
-        if df.empty:
-            return df.style
-
-        # Crear una copia para no modificar el original
-        styled_df = df.copy()
-
-        # Aplicar clases CSS para status
-        if 'Status' in df.columns:
-            def format_status(val):
-                if val == "Active":
-                    return 'background-color: #d1fae5; color: #065f46; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
-                elif val == "Inactive":
-                    return 'background-color: #fee2e2; color: #991b1b; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
-                return ''
-
-            styled = df.style.applymap(format_status, subset=['Status'])
-        else:
-            styled = df.style
-
-        # Estilo general para la tabla
-        styled = styled.set_properties(**{
-            'border': '1px solid #e2e8f0',
-            'padding': '8px',
-            'border-radius': '4px'
-        })
-
-        # Estilo para encabezados
-        styled = styled.set_table_styles([{
-            'selector': 'th',
-            'props': [
-                ('background-color', '#1E88E5'),
-                ('color', 'white'),
-                ('font-weight', 'bold'),
-                ('padding', '10px'),
-                ('border-radius', '8px 8px 0 0')
-            ]
-        }])
-
-        return styled
-
-    # Mostrar DataFrame con estilos
+    # ========== CONSULTA PAGINADA (FILTROS, COLUMNAS Y ORDEN EN SQL) ==========
+    status_value = None if status_filter == "All" else status_filter
+    quick_search_id = selected_employee  # id del registro elegido (st_searchbox devuelve el valor de la tupla)
+    columns_value = columns_to_show or list(EMPLOYEE_COLUMN_LABELS)
+
+    cursors = keyset_pager_state(
+        "emp_pager",
+        (status_value, quick_search_id, tuple(columns_value), sort_by, sort_order, page_size)
+    )
+    filtered_df, next_key = load_employees_page(
+        data_version,
+        status_value,
+        quick_search_id,
+        sort_by,
+        tuple(columns_value),
+        cursors[-1],
+        page_size,
+        sort_order == "Descending",
+        db
+    )
+    # Total para el paginador: los conteos por estado ya cargados, o la única fila elegida
+    if quick_search_id is not None:
+        total_rows = len(filtered_df)
+    else:
+        total_rows = counts["total"] if status_value is None else counts[status_value]
+
+    # Mostrar DataFrame (estado como badges de color)
     if not filtered_df.empty:
-        styled_df = style_employees_dataframe(filtered_df)
         st.markdown('<div class="dataframe-container-employees">', unsafe_allow_html=True)
-        st.dataframe(styled_df, use_container_width=True, height=400)
+        st.dataframe(filtered_df, use_container_width=True, height=400, hide_index=True,
+                     column_config=status_column_config())
         st.markdown('</div>', unsafe_allow_html=True)
     else:
         st.info("📭 No employees found with the current filters")
 
-    st.caption(f"📋 Showing {len(filtered_df)} of {len(employees)} employees")
+    render_keyset_pager("emp_pager", cursors, next_key, total_rows, page_size,
+                        len(filtered_df), noun="employees")
 
     # ========== SECTION 2: TABS (CRUD) MEJORADOS ==========
     st.divider()
@@ -355,20 +291,21 @@ def show_employees(db):
     with tab2:
         st.markdown("<h4 style='color: #1d4ed8;'>Edit Existing Employee</h4>", unsafe_allow_html=True)
 
-        emp_ids = [emp["id"] for emp in employees]
-
-        if emp_ids:
-            # Selección del empleado
-            selected_id = st.selectbox(
-                "Select Employee ID to edit:",
-                emp_ids,
-                key="emp_modify_select_id",
-                help="Choose an employee ID from the list"
+        if counts["total"]:
+            # Selección del empleado (búsqueda por nombre, apellido o ID)
+            selected_emp = record_picker(
+                "Search employee to edit:",
+                key="emp_modify_picker",
+                search_function=lambda term: pick_employees(term, db),
+                load_record=db.get_employee_by_id,
+                format_label=format_employee_label,
+                data_version=data_version,
+                placeholder="Type a name, surname or ID..."
             )
-
-            selected_emp = db.get_employee_by_id(selected_id)
+            selected_id = selected_emp["id"] if selected_emp else None
 
             if selected_emp:
+                expected_version = editing_version("emp_modify_base_version", selected_emp)
                 st.info(f"📝 Editing: **{selected_emp['name']} {selected_emp['surname']}** (ID: `{selected_id}`)")
 
                 # Formulario de edición
@@ -411,12 +348,15 @@ def show_employees(db):
                         "status": new_status
                     }
                     try:
-                        if db.update_employee(selected_id, updated_data):
+                        if db.update_employee(selected_id, updated_data, expected_version=expected_version):
                             st.success(f"✅ Employee **'{new_name} {new_surname}'** updated successfully!")
+                            st.session_state.pop("emp_modify_base_version", None)
                             time.sleep(1)
                             st.rerun()
                         else:
                             st.warning("ℹ️ No changes applied or employee not found.")
+                    except ConflictError as e:
+                        render_conflict_message(e, EMPLOYEE_CONFLICT_FIELDS, key="emp_modify_base_version")
                     except ValueError as e:
                         st.error(f"❌ Error: {str(e)}")
                     except Exception as e:
@@ -428,18 +368,18 @@ def show_employees(db):
     with tab3:
         st.markdown("<h4 style='color: #dc2626;'>Delete Employee</h4>", unsafe_allow_html=True)
 
-        emp_ids = [emp["id"] for emp in employees]
-
-        if emp_ids:
-            # Selección del empleado a eliminar
-            delete_id = st.selectbox(
-                "Select Employee ID to delete:",
-                emp_ids,
-                key="emp_delete_select_id",
-                help="Choose an employee ID to delete"
+        if counts["total"]:
+            # Selección del empleado a eliminar (búsqueda por nombre, apellido o ID)
+            selected_emp = record_picker(
+                "Search employee to delete:",
+                key="emp_delete_picker",
+                search_function=lambda term: pick_employees(term, db),
+                load_record=db.get_employee_by_id,
+                format_label=format_employee_label,
+                data_version=data_version,
+                placeholder="Type a name, surname or ID..."
             )
-
-            selected_emp = db.get_employee_by_id(delete_id)
+            delete_id = selected_emp["id"] if selected_emp else None
 
             if selected_emp:
                 # Mostrar información del empleado seleccionado
@@ -467,12 +407,15 @@ def show_employees(db):
                                  type="primary",
                                  key="emp_delete_button",
                                  use_container_width=True):
-                        if db.delete_employee(delete_id):
-                            st.success("✅ Employee deleted successfully!")
-                            time.sleep(1)
-                            st.rerun()
-                        else:
-                            st.error("❌ Could not delete the employee.")
+                        try:
+                            if db.delete_employee(delete_id, expected_version=selected_emp["version"]):
+                                st.success("✅ Employee deleted successfully!")
+                                time.sleep(1)
+                                st.rerun()
+                            else:
+                                st.error("❌ Could not delete the employee.")
+                        except ConflictError as e:
+                            render_conflict_message(e, EMPLOYEE_CONFLICT_FIELDS)
                 else:
                     st.info("🔒 Please check the confirmation box to enable deletion")
         else:
@@ -0,0 +1,374 @@
+# instrumentation.py
+# Medición de la capa de datos: tiempo por llamada, consultas por rerun y slow-query log
+import collections
+import contextlib
+import functools
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de los buffers circulares (memoria acotada aunque el proceso viva semanas)
+RECENT_CALLS_MAX = 500
+SLOW_QUERIES_MAX = 100
+RERUNS_MAX = 500
+TRACED_SQL_MAX = 1000
+# Sentencias que se guardan por llamada para el EXPLAIN del slow-query log
+STATEMENTS_PER_CALL_MAX = 20
+# Elementos de Streamlit más pesados que se conservan (por página, tipo y posición)
+PAYLOADS_MAX = 20
+
+# Variable de entorno que habilita los controles de todo el servidor (ajustes
+# del monitor, borrado de datos y perfilado) en la página Diagnostics
+ADMIN_ENV_VAR = "DIAGNOSTICS_ADMIN"
+
+# Sentencias con plan de ejecución (BEGIN, PRAGMA, COMMIT... no lo tienen)
+EXPLAINABLE_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Literales de SQL: blobs X'..', cadenas '..' (con '' escapado) y números.
+# set_trace_callback entrega el SQL con los parámetros ya sustituidos
+# (nombres, employee_id...); solo se guarda la versión con "?".
+_SQL_LITERAL = re.compile(r"\b[xX]'[0-9a-fA-F]*'|'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+
+
+def diagnostics_admin() -> bool:
+    """True when this server was started with DIAGNOSTICS_ADMIN=1"""
+    return os.environ.get(ADMIN_ENV_VAR) == "1"
+
+
+def redact_sql(sql: str) -> str:
+    """SQL with every literal value replaced by ?"""
+    return _SQL_LITERAL.sub("?", sql)
+
+
+def _row_count(result) -> int:
+    """Filas devueltas (o afectadas) por un método de ConstructionDB"""
+    if isinstance(result, dict) and "rows" in result:
+        return len(result["rows"])  # query_sites / query_employees
+    if isinstance(result, (list, dict, set, tuple)):
+        return len(result)
+    if isinstance(result, bool):
+        return int(result)
+    return 0 if result is None else 1
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class QueryMonitor:
+    """
+    Process-wide instrumentation of ConstructionDB.
+
+    - Every public method call is timed and tagged with its caller
+      (page of the current rerun / calling function) and its row count.
+      Aggregates per method are exact; the list of recent calls is sampled
+      (sample_rate) into a ring buffer.
+    - Calls slower than slow_ms go to the slow-query log together with the
+      SQL they executed and its EXPLAIN QUERY PLAN. The plan is computed on
+      a background thread ("plans" is None until then, see wait_for_plans()).
+    - Stored SQL never includes bound values: literals become ? (redact_sql).
+    - monitor.rerun(page) aggregates the calls and statements of one script
+      run; the last RERUNS_MAX reruns are kept.
+    - trace_sql=True also keeps (sampled) every raw SQL statement, captured
+      with sqlite3's set_trace_callback.
+    - record_payload() keeps the PAYLOADS_MAX largest Streamlit elements
+      sent to the browser (see ui_helpers.monitored_rerun).
+    - subscribe() forwards every call and finished rerun to other
+      consumers (metrics.py).
+
+    Nested calls (a method calling another one) count once, in the outermost
+    call. Statements are only seen on connections opened while the monitor
+    is enabled (see attach()).
+
+    The trace callback runs for every statement of an attached connection,
+    not only for slow calls or with trace_sql: it is what counts statements
+    per rerun and keeps the SQL of a call until it is known to be slow
+    (capped at STATEMENTS_PER_CALL_MAX). This is the intended cost, about
+    1.5 us per statement (python benchmarks.py instrumentation); with
+    enabled=False the callback returns immediately.
+    """
+
+    def __init__(self, enabled: bool = True, slow_ms: float = 250.0, sample_rate: float = 0.1,
+                 trace_sql: bool = False):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.trace_sql = trace_sql
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._methods: Dict[str, Dict[str, Any]] = {}
+        self.recent = collections.deque(maxlen=RECENT_CALLS_MAX)
+        self.slow = collections.deque(maxlen=SLOW_QUERIES_MAX)
+        self.reruns = collections.deque(maxlen=RERUNS_MAX)
+        self.traced = collections.deque(maxlen=TRACED_SQL_MAX)
+        self._payloads: Dict[tuple, int] = {}  # (page, element, delta path) -> bytes
+        self._explainer: Optional[ThreadPoolExecutor] = None
+        self._call_listeners: List[Callable] = []
+        self._rerun_listeners: List[Callable] = []
+
+    def configure(self, **settings):
+        """
+        Change enabled, slow_ms, sample_rate or trace_sql at runtime.
+
+        Raises:
+            ValueError: Unknown setting or sample_rate outside 0-1
+        """
+        unknown = set(settings) - {"enabled", "slow_ms", "sample_rate", "trace_sql"}
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        if not 0 <= settings.get("sample_rate", self.sample_rate) <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        for name, value in settings.items():
+            setattr(self, name, value)
+        return self
+
+    def subscribe(self, on_call: Optional[Callable] = None, on_rerun: Optional[Callable] = None):
+        """
+        Register listeners: on_call(method, seconds, rows, error) after every
+        recorded call and on_rerun(rerun dict) after every script run.
+        """
+        if on_call is not None:
+            self._call_listeners.append(on_call)
+        if on_rerun is not None:
+            self._rerun_listeners.append(on_rerun)
+
+    def reset(self):
+        """Drop every aggregate and buffer"""
+        with self._lock:
+            self._methods.clear()
+            self._payloads.clear()
+        for buffer in (self.recent, self.slow, self.reruns, self.traced):
+            buffer.clear()
+
+    # ========== HOOKS ==========
+    def attach(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        """Install the statement trace callback on a new sqlite3 connection"""
+        if self.enabled:
+            conn.set_trace_callback(self._on_statement)
+        return conn
+
+    def _on_statement(self, sql: str):
+        if not self.enabled:
+            return  # conexiones abiertas antes de apagar el monitor
+        local = self._local
+        statements = getattr(local, "statements", None)
+        if statements is not None and len(statements) < STATEMENTS_PER_CALL_MAX:
+            statements.append(sql)
+        rerun = getattr(local, "rerun", None)
+        if rerun is not None:
+            rerun["statements"] += 1
+        if self.trace_sql and random.random() < self.sample_rate:
+            self.traced.append({"time": time.time(), "caller": getattr(local, "caller", None),
+                                "sql": redact_sql(sql)})
+
+    def timed(self, func):
+        """Decorator for ConstructionDB methods"""
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(db, *args, **kwargs):
+            local = self._local
+            if not self.enabled or getattr(local, "active", False):
+                return func(db, *args, **kwargs)
+
+            rerun = getattr(local, "rerun", None)
+            caller = f"{rerun['page'] if rerun else '-'}/{sys._getframe(1).f_code.co_name}"
+            local.active, local.caller, local.statements = True, caller, []
+            result, error = None, True
+            start = time.perf_counter()
+            try:
+                result = func(db, *args, **kwargs)
+                error = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                statements = local.statements
+                local.active, local.caller, local.statements = False, None, None
+                self._record(db, name, caller, elapsed, _row_count(result), statements, rerun, error)
+
+        return wrapper
+
+    def _record(self, db, name: str, caller: str, elapsed: float, rows: int,
+                statements: List[str], rerun: Optional[Dict[str, Any]], error: bool = False):
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = {"calls": 0, "total_s": 0.0, "max_s": 0.0, "rows": 0}
+            stats["calls"] += 1
+            stats["total_s"] += elapsed
+            stats["rows"] += rows
+            if elapsed > stats["max_s"]:
+                stats["max_s"] = elapsed
+
+        if rerun is not None:
+            rerun["queries"] += 1
+            rerun["query_s"] += elapsed
+            rerun["methods"][name] += 1
+
+        if random.random() < self.sample_rate:
+            self.recent.append({"time": time.time(), "method": name, "caller": caller,
+                                "ms": elapsed * 1000, "rows": rows})
+
+        if elapsed * 1000 >= self.slow_ms:
+            entry = {"time": time.time(), "method": name, "caller": caller,
+                     "ms": elapsed * 1000, "rows": rows, "plans": None}
+            self.slow.append(entry)
+            # El EXPLAIN no se hace en el hilo que llamó (el script del usuario)
+            self._explain_pool().submit(self._fill_plans, entry, db.db_path, statements)
+
+        for callback in self._call_listeners:
+            # Se ejecuta en el finally de timed(): un fallo aquí no debe
+            # sustituir el resultado o la excepción del método medido
+            try:
+                callback(name, elapsed, rows, error)
+            except Exception:
+                logger.exception("QueryMonitor call listener %r failed", callback)
+
+    def _explain_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._explainer is None:
+                self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+            return self._explainer
+
+    @staticmethod
+    def _fill_plans(entry: Dict[str, Any], db_path: str, statements: List[str]):
+        entry["plans"] = explain(db_path, statements)
+
+    def wait_for_plans(self, timeout: Optional[float] = None) -> bool:
+        """Block until the slow-query entries recorded so far have their plans"""
+        if self._explainer is None:
+            return True
+        future = self._explain_pool().submit(lambda: None)  # un solo hilo: se ejecuta tras los pendientes
+        return not wait([future], timeout).not_done
+
+    def record_payload(self, element: str, path: tuple, size: int):
+        """Size in bytes of one element sent to the browser during the current rerun"""
+        rerun = getattr(self._local, "rerun", None)
+        if rerun is None:
+            return
+        rerun["elements"] += 1
+        rerun["payload_bytes"] += size
+        key = (rerun["page"], element, path)
+        with self._lock:
+            if size > self._payloads.get(key, -1):
+                self._payloads[key] = size
+                # Poda amortizada: solo al doblar el tamaño conservado
+                if len(self._payloads) > 2 * PAYLOADS_MAX:
+                    largest = sorted(self._payloads.items(), key=lambda item: item[1], reverse=True)
+                    self._payloads = dict(largest[:PAYLOADS_MAX])
+
+    @contextlib.contextmanager
+    def rerun(self, page: str, session: Optional[str] = None):
+        """
+        Aggregate the ConstructionDB calls of one script run.
+
+        Usage:
+            with monitor.rerun(page):
+                main()
+        """
+        rerun = {"page": page, "session": session, "time": time.time(), "queries": 0, "query_s": 0.0,
+                 "statements": 0, "methods": collections.Counter(), "elements": 0, "payload_bytes": 0}
+        self._local.rerun = rerun
+        start = time.perf_counter()
+        try:
+            yield rerun
+        finally:
+            rerun["duration_s"] = time.perf_counter() - start
+            self._local.rerun = None
+            self.reruns.append(rerun)
+            for callback in self._rerun_listeners:
+                try:
+                    callback(rerun)
+                except Exception:
+                    logger.exception("QueryMonitor rerun listener %r failed", callback)
+
+    # ========== LECTURA ==========
+    def method_stats(self) -> List[Dict[str, Any]]:
+        """Aggregates per ConstructionDB method, slowest total time first"""
+        with self._lock:
+            rows = [dict(stats, method=name) for name, stats in self._methods.items()]
+        for row in rows:
+            row["avg_ms"] = row["total_s"] * 1000 / row["calls"]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def rerun_stats(self) -> List[Dict[str, Any]]:
+        """Per page: reruns kept, p50/p95 duration, queries and statements per rerun"""
+        by_page = collections.defaultdict(list)
+        for rerun in list(self.reruns):
+            by_page[rerun["page"]].append(rerun)
+        rows = []
+        for page, reruns in sorted(by_page.items()):
+            durations = [r["duration_s"] * 1000 for r in reruns]
+            queries = [r["queries"] for r in reruns]
+            rows.append({
+                "page": page,
+                "reruns": len(reruns),
+                "p50_ms": _percentile(durations, 0.5),
+                "p95_ms": _percentile(durations, 0.95),
+                "queries_p50": _percentile(queries, 0.5),
+                "queries_max": max(queries),
+                "query_ms_avg": sum(r["query_s"] for r in reruns) * 1000 / len(reruns),
+                "statements_avg": sum(r["statements"] for r in reruns) / len(reruns),
+                "payload_kb_avg": sum(r["payload_bytes"] for r in reruns) / 1024 / len(reruns),
+            })
+        return rows
+
+    def largest_payloads(self) -> List[Dict[str, Any]]:
+        """Largest elements seen, biggest first"""
+        with self._lock:
+            items = sorted(self._payloads.items(), key=lambda item: item[1], reverse=True)[:PAYLOADS_MAX]
+        return [{"page": page, "element": element, "path": ".".join(map(str, path)), "bytes": size}
+                for (page, element, path), size in items]
+
+    def sessions_seen(self) -> int:
+        """Distinct sessions among the reruns kept"""
+        return len({r["session"] for r in list(self.reruns) if r["session"] is not None})
+
+
+def explain(db_path: str, statements: List[str]) -> List[Dict[str, Any]]:
+    """
+    EXPLAIN QUERY PLAN of each distinct explainable statement, on a separate
+    read-only connection (the original one may be in use or closed). The
+    plan is taken on the statement as executed; the SQL returned is redacted.
+
+    Returns:
+        list: [{"sql": str, "plan": [str, ...]}] (or "error" instead of "plan")
+    """
+    # Una entrada por forma de sentencia (SQL sin literales -> primera ejecución vista)
+    candidates = {}
+    for sql in statements or ():
+        if sql.lstrip().upper().startswith(EXPLAINABLE_PREFIXES):
+            candidates.setdefault(redact_sql(sql), sql)
+    if not candidates:
+        return []
+
+    plans = []
+    try:
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return [{"sql": redacted, "error": str(e)} for redacted in candidates]
+    try:
+        for redacted, sql in candidates.items():
+            try:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+                plans.append({"sql": redacted, "plan": plan})
+            except sqlite3.Error as e:
+                plans.append({"sql": redacted, "error": str(e)})
+    finally:
+        conn.close()
+    return plans
+
+
+# Instancia del proceso: la comparten todas las sesiones y ConstructionDB
+monitor = QueryMonitor()
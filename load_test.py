@@ -0,0 +1,191 @@
+# load_test.py
+# Prueba de carga de la API REST (api.py): N clientes con conexión persistente
+#
+# Usage:
+#   python api.py --port 8503 &
+#   python load_test.py [--url http://127.0.0.1:8503] [--concurrency 8] [--duration 10]
+#                       [--write-ratio 0.1] [--token secret] [--output results.json]
+#
+# Cada cliente repite una mezcla de peticiones como la de un integrador:
+#   - recorre el listado de empleados/sitios siguiendo el cursor "next"
+#   - sondea /api/assignments con If-None-Match (la mayoría deberían ser 304)
+#   - con probabilidad --write-ratio, un lote de altas/bajas en /api/assignments/bulk
+# Sale con código 1 si alguna respuesta fue 5xx o hubo errores de conexión.
+import argparse
+import collections
+import gzip
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+# Pares (sitio, empleado) por lote de escritura
+BULK_PAIRS = 20
+# Páginas que recorre un cliente en cada pasada por un listado
+LIST_PAGES = 3
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+class Client:
+    """One simulated integration: a keep-alive connection and its own ETags"""
+
+    def __init__(self, url: str, token: Optional[str], results: Dict[str, Any], lock: threading.Lock):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = {"Accept-Encoding": "gzip"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.results = results
+        self.lock = lock
+        self.etags: Dict[str, str] = {}
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        self.site_ids: list = []
+        self.employee_ids: list = []
+
+    def request(self, endpoint: str, method: str, path: str, body=None, headers=None):
+        """One request, timed under `endpoint`; returns (status, parsed JSON or None, response)"""
+        payload = json.dumps(body).encode() if body is not None else None
+        all_headers = dict(self.headers, **(headers or {}))
+        if payload is not None:
+            all_headers["Content-Type"] = "application/json"
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=all_headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # se reconecta en la siguiente petición
+            status, raw, response = 0, b"", None
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.results["latencies"][endpoint].append(elapsed)
+            self.results["status"][status] += 1
+
+        data = None
+        if response is not None and raw:
+            if response.getheader("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+            data = json.loads(raw)
+        return status, data, response
+
+    def walk_list(self, resource: str):
+        cursor = None
+        for _ in range(LIST_PAGES):
+            params = {"limit": 50, "status": "Active"}
+            if cursor:
+                params["after"] = cursor
+            status, data, _ = self.request(f"GET /api/{resource}", "GET", f"/api/{resource}?{urlencode(params)}")
+            if status != 200:
+                return
+            ids = [row["id"] for row in data["items"]]
+            if resource == "sites":
+                self.site_ids = ids or self.site_ids
+            else:
+                self.employee_ids = ids or self.employee_ids
+            cursor = data["next"]
+            if not cursor:
+                return
+
+    def poll_assignments(self):
+        path = "/api/assignments"
+        headers = {"If-None-Match": self.etags[path]} if path in self.etags else {}
+        status, _, response = self.request("GET /api/assignments", "GET", path, headers=headers)
+        if response is not None and response.getheader("ETag"):
+            self.etags[path] = response.getheader("ETag")
+
+    def bulk_write(self):
+        if not self.site_ids or not self.employee_ids:
+            return
+        pairs = [[random.choice(self.site_ids), random.choice(self.employee_ids)] for _ in range(BULK_PAIRS)]
+        half = len(pairs) // 2
+        self.request("POST /api/assignments/bulk", "POST", "/api/assignments/bulk",
+                     body={"assign": pairs[:half], "unassign": pairs[half:]})
+
+    def run(self, deadline: float, write_ratio: float):
+        while time.perf_counter() < deadline:
+            self.walk_list(random.choice(("sites", "employees")))
+            for _ in range(5):
+                self.poll_assignments()
+            if random.random() < write_ratio:
+                self.bulk_write()
+        self.conn.close()
+
+
+def run(url: str = "http://127.0.0.1:8503", concurrency: int = 8, duration: float = 10.0,
+        write_ratio: float = 0.1, token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the load test and summarise it.
+
+    Returns:
+        dict: requests, rps, status counts, not_modified_ratio and
+              per-endpoint count/p50/p95/p99 latencies (ms)
+    """
+    results = {"latencies": collections.defaultdict(list), "status": collections.Counter()}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    clients = [Client(url, token, results, lock) for _ in range(concurrency)]
+    threads = [threading.Thread(target=c.run, args=(deadline, write_ratio), daemon=True) for c in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(results["status"].values())
+    polls = len(results["latencies"]["GET /api/assignments"])
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "status": {str(code): count for code, count in sorted(results["status"].items())},
+        "not_modified_ratio": round(results["status"][304] / polls, 3) if polls else 0.0,
+        "endpoints": {
+            endpoint: {
+                "count": len(values),
+                "p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(values, 0.99) * 1000, 2),
+            }
+            for endpoint, values in sorted(results["latencies"].items())
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for the construction REST API")
+    parser.add_argument("--url", default="http://127.0.0.1:8503", help="Base URL of api.py")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="Probability of a bulk write per loop")
+    parser.add_argument("--token", default=None, help="Bearer token (API_TOKEN of the server)")
+    parser.add_argument("--output", default=None, help="Also write the summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    summary = run(args.url, args.concurrency, args.duration, args.write_ratio, args.token)
+
+    print(f"{summary['requests']} requests in {summary['seconds']} s -> {summary['rps']} req/s")
+    print(f"Status: {summary['status']}  304 ratio on /api/assignments: {summary['not_modified_ratio']:.0%}")
+    print(f"{'endpoint':<34} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in summary["endpoints"].items():
+        print(f"{endpoint:<34} {stats['count']:>7} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = sum(count for code, count in summary["status"].items() if code == "0" or code.startswith("5"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
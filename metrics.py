@@ -0,0 +1,260 @@
+# metrics.py
+# Métricas Prometheus (formato de texto 0.0.4) de la capa de datos, informes y email
+#
+# Usage:
+#   from metrics import start_http_server
+#   start_http_server(9464)          # GET http://127.0.0.1:9464/metrics
+#
+# prometheus.yml:
+#   scrape_configs:
+#     - job_name: construction
+#       static_configs: [{targets: ["127.0.0.1:9464"]}]
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+
+from instrumentation import monitor
+
+# Límites (segundos) de los histogramas de latencia: de 1 ms a 30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Límites (bytes) del tamaño de los ficheros exportados: de 1 KB a 64 MB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(9))
+
+METRICS_PORT = 9464
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Common parts of a metric family: name, help, label names and a lock"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Tuple[str, ...]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+
+
+class Counter(_Metric):
+    """Monotonic counter, one value per combination of labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative histogram (le buckets + _sum + _count) per combination of labels"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [counts por bucket..., sum, count]
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1  # el último hueco de buckets es +Inf
+            series[-2] += value
+            series[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        """Observe the seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-1] if series else 0
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class Registry:
+    """Metric families of this process, rendered in registration order"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ========== MÉTRICAS ==========
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "construction_db_query_seconds", "Latency of ConstructionDB public methods.", ["method"]))
+DB_QUERY_ERRORS = registry.register(Counter(
+    "construction_db_query_errors_total", "ConstructionDB calls that raised.", ["method"]))
+ASSIGNMENTS = registry.register(Counter(
+    "construction_assignments_total", "Assign/unassign requests by result.", ["action", "result"]))
+RERUN_SECONDS = registry.register(Histogram(
+    "construction_rerun_seconds", "Duration of one Streamlit script run by page.", ["page"]))
+REPORT_BUILD_SECONDS = registry.register(Histogram(
+    "construction_report_build_seconds", "Time to build the report model from a snapshot."))
+REPORT_EXPORT_SECONDS = registry.register(Histogram(
+    "construction_report_export_seconds", "Time to render a report export file.", ["format"]))
+REPORT_EXPORT_BYTES = registry.register(Histogram(
+    "construction_report_export_bytes", "Size of report export files.", ["format"], buckets=SIZE_BUCKETS))
+EMAIL_SEND_SECONDS = registry.register(Histogram(
+    "construction_email_send_seconds", "Latency of report emails by mode and outcome.", ["mode", "outcome"]))
+API_REQUEST_SECONDS = registry.register(Histogram(
+    "construction_api_request_seconds", "Latency of REST API requests (api.py).", ["method", "route", "status"]))
+REPORT_JOB_SECONDS = registry.register(Histogram(
+    "construction_report_job_seconds", "Duration of scheduled report jobs (scheduler.py).", ["job", "status"]))
+
+# Métodos de asignación -> etiqueta action
+ASSIGNMENT_ACTIONS = {"assign_employee_to_site": "assign", "remove_assignment": "unassign"}
+
+
+def _on_db_call(name: str, elapsed: float, rows: int, error: bool):
+    DB_QUERY_SECONDS.observe(elapsed, name)
+    if error:
+        DB_QUERY_ERRORS.inc(name)
+    action = ASSIGNMENT_ACTIONS.get(name)
+    if action is not None:
+        ASSIGNMENTS.inc(action, "error" if error else ("changed" if rows else "unchanged"))
+
+
+def _on_rerun(rerun: dict):
+    RERUN_SECONDS.observe(rerun["duration_s"], rerun["page"])
+
+
+# Las llamadas y reruns llegan desde QueryMonitor (instrumentation.py)
+monitor.subscribe(on_call=_on_db_call, on_rerun=_on_rerun)
+
+
+def email_metrics(mode: str):
+    """
+    Decorator for send_email_* functions: latency by mode and outcome
+    (the returned "status", or "exception" when it raises).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "exception"
+            try:
+                result = func(*args, **kwargs)
+                outcome = result.get("status", "unknown") if isinstance(result, dict) else "unknown"
+                return result
+            finally:
+                EMAIL_SEND_SECONDS.observe(time.perf_counter() - start, mode, outcome)
+        return wrapper
+    return decorator
+
+
+# ========== ENDPOINT HTTP ==========
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # un scrape cada pocos segundos no debe llenar el log
+
+
+def start_http_server(port: int = METRICS_PORT, addr: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer, or None when the port is already taken
+        (another process of the app already exports on it)
+    """
+    try:
+        server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,140 @@
+# profiling.py
+# Perfilado bajo demanda de un rerun: pstats (cProfile) + pilas colapsadas (muestreo)
+#
+# Los ficheros .collapsed son el formato de entrada de flamegraph.pl y speedscope:
+#   flamegraph.pl profiles/20260101-120000-000000_assignment-board.collapsed > board.svg
+import collections
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Directorio acotado: solo se conservan los PROFILES_MAX perfiles más recientes
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILES_MAX = 20
+# Intervalo del muestreo de pilas (segundos)
+SAMPLE_INTERVAL_S = 0.005
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread every interval seconds from a helper
+    thread and count identical stacks (root;...;leaf), ready for a flamegraph.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "run"
+
+
+@contextlib.contextmanager
+def profile_run(label: str, directory: str = PROFILE_DIR, max_profiles: int = PROFILES_MAX):
+    """
+    Profile the with block with cProfile (current thread) and a stack
+    sampler, then write <name>.pstats, <name>.collapsed and <name>.json
+    under directory, keeping only the max_profiles most recent profiles.
+    The files are written even if the block raises (st.rerun() does).
+
+    Yields:
+        dict: Metadata of the profile, completed when the block ends
+    """
+    started = datetime.now()
+    name = f"{started:%Y%m%d-%H%M%S-%f}_{_slug(label)}"
+    meta = {"name": name, "label": label, "created": started.isoformat(timespec="seconds")}
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident()).start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield meta
+    finally:
+        profiler.disable()
+        meta["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        sampler.stop()
+        meta["samples"] = sum(sampler.stacks.values())
+
+        target = Path(directory)
+        target.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(target / f"{name}.pstats"))
+        (target / f"{name}.collapsed").write_text(sampler.collapsed(), encoding="utf-8")
+        # El .json se escribe el último: list_profiles() solo ve perfiles completos
+        (target / f"{name}.json").write_text(json.dumps(meta), encoding="utf-8")
+        _prune(target, max_profiles)
+
+
+def _prune(directory: Path, max_profiles: int):
+    for meta_file in sorted(directory.glob("*.json"), reverse=True)[max_profiles:]:
+        for suffix in (".json", ".pstats", ".collapsed"):
+            meta_file.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> List[Dict[str, Any]]:
+    """
+    Stored profiles, newest first.
+
+    Returns:
+        list: Metadata dicts plus "pstats" and "collapsed" file paths
+    """
+    target = Path(directory)
+    if not target.is_dir():
+        return []
+    profiles = []
+    for meta_file in sorted(target.glob("*.json"), reverse=True):
+        try:
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue  # borrado por _prune de otra sesión mientras se listaba
+        meta["pstats"] = str(meta_file.with_suffix(".pstats"))
+        meta["collapsed"] = str(meta_file.with_suffix(".collapsed"))
+        profiles.append(meta)
+    return profiles
+
+
+def top_functions(pstats_path: str, limit: int = 25, sort: str = "cumulative") -> str:
+    """pstats report of the `limit` most expensive functions, as text"""
+    output = io.StringIO()
+    stats = pstats.Stats(pstats_path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
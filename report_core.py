@@ -0,0 +1,624 @@
+# report_core.py - Report model, exports and email delivery (no Streamlit)
+#
+# Shared by the Reports page (report_module.py), the command-line tool
+# (cli.py) and anything else that needs the assignments report without a UI.
+import io
+import json
+import os
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import pandas as pd
+
+from metrics import REPORT_BUILD_SECONDS, REPORT_EXPORT_SECONDS, REPORT_EXPORT_BYTES, email_metrics
+
+
+def _today(format="%Y-%m-%d"):
+    """Report date (every row of a report carries it)"""
+    return datetime.now().strftime(format)
+
+
+def generate_basic_report(db):
+    """Generate report according to document specification using SQLite database"""
+    # Get data from one consistent read snapshot (never a half-applied change)
+    with db.snapshot() as snap:
+        construction_sites = snap.get_sites()
+        employees = snap.get_employees()
+        # Get all assignments (one query)
+        all_assignments = snap.get_all_assignments()
+
+    assigned_employee_ids = set()
+    for assigned_ids in all_assignments.values():
+        assigned_employee_ids.update(assigned_ids)
+    employees_by_id = {emp["id"]: emp for emp in employees}
+
+    # Structure according to PDF document
+    report_json = {"Employees": []}
+
+    # 1. Add ALL employees to "Employees" list (only unassigned)
+    for emp in employees:
+        emp_status = emp.get("status", "Active")
+
+        # Solo agregar si NO está asignado
+        if emp["id"] not in assigned_employee_ids:
+            report_json["Employees"].append({
+                "name": f"{emp['name']} {emp['surname']}",
+                "employee_id": emp["employee_id"],
+                "status": emp_status
+            })
+
+    # 2. For EACH site (active and inactive), create an entry
+    for site in construction_sites:
+        site_name = site["name"]
+        site_status = site.get("status", "Active")
+
+        # Initialize site entry with status
+        report_json[site_name] = {
+            "status": site_status,
+            "employees": []
+        }
+
+        # 3. Add employees assigned to this site
+        site_id = site.get("id")
+        if site_id and site_id in all_assignments:
+            assigned_emp_ids = all_assignments[site_id]
+            for emp_id in assigned_emp_ids:
+                emp_found = employees_by_id.get(emp_id)
+                if emp_found:
+                    report_json[site_name]["employees"].append({
+                        "name": f"{emp_found['name']} {emp_found['surname']}",
+                        "employee_id": emp_found["employee_id"],
+                        "status": emp_found.get("status", "Active")
+                    })
+
+    return report_json, construction_sites, employees
+
+
+def generate_clean_dataframe(db, basic_report=None):
+    """
+    Generate clean DataFrame for professional export
+    Returns DataFrame with columns: ['Employee Name', 'Employee ID', 'Assigned Site', 'Site Status', 'Employee Status', 'Report Date']
+    basic_report: result of generate_basic_report(db), to avoid reading the database again
+    """
+    report_json, all_sites, all_employees = basic_report or generate_basic_report(db)
+
+    report_data = []
+    current_date = _today()
+
+    # 1. Employees NOT assigned (Available or Inactive)
+    for emp in report_json["Employees"]:
+        emp_status = emp.get("status", "Active")
+        emp_status_display = "Inactive" if emp_status == "Inactive" else "Available"
+
+        report_data.append({
+            "Employee Name": emp["name"],
+            "Employee ID": emp["employee_id"],
+            "Assigned Site": "Not Assigned",
+            "Site Status": "N/A",
+            "Employee Status": emp_status_display,
+            "Report Date": current_date
+        })
+
+    # 2. Employees assigned to each site (active and inactive)
+    for site in all_sites:
+        site_name = site["name"]
+        site_status = site.get("status", "Active")
+
+        if site_name in report_json and "employees" in report_json[site_name]:
+            for emp in report_json[site_name]["employees"]:
+                emp_status = emp.get("status", "Active")
+                emp_status_display = "Assigned" if emp_status == "Active" else "Assigned (Inactive)"
+
+                report_data.append({
+                    "Employee Name": emp["name"],
+                    "Employee ID": emp["employee_id"],
+                    "Assigned Site": site_name,
+                    "Site Status": site_status,
+                    "Employee Status": emp_status_display,
+                    "Report Date": current_date
+                })
+
+    return pd.DataFrame(report_data), report_json, all_sites, all_employees
+
+
+def generate_display_dataframe(db, basic_report=None):
+    """
+    Generate DataFrame for visual display only
+    basic_report: result of generate_basic_report(db), to avoid reading the database again
+    """
+    report_json, all_sites, all_employees = basic_report or generate_basic_report(db)
+
+    display_data = []
+    current_date = _today()
+
+    # 1. Employees NOT assigned
+    for emp in report_json["Employees"]:
+        emp_status = emp.get("status", "Active")
+        if emp_status == "Inactive":
+            display_data.append({
+                "Status": "⏸️ Inactive",
+                "Employee Name": emp["name"],
+                "Employee ID": emp["employee_id"],
+                "Assigned Site": "Not Assigned",
+                "Site Status": "N/A",
+                "Date": current_date
+            })
+        else:
+            display_data.append({
+                "Status": "🟢 Available",
+                "Employee Name": emp["name"],
+                "Employee ID": emp["employee_id"],
+                "Assigned Site": "Not Assigned",
+                "Site Status": "N/A",
+                "Date": current_date
+            })
+
+    # 2. Assigned employees by site (active and inactive)
+    for site in all_sites:
+        site_name = site["name"]
+        site_status = site.get("status", "Active")
+        site_status_display = "⏸️" if site_status == "Inactive" else "🏗️"
+
+        if site_name in report_json and "employees" in report_json[site_name]:
+            for emp in report_json[site_name]["employees"]:
+                emp_status = emp.get("status", "Active")
+                if emp_status == "Inactive":
+                    display_data.append({
+                        "Status": "✅ Assigned (Inactive)",
+                        "Employee Name": emp["name"],
+                        "Employee ID": emp["employee_id"],
+                        "Assigned Site": f"{site_status_display} {site_name}",
+                        "Site Status": site_status,
+                        "Date": current_date
+                    })
+                else:
+                    display_data.append({
+                        "Status": "✅ Assigned",
+                        "Employee Name": emp["name"],
+                        "Employee ID": emp["employee_id"],
+                        "Assigned Site": f"{site_status_display} {site_name}",
+                        "Site Status": site_status,
+                        "Date": current_date
+                    })
+
+    return pd.DataFrame(display_data), report_json, all_sites, all_employees
+
+
+# ========== REPORT CACHE (SHARED ACROSS SESSIONS) ==========
+# Memory budget of the shared report cache (DataFrames, JSON model and exports)
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def build_report(db, display=True):
+    """
+    Build the complete report model from one consistent snapshot.
+
+    Args:
+        db: ConstructionDB
+        display (bool): Also build df_display (only the Reports page shows it;
+            batch jobs skip it)
+
+    Returns:
+        dict: version (data_version of the snapshot), generated_at, report_json,
+              sites, employees, df_display (None without display), df_clean,
+              stats and exports (export files, filled lazily by ReportCache.export)
+    """
+    with db.snapshot() as snap:
+        basic_report = generate_basic_report(snap)
+        version = snap.version
+    report_json, all_sites, all_employees = basic_report
+    df_display = generate_display_dataframe(None, basic_report)[0] if display else None
+    df_clean, _, _, _ = generate_clean_dataframe(None, basic_report)
+
+    # Recuentos sobre las columnas del DataFrame (sin convertirlo a una lista de dicts)
+    if df_clean.empty:
+        assigned = available = inactive_unassigned = 0
+    else:
+        unassigned = df_clean["Assigned Site"] == "Not Assigned"
+        emp_status = df_clean["Employee Status"]
+        assigned = int((~unassigned).sum())
+        available = int((unassigned & (emp_status == "Available")).sum())
+        inactive_unassigned = int((unassigned & (emp_status == "Inactive")).sum())
+    active_emps = len([e for e in all_employees if e.get("status") == "Active"])
+    active_sites = len([s for s in all_sites if s.get("status") == "Active"])
+    stats = {
+        "total_employees": len(all_employees),
+        "active_employees": active_emps,
+        "inactive_employees": len([e for e in all_employees if e.get("status") == "Inactive"]),
+        "total_sites": len(all_sites),
+        "active_sites": active_sites,
+        "inactive_sites": len([s for s in all_sites if s.get("status") == "Inactive"]),
+        "assigned": assigned,
+        "available": available,
+        "inactive_unassigned": inactive_unassigned,
+        "sites_with_assignments": len([site for site in all_sites if
+                                       report_json.get(site["name"], {}).get("employees")]),
+    }
+
+    return {
+        "version": version,
+        "generated_at": datetime.now(),
+        "report_json": report_json,
+        "sites": all_sites,
+        "employees": all_employees,
+        "df_display": df_display,
+        "df_clean": df_clean,
+        "stats": stats,
+        "exports": {},
+    }
+
+
+def build_excel_export(report, full=True):
+    """
+    Excel workbook of a report model.
+
+    Args:
+        report (dict): Result of build_report
+        full (bool): Include the 'Report Info' and 'Sites Summary' sheets
+
+    Returns:
+        bytes: .xlsx file
+    """
+    stats = report["stats"]
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        # Sheet 1: Assignments (clean data)
+        report["df_clean"].to_excel(writer, index=False, sheet_name='Assignments')
+        if full:
+            # Sheet 2: Report Info
+            summary_data = {
+                "Field": [
+                    "Report Generated Date",
+                    "Report Generated Time",
+                    "Total Employees",
+                    "Active Employees",
+                    "Inactive Employees",
+                    "Total Construction Sites",
+                    "Active Sites",
+                    "Inactive Sites",
+                    "Assigned Employees",
+                    "Available Employees",
+                    "Inactive Unassigned Employees",
+                    "Report Format",
+                    "Generated By"
+                ],
+                "Value": [
+                    report["generated_at"].strftime("%Y-%m-%d"),
+                    report["generated_at"].strftime("%H:%M:%S"),
+                    stats["total_employees"],
+                    stats["active_employees"],
+                    stats["inactive_employees"],
+                    stats["total_sites"],
+                    stats["active_sites"],
+                    stats["inactive_sites"],
+                    stats["assigned"],
+                    stats["available"],
+                    stats["inactive_unassigned"],
+                    "Employee Assignment Report",
+                    "Construction Management System"
+                ]
+            }
+            pd.DataFrame(summary_data).to_excel(writer, index=False, sheet_name='Report Info')
+
+            # Sheet 3: Sites Summary (ALL sites - active and inactive)
+            report_json = report["report_json"]
+            sites_data = []
+            for site in report["sites"]:
+                site_name = site["name"]
+                sites_data.append({
+                    "Site Name": site_name,
+                    "Manager": site.get("manager", "N/A"),
+                    "Assigned Employees": len(report_json.get(site_name, {}).get("employees", [])),
+                    "Status": site.get("status", "Active")
+                })
+            pd.DataFrame(sites_data).to_excel(writer, index=False, sheet_name='Sites Summary')
+
+    return output.getvalue()
+
+
+def build_csv_export(report):
+    """CSV (clean data only) of a report model"""
+    return report["df_clean"].to_csv(index=False)
+
+
+def build_json_export(report, ensure_ascii=False):
+    """JSON (original format from PDF) of a report model"""
+    stats = report["stats"]
+    json_data = {
+        "report_info": {
+            "generated_date": report["generated_at"].strftime("%Y-%m-%d"),
+            "generated_time": report["generated_at"].strftime("%H:%M:%S"),
+            "total_employees": stats["total_employees"],
+            "active_employees": stats["active_employees"],
+            "inactive_employees": stats["inactive_employees"],
+            "total_sites": stats["total_sites"],
+            "active_sites": stats["active_sites"],
+            "inactive_sites": stats["inactive_sites"]
+        },
+        "assignments": report["report_json"]
+    }
+    return json.dumps(json_data, indent=2, ensure_ascii=ensure_ascii)
+
+
+def build_parquet_export(report):
+    """Parquet (clean data only, typed columns) of a report model"""
+    output = io.BytesIO()
+    report["df_clean"].to_parquet(output, index=False, engine="pyarrow")
+    return output.getvalue()
+
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Export name -> (builder, file extension, MIME type). The name is also the
+# memoization key of ReportCache.export.
+EXPORT_FORMATS = {
+    "xlsx": (build_excel_export, "xlsx", XLSX_MIME),
+    "xlsx_assignments": (lambda report: build_excel_export(report, full=False), "xlsx", XLSX_MIME),
+    "csv": (build_csv_export, "csv", "text/csv"),
+    "json": (build_json_export, "json", "application/json"),
+    "json_ascii": (lambda report: build_json_export(report, ensure_ascii=True), "json", "application/json"),
+    "parquet": (build_parquet_export, "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_filename(name, stamp=None):
+    """
+    File name of an export, e.g. employee_assignments_20260119.xlsx.
+
+    Variants that share an extension with another format carry their name
+    (employee_assignments_20260119_json_ascii.json), so exporting several
+    formats into one directory never overwrites a file.
+    """
+    extension = EXPORT_FORMATS[name][1]
+    suffix = "" if name == extension else f"_{name}"
+    return f"employee_assignments_{stamp or _today('%Y%m%d')}{suffix}.{extension}"
+
+
+def _estimated_bytes(value):
+    """Rough memory footprint of a cached value (DataFrames measured deeply)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_estimated_bytes(k) + _estimated_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimated_bytes(v) for v in value)
+    return 16
+
+
+class ReportCache:
+    """
+    Built reports shared by every session, keyed by (data_version, date).
+
+    A report is rebuilt only when the data really changed (or the day
+    changed, since rows carry the report date). Least recently used
+    reports are evicted once the estimated size exceeds max_bytes.
+    Export files are memoized inside their report and count towards
+    the budget too. display=False skips df_display (batch use).
+    Concurrent misses for the same key (or export) wait for a single
+    build instead of each building their own copy.
+    """
+
+    def __init__(self, max_bytes=REPORT_CACHE_MAX_BYTES, display=True):
+        self.max_bytes = max_bytes
+        self.display = display
+        self._entries = OrderedDict()  # key -> (report, size)
+        self._lock = threading.Lock()
+        self._building = {}  # clave -> Future de la construcción en curso
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db):
+        """Report for the current data of db, built at most once per data version"""
+        key = (db.data_version(), _today())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            future, owner = self._join_build(key)
+        if not owner:
+            return future.result()
+
+        def build():
+            with REPORT_BUILD_SECONDS.time():
+                report = build_report(db, display=self.display)
+            # El snapshot puede ser posterior a la versión leída: se guarda con la suya
+            with self._lock:
+                self.misses += 1
+                self._entries[(report["version"], key[1])] = (report, _estimated_bytes(report))
+                self._evict()
+            return report
+
+        return self._run_build(key, future, build)
+
+    def export(self, report, name, builder):
+        """Memoize an export file (builder(report)) inside its cached report"""
+        data = report["exports"].get(name)
+        if data is not None:
+            return data
+        key = ("export", id(report), name)
+        with self._lock:
+            data = report["exports"].get(name)
+            if data is not None:
+                return data
+            future, owner = self._join_build(key)
+        if not owner:
+            return future.result()
+
+        def build():
+            with REPORT_EXPORT_SECONDS.time(name):
+                data = builder(report)
+            REPORT_EXPORT_BYTES.observe(len(data), name)
+            report["exports"][name] = data
+            with self._lock:
+                for entry_key, (cached, size) in self._entries.items():
+                    if cached is report:
+                        self._entries[entry_key] = (cached, size + _estimated_bytes(data))
+                        break
+                self._evict()
+            return data
+
+        return self._run_build(key, future, build)
+
+    def _join_build(self, key):
+        """Future of the build in progress for key (call with the lock held); owner=True if the caller must build"""
+        future = self._building.get(key)
+        if future is not None:
+            self.hits += 1
+            return future, False
+        future = self._building[key] = Future()
+        return future, True
+
+    def _run_build(self, key, future, build):
+        """Run build() for the waiters of key; its result or exception reaches all of them"""
+        try:
+            result = build()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def _evict(self):
+        # Siempre se conserva al menos el informe más reciente
+        while len(self._entries) > 1 and self.total_bytes() > self.max_bytes:
+            self._entries.popitem(last=False)
+
+    def total_bytes(self):
+        return sum(size for _, size in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.total_bytes(),
+                    "hits": self.hits, "misses": self.misses}
+
+
+# ========== EMAIL ==========
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 587
+DEMO_SENDER = "demo@example.com"
+
+
+def smtp_credentials():
+    """(sender, password) from EMAIL_USER / EMAIL_PASSWORD (demo values when unset)"""
+    return os.environ.get("EMAIL_USER", DEMO_SENDER), os.environ.get("EMAIL_PASSWORD", "demo-password")
+
+
+def is_demo_mode():
+    """True while no real SMTP credentials are configured"""
+    return smtp_credentials()[0] == DEMO_SENDER
+
+
+def default_email_body(now=None):
+    """Standard message that accompanies the report"""
+    now = now or datetime.now()
+    return f"""Dear Manager,
+
+Please find attached the employee assignments report for your review.
+
+Report Details:
+- Date: {now:%Y-%m-%d}
+- Time: {now:%H:%M:%S}
+- Generated by: Construction Management System
+
+This report includes all employees (active and inactive) and their assignments to construction sites.
+
+Best regards,
+
+Construction Management Team
+---
+Automated Report System"""
+
+
+def _recipients(recipient):
+    """"a@x.com, b@y.com" or a list -> ["a@x.com", "b@y.com"]"""
+    if isinstance(recipient, str):
+        recipient = recipient.split(",")
+    return [r.strip() for r in recipient if r and r.strip()]
+
+
+@email_metrics("smtp")
+def send_email_smtp(recipient, subject, body, attachment_data=None,
+                    attachment_filename="report.csv", attachment_type="csv"):
+    """
+    Send an email with an optional report attachment through SMTP.
+
+    Args:
+        recipient (str | list): One address, several separated by commas, or a list
+        attachment_type (str): Extension of the attachment (xlsx, csv, json, parquet)
+
+    Returns:
+        dict: status ("sent", "demo_mode" or "error") and message
+    """
+    sender_email, sender_password = smtp_credentials()
+    if sender_email == DEMO_SENDER:
+        return {"status": "demo_mode", "message": "Set real email credentials to send"}
+
+    recipients = _recipients(recipient)
+    if not recipients:
+        return {"status": "error", "message": "No recipient address"}
+
+    try:
+        msg = MIMEMultipart()
+        msg['From'] = sender_email
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        if attachment_data and attachment_filename:
+            if isinstance(attachment_data, str):
+                attachment_data = attachment_data.encode("utf-8")
+            part = MIMEBase('application', 'json' if attachment_type == "json" else 'octet-stream')
+            part.set_payload(attachment_data)
+            encoders.encode_base64(part)
+            part.add_header('Content-Disposition', f'attachment; filename={attachment_filename}')
+            msg.attach(part)
+
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=60) as server:
+            server.starttls()
+            server.login(sender_email, sender_password)
+            server.send_message(msg)
+
+        return {"status": "sent", "message": f"Email sent successfully to {', '.join(recipients)}"}
+
+    except smtplib.SMTPAuthenticationError:
+        return {"status": "error", "message": "Authentication failed. Check email credentials."}
+    except smtplib.SMTPException as e:
+        return {"status": "error", "message": f"SMTP error: {str(e)}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Error sending email: {str(e)}"}
+
+
+@email_metrics("simulation")
+def send_email_simulation(recipient, subject, body, attachment_data=None,
+                          attachment_filename="report.csv", attachment_type="csv", delay=2.0):
+    """
+    Simulation mode for demo purposes
+    """
+    time.sleep(delay)  # Simulate sending delay
+
+    # Return simulated success
+    return {
+        "status": "sent_simulation",
+        "message": f"[SIMULATION] Email would be sent to: {', '.join(_recipients(recipient))}",
+        "details": {
+            "smtp_server": f"{SMTP_SERVER}:{SMTP_PORT}",
+            "attachment": attachment_filename,
+            "size": f"{len(attachment_data) if attachment_data else 0} bytes" if attachment_data else "No attachment"
+        }
+    }
@@ -0,0 +1,603 @@
+# scheduler.py
+# Informes programados: trabajos en SQLite, un hilo planificador por proceso con
+# elección de líder (fila de bloqueo con lease) y ejecución en un pool de hilos
+#
+# Usage:
+#   python scheduler.py add --name weekly --cron "0 6 * * MON" --to jefe@x.com,rrhh@x.com [--format xlsx]
+#   python scheduler.py list | runs [--job weekly] | remove weekly | enable weekly | disable weekly
+#   python scheduler.py run-now weekly          # ejecuta ya, en este proceso
+#   python scheduler.py serve                   # planificador sin Streamlit (primer plano)
+#
+# Dentro de la app, app.py arranca el planificador en el pipeline de arranque
+# (SCHEDULER_ENABLED=0 lo desactiva). Con varios procesos sobre la misma base
+# de datos solo el líder (el que tiene el lease de scheduler_lock) lanza
+# trabajos; si muere, otro toma el relevo cuando el lease caduca.
+#
+# Expresiones cron de 5 campos (minuto hora día mes día-semana) en hora local:
+# *, listas (1,15), rangos (1-5), pasos (*/15), nombres (MON-FRI, JAN) y
+# @hourly/@daily/@weekly/@monthly/@yearly. Si día y día-semana están
+# restringidos a la vez basta con que coincida uno de los dos (como cron).
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from metrics import REPORT_JOB_SECONDS
+
+# Segundos entre dos comprobaciones de trabajos pendientes
+TICK_SECONDS = 15.0
+# Duración del liderazgo sin renovar: si el líder deja de renovarlo, otro proceso lo toma
+LEASE_SECONDS = 60.0
+# Hilos que ejecutan trabajos (generar el informe y enviarlo)
+WORKERS = 2
+# Ejecuciones que se conservan por trabajo en el historial
+RUNS_KEPT_PER_JOB = 200
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOCK_NAME = "report_scheduler"
+
+
+# ========== EXPRESIONES CRON ==========
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])}
+WEEKDAY_NAMES = {name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+
+def _parse_cron_field(text: str, low: int, high: int, names: Dict[str, int]) -> List[int]:
+    """Allowed values of one cron field, sorted"""
+    def value(token):
+        number = names.get(token) if token in names else (int(token) if token.isdigit() else None)
+        if number is None or not low <= number <= high:
+            raise ValueError(f"Invalid value {token!r} (allowed {low}-{high})")
+        return number
+
+    values = set()
+    for part in text.lower().split(","):
+        span, _, step_text = part.partition("/")
+        if step_text and not (step_text.isdigit() and int(step_text) > 0):
+            raise ValueError(f"Invalid step in {part!r}")
+        step = int(step_text) if step_text else 1
+        if span in ("*", "?"):
+            start, end = low, high
+        else:
+            first, _, last = span.partition("-")
+            start = value(first)
+            # "5/15" equivale a "5-<máximo>/15"
+            end = value(last) if last else (high if step_text else start)
+            if end < start:
+                raise ValueError(f"Invalid range {span!r}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronExpression:
+    """Five-field cron expression evaluated in local time"""
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expression!r} must have 5 fields: minute hour day month weekday")
+        self.minutes = _parse_cron_field(fields[0], 0, 59, {})
+        self.hours = _parse_cron_field(fields[1], 0, 23, {})
+        self.days = set(_parse_cron_field(fields[2], 1, 31, {}))
+        self.months = set(_parse_cron_field(fields[3], 1, 12, MONTH_NAMES))
+        # 7 también es domingo
+        self.weekdays = {day % 7 for day in _parse_cron_field(fields[4], 0, 7, WEEKDAY_NAMES)}
+        self._day_restricted = fields[2] not in ("*", "?")
+        self._weekday_restricted = fields[4] not in ("*", "?")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays  # cron: 0 = domingo
+        if self._day_restricted and self._weekday_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        First matching minute strictly after `after`.
+
+        Skips whole months, days and hours that cannot match, so even a
+        yearly expression takes a few hundred steps at most.
+        """
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=5 * 366)  # "30 2 29 2 *" puede tardar años
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            hour = next((h for h in self.hours if h >= moment.hour), None)
+            if hour is None:
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if hour != moment.hour:
+                moment = moment.replace(hour=hour, minute=0)
+            minute = next((m for m in self.minutes if m >= moment.minute), None)
+            if minute is None:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+                continue
+            return moment.replace(minute=minute)
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+
+# ========== ALMACÉN DE TRABAJOS ==========
+class JobStore:
+    """
+    Report jobs, their run history and the scheduler lock, in the
+    application's SQLite database (tables report_jobs, report_job_runs and
+    scheduler_lock; they do not touch data_version).
+    Every method uses its own short-lived connection, so any thread may call it.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_schema(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS report_jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL UNIQUE,
+                        cron TEXT NOT NULL,
+                        format TEXT NOT NULL,
+                        recipients TEXT NOT NULL,
+                        subject TEXT,
+                        mode TEXT NOT NULL DEFAULT 'smtp' CHECK(mode IN ('smtp', 'simulation')),
+                        enabled INTEGER NOT NULL DEFAULT 1,
+                        next_run TEXT,
+                        created TEXT NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS report_job_runs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        job_id INTEGER NOT NULL,
+                        scheduled_for TEXT,
+                        started TEXT NOT NULL,
+                        finished TEXT,
+                        duration_s REAL,
+                        status TEXT NOT NULL CHECK(status IN ('running', 'success', 'failed', 'skipped')),
+                        message TEXT,
+                        attachment_bytes INTEGER,
+                        worker TEXT
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_report_job_runs_job ON report_job_runs(job_id, id);
+                    CREATE TABLE IF NOT EXISTS scheduler_lock (
+                        name TEXT PRIMARY KEY,
+                        owner TEXT NOT NULL,
+                        expires REAL NOT NULL
+                    );
+                """)
+        finally:
+            conn.close()
+
+    # ---------- Trabajos ----------
+    def add_job(self, name: str, cron: str, format: str, recipients: str,
+                subject: Optional[str] = None, mode: str = "smtp") -> int:
+        """
+        Create a job; next_run is the first cron match from now.
+
+        Raises:
+            ValueError: Invalid cron expression, format or recipients, or duplicated name
+        """
+        from report_core import EXPORT_FORMATS
+
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {format!r}. Choose from {', '.join(EXPORT_FORMATS)}")
+        recipients = ",".join(r.strip() for r in recipients.split(",") if r.strip())
+        if not recipients:
+            raise ValueError("At least one recipient is required")
+        next_run = CronExpression(cron).next_after(datetime.now())
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO report_jobs (name, cron, format, recipients, subject, mode, next_run, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (name, cron.strip(), format, recipients, subject, mode,
+                     next_run.strftime(DATE_FORMAT), datetime.now().strftime(DATE_FORMAT))
+                )
+                return cursor.lastrowid
+        except sqlite3.IntegrityError as e:
+            if "report_jobs.name" in str(e):
+                raise ValueError(f"A job named {name!r} already exists") from None
+            raise ValueError(f"Invalid job: {e}") from None
+        finally:
+            conn.close()
+
+    def remove_job(self, name: str) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT id FROM report_jobs WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    return False
+                conn.execute("DELETE FROM report_job_runs WHERE job_id = ?", (row["id"],))
+                conn.execute("DELETE FROM report_jobs WHERE id = ?", (row["id"],))
+                return True
+        finally:
+            conn.close()
+
+    def set_enabled(self, name: str, enabled: bool) -> bool:
+        """Enable/disable a job; enabling recomputes next_run from now (no catch-up)"""
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT cron FROM report_jobs WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    return False
+                next_run = CronExpression(row["cron"]).next_after(datetime.now()).strftime(DATE_FORMAT)
+                conn.execute("UPDATE report_jobs SET enabled = ?, next_run = ? WHERE name = ?",
+                             (int(enabled), next_run, name))
+                return True
+        finally:
+            conn.close()
+
+    def get_job(self, name: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM report_jobs WHERE name = ?", (name,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute("SELECT * FROM report_jobs ORDER BY name")]
+        finally:
+            conn.close()
+
+    def due_jobs(self, now: datetime) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT * FROM report_jobs WHERE enabled = 1 AND next_run <= ? ORDER BY next_run",
+                                (now.strftime(DATE_FORMAT),))
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def claim(self, job: Dict[str, Any], now: datetime) -> bool:
+        """
+        Move next_run to the following cron match, only if nobody did it
+        first (compare-and-swap on next_run): a due run is claimed once even
+        if two processes believe they are the leader. Missed runs (server
+        down at the scheduled time) run once, not once per missed occurrence.
+        """
+        next_run = CronExpression(job["cron"]).next_after(now).strftime(DATE_FORMAT)
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute("UPDATE report_jobs SET next_run = ? WHERE id = ? AND next_run = ?",
+                                      (next_run, job["id"], job["next_run"]))
+                return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    # ---------- Historial ----------
+    def start_run(self, job_id: int, scheduled_for: Optional[str], worker: str, status: str = "running",
+                  message: Optional[str] = None) -> int:
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO report_job_runs (job_id, scheduled_for, started, status, message, worker) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, scheduled_for, datetime.now().strftime(DATE_FORMAT), status, message, worker)
+                )
+                return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def finish_run(self, run_id: int, job_id: int, status: str, duration_s: float,
+                   message: Optional[str] = None, attachment_bytes: Optional[int] = None):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE report_job_runs SET finished = ?, duration_s = ?, status = ?, message = ?, "
+                    "attachment_bytes = ? WHERE id = ?",
+                    (datetime.now().strftime(DATE_FORMAT), round(duration_s, 3), status, message,
+                     attachment_bytes, run_id)
+                )
+                # Historial acotado por trabajo
+                conn.execute(
+                    "DELETE FROM report_job_runs WHERE job_id = ? AND id <= "
+                    "(SELECT id FROM report_job_runs WHERE job_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (job_id, job_id, RUNS_KEPT_PER_JOB)
+                )
+        finally:
+            conn.close()
+
+    def runs(self, job_name: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs first, with the job name"""
+        sql = ("SELECT r.*, j.name AS job FROM report_job_runs r JOIN report_jobs j ON j.id = r.job_id"
+               + (" WHERE j.name = ?" if job_name else "") + " ORDER BY r.id DESC LIMIT ?")
+        params = ([job_name] if job_name else []) + [limit]
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    # ---------- Elección de líder ----------
+    def try_lead(self, owner: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """
+        Take or renew the scheduler lease. Succeeds if nobody holds it, this
+        owner already holds it, or the holder's lease expired.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.execute(
+                    "UPDATE scheduler_lock SET owner = ?, expires = ? WHERE name = ? AND (owner = ? OR expires < ?)",
+                    (owner, now + lease_seconds, LOCK_NAME, owner, now)
+                )
+                if cursor.rowcount:
+                    return True
+                cursor = conn.execute("INSERT OR IGNORE INTO scheduler_lock (name, owner, expires) VALUES (?, ?, ?)",
+                                      (LOCK_NAME, owner, now + lease_seconds))
+                return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def release(self, owner: str):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM scheduler_lock WHERE name = ? AND owner = ?", (LOCK_NAME, owner))
+        finally:
+            conn.close()
+
+    def leader(self) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT owner, expires FROM scheduler_lock WHERE name = ?", (LOCK_NAME,)).fetchone()
+            return dict(row) if row and row["expires"] >= time.time() else None
+        finally:
+            conn.close()
+
+
+# ========== EJECUCIÓN ==========
+def execute_job(db, job: Dict[str, Any], cache=None) -> Dict[str, Any]:
+    """
+    Build the report, export it in the job's format and email it.
+
+    Returns:
+        dict: status ("success" or "failed"), message and attachment_bytes
+    """
+    # Import diferido: pandas/openpyxl solo se cargan cuando un trabajo se ejecuta
+    from report_core import (EXPORT_FORMATS, ReportCache, default_email_body, export_filename,
+                             send_email_simulation, send_email_smtp)
+
+    cache = cache or ReportCache(display=False)
+    report = cache.get(db)
+    builder, attachment_type, _ = EXPORT_FORMATS[job["format"]]
+    data = cache.export(report, job["format"], builder)
+    subject = job["subject"] or f"Employee Assignments Report - {datetime.now():%Y-%m-%d}"
+    if job["mode"] == "simulation":
+        result = send_email_simulation(job["recipients"], subject, default_email_body(), attachment_data=data,
+                                       attachment_filename=export_filename(job["format"]),
+                                       attachment_type=attachment_type, delay=0)
+    else:
+        result = send_email_smtp(job["recipients"], subject, default_email_body(), attachment_data=data,
+                                 attachment_filename=export_filename(job["format"]), attachment_type=attachment_type)
+    ok = result["status"] in ("sent", "sent_simulation")
+    return {"status": "success" if ok else "failed", "message": result["message"], "attachment_bytes": len(data)}
+
+
+class Scheduler:
+    """
+    Background scheduler of one process.
+
+    A daemon thread wakes up every tick seconds. If this process holds (or
+    takes) the lease of scheduler_lock, it claims the due jobs and hands them
+    to a pool of worker threads; otherwise it only waits. Nothing runs on the
+    caller's thread: start() returns immediately.
+    """
+
+    def __init__(self, db, store: Optional[JobStore] = None, tick: float = TICK_SECONDS,
+                 lease: float = LEASE_SECONDS, workers: int = WORKERS):
+        self.db = db
+        self.store = store or JobStore(db.db_path)
+        self.tick = tick
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._cache = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-job")
+        self._running = set()  # ids de trabajos en ejecución en este proceso
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="report-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = False):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._pool.shutdown(wait=wait)
+        self.store.release(self.owner)
+        self.is_leader = False
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick_once()
+            except Exception as e:  # noqa: BLE001 - el hilo del planificador no debe morir
+                print(f"report scheduler: {e!r}", file=sys.stderr)
+            self._stop.wait(self.tick)
+
+    def tick_once(self, now: Optional[datetime] = None) -> List[str]:
+        """One scheduling pass; returns the names of the jobs submitted"""
+        self.is_leader = self.store.try_lead(self.owner, self.lease)
+        if not self.is_leader:
+            return []
+        now = now or datetime.now()
+        submitted = []
+        for job in self.store.due_jobs(now):
+            if not self.store.claim(job, now):
+                continue
+            with self._lock:
+                overlapping = job["id"] in self._running
+                if not overlapping:
+                    self._running.add(job["id"])
+            if overlapping:
+                self.store.start_run(job["id"], job["next_run"], self.owner, status="skipped",
+                                     message="Previous run still in progress")
+                continue
+            run_id = self.store.start_run(job["id"], job["next_run"], self.owner)
+            self._pool.submit(self._run, job, run_id)
+            submitted.append(job["name"])
+        return submitted
+
+    def _run(self, job, run_id):
+        start = time.perf_counter()
+        try:
+            if self._cache is None:
+                from report_core import ReportCache
+                self._cache = ReportCache(display=False)
+            result = execute_job(self.db, job, self._cache)
+        except Exception as e:  # noqa: BLE001 - se registra en el historial
+            result = {"status": "failed", "message": f"{type(e).__name__}: {e}", "attachment_bytes": None}
+        finally:
+            with self._lock:
+                self._running.discard(job["id"])
+        elapsed = time.perf_counter() - start
+        REPORT_JOB_SECONDS.observe(elapsed, job["name"], result["status"])
+        self.store.finish_run(run_id, job["id"], result["status"], elapsed, result["message"],
+                              result["attachment_bytes"])
+        return result
+
+
+# ========== LÍNEA DE COMANDOS ==========
+def run_now(db, store: JobStore, name: str) -> Dict[str, Any]:
+    """Run a job immediately in this process (next_run is not changed)"""
+    job = store.get_job(name)
+    if job is None:
+        raise ValueError(f"Unknown job {name!r}")
+    run_id = store.start_run(job["id"], None, f"{socket.gethostname()}:{os.getpid()}:manual")
+    start = time.perf_counter()
+    try:
+        result = execute_job(db, job)
+    except Exception as e:  # noqa: BLE001 - se registra en el historial
+        result = {"status": "failed", "message": f"{type(e).__name__}: {e}", "attachment_bytes": None}
+    elapsed = time.perf_counter() - start
+    REPORT_JOB_SECONDS.observe(elapsed, job["name"], result["status"])
+    store.finish_run(run_id, job["id"], result["status"], elapsed, result["message"], result["attachment_bytes"])
+    return dict(result, duration_s=round(elapsed, 3))
+
+
+def _print_table(rows, columns):
+    widths = {c: max([len(c)] + [len(str(row.get(c, ""))) for row in rows]) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "") if row.get(c) is not None else "").ljust(widths[c]) for c in columns))
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default="construction_system.db", help="SQLite database file")
+
+    parser = argparse.ArgumentParser(description="Scheduled report jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", parents=[common], help="Create a job")
+    add.add_argument("--name", required=True)
+    add.add_argument("--cron", required=True, help='e.g. "0 6 * * MON" (minute hour day month weekday)')
+    add.add_argument("--to", required=True, help="Recipients, comma separated")
+    add.add_argument("--format", default="xlsx_assignments", help="Attachment format (see cli.py report)")
+    add.add_argument("--subject", help="Email subject (default: report name and date)")
+    add.add_argument("--simulate", action="store_true", help="Do not connect to SMTP (testing)")
+    commands.add_parser("list", parents=[common], help="List jobs and their next run")
+    runs = commands.add_parser("runs", parents=[common], help="Run history, newest first")
+    runs.add_argument("--job", help="Only this job")
+    runs.add_argument("--limit", type=int, default=20)
+    for name, help_text in (("remove", "Delete a job and its history"), ("enable", "Enable a job"),
+                            ("disable", "Disable a job"), ("run-now", "Run a job now in this process")):
+        command = commands.add_parser(name, parents=[common], help=help_text)
+        command.add_argument("name")
+    serve = commands.add_parser("serve", parents=[common], help="Run the scheduler in the foreground")
+    serve.add_argument("--tick", type=float, default=TICK_SECONDS, help="Seconds between checks")
+    args = parser.parse_args(argv)
+
+    # Como cli.py: una ruta mal escrita no crea una base de datos nueva
+    if not os.path.isfile(args.db):
+        print(f"error: Database not found: {args.db}", file=sys.stderr)
+        return 2
+    store = JobStore(args.db)
+    try:
+        if args.command == "add":
+            store.add_job(args.name, args.cron, args.format, args.to, args.subject,
+                          mode="simulation" if args.simulate else "smtp")
+            print(f"Job {args.name!r} created, next run {store.get_job(args.name)['next_run']}")
+        elif args.command == "list":
+            _print_table(store.list_jobs(), ["name", "cron", "format", "recipients", "mode", "enabled", "next_run"])
+            leader = store.leader()
+            print(f"\nLeader: {leader['owner'] if leader else 'none'}")
+        elif args.command == "runs":
+            _print_table(store.runs(args.job, args.limit),
+                         ["id", "job", "scheduled_for", "started", "duration_s", "status", "attachment_bytes", "message"])
+        elif args.command in ("remove", "enable", "disable"):
+            changed = (store.remove_job(args.name) if args.command == "remove"
+                       else store.set_enabled(args.name, args.command == "enable"))
+            if not changed:
+                print(f"Unknown job {args.name!r}", file=sys.stderr)
+                return 2
+            print(f"Job {args.name!r}: {args.command}d")
+        elif args.command in ("run-now", "serve"):
+            from database import ConstructionDB
+
+            db = ConstructionDB(args.db)
+            try:
+                if args.command == "run-now":
+                    result = run_now(db, store, args.name)
+                    print(f"{result['status']} in {result['duration_s']} s: {result['message']}")
+                    return 0 if result["status"] == "success" else 3
+                scheduler = Scheduler(db, store, tick=args.tick).start()
+                print(f"Scheduler {scheduler.owner} running (Ctrl+C to stop)", file=sys.stderr)
+                try:
+                    while True:
+                        time.sleep(3600)
+                except KeyboardInterrupt:
+                    scheduler.stop(wait=True)
+            finally:
+                db.close()
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# startup.py
+# Background startup pipeline for Construction Management System
+import threading
+import time
+
+
+class StartupPipeline:
+    """
+    Run the startup stages (DB init/migrations, cache warm-up...) in a
+    background thread so sessions only wait for real work.
+
+    Stages run in order; each stage receives the dict of results produced
+    by the previous ones and its return value is stored under its name.
+    A failing required stage stops the pipeline (see failed); a failing
+    optional stage stores None and the error (see stage_errors) and the
+    next stages still run.
+    """
+
+    def __init__(self):
+        self._stages = []
+        self._results = {}
+        self._timings = {}
+        self._current = None
+        self._error = None
+        self._stage_errors = {}
+        self._started_at = None
+        self._finished_at = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def add_stage(self, name, func, label=None, optional=False):
+        """
+        Register a stage.
+
+        Args:
+            name (str): Key used for the result and timing of the stage
+            func (callable): Called with the results dict of previous stages
+            label (str): Human readable text shown while the stage runs
+            optional (bool): A failure is recorded but does not fail startup
+        """
+        self._stages.append((name, func, label or name, optional))
+        return self
+
+    def start(self):
+        """Start the background thread (only once)"""
+        if self._thread is None:
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="startup-pipeline", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for name, func, label, optional in self._stages:
+                self._current = label
+                stage_start = time.perf_counter()
+                try:
+                    self._results[name] = func(self._results)
+                except Exception as e:
+                    if not optional:
+                        raise
+                    self._results[name] = None
+                    self._stage_errors[name] = e
+                self._timings[name] = time.perf_counter() - stage_start
+        except Exception as e:
+            self._error = e
+        finally:
+            self._current = None
+            self._finished_at = time.perf_counter()
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def failed(self):
+        """True when a required stage raised (only meaningful once done)"""
+        return self._error is not None
+
+    @property
+    def error(self):
+        return self._error
+
+    def stage_errors(self):
+        """
+        Returns:
+            dict: Exceptions of the optional stages that failed, by stage name
+        """
+        return dict(self._stage_errors)
+
+    def wait(self, timeout=None):
+        """Block until every stage finished. Returns True when done."""
+        return self._done.wait(timeout)
+
+    def progress(self):
+        """
+        Returns:
+            tuple: (completed stages, total stages, label of the running stage)
+        """
+        return len(self._timings), len(self._stages), self._current
+
+    def result(self, name):
+        """Return the result of a stage, waiting for the pipeline if needed"""
+        self.wait()
+        if self._error is not None:
+            raise RuntimeError(f"Startup failed: {self._error}") from self._error
+        return self._results[name]
+
+    def timings(self):
+        """
+        Startup-timing breakdown in milliseconds.
+
+        Returns:
+            dict: One entry per finished stage plus "total"
+        """
+        breakdown = {name: round(seconds * 1000, 1) for name, seconds in self._timings.items()}
+        if self._finished_at is not None:
+            breakdown["total"] = round((self._finished_at - self._started_at) * 1000, 1)
+        return breakdown
@@ -0,0 +1,173 @@
+# synthetic_data.py
+# Generador determinista de datos sintéticos para pruebas de escala y benchmarks
+#
+# Usage:
+#   python synthetic_data.py --db scale.db --sites 1000 --employees 10000 --density 0.7 [--seed 42] [--replace]
+#
+# --replace es obligatorio si la base ya tiene sitios, empleados o asignaciones: se borran todos
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from database import ConstructionDB
+
+FIRST_NAMES = [
+    "Luis", "Sofía", "Roberto", "Ana", "Carlos", "María", "Juan", "Lucía", "Pedro", "Elena",
+    "Miguel", "Laura", "Javier", "Carmen", "Diego", "Isabel", "Andrés", "Paula", "Fernando", "Marta",
+    "James", "Mary", "John", "Linda", "Robert", "Susan", "Michael", "Karen", "David", "Nancy",
+]
+SURNAMES = [
+    "Fernández", "Martínez", "Díaz", "Gómez", "Pérez", "Ruiz", "López", "Sánchez", "Romero", "Torres",
+    "Navarro", "Domínguez", "Vázquez", "Ramos", "Gil", "Serrano", "Blanco", "Molina", "Morales", "Ortega",
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Wilson", "Anderson", "Taylor",
+]
+CITIES = [
+    "Minnesota", "NYC", "Chicago", "Houston", "Phoenix", "Denver", "Seattle", "Boston", "Miami", "Atlanta",
+    "Madrid", "Sevilla", "Valencia", "Bilbao", "Málaga", "Zaragoza", "Toronto", "Dallas", "Austin", "Portland",
+]
+SITE_TYPES = [
+    "Buildings", "Soccer Camp", "Central Building", "Bridge", "Warehouse", "Hospital Wing",
+    "School", "Parking Garage", "Office Tower", "Residential Block", "Mall", "Stadium",
+]
+
+START_DATE = date(2023, 1, 1)
+
+
+def generate_rows(sites, employees, density, seed=42, active_ratio=0.8):
+    """
+    Deterministic synthetic rows: same arguments => same data.
+
+    Args:
+        sites (int): Number of construction sites
+        employees (int): Number of employees
+        density (float): Fraction of employees assigned to a site (0-1);
+            assignments go to active sites when there are any
+        seed (int): Random seed
+        active_ratio (float): Fraction of sites/employees with status Active
+
+    Returns:
+        tuple: (site_rows, employee_rows, assignment_rows) ready for executemany;
+               assignments use 1-based positions, which are the IDs of a fresh database
+    """
+    rng = random.Random(seed)
+
+    site_rows = []
+    for i in range(sites):
+        name = f"{rng.choice(SITE_TYPES)} {rng.choice(CITIES)} #{i + 1}"
+        manager = f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}"
+        phone = f"555-{rng.randrange(10000):04d}" if rng.random() < 0.9 else None
+        created = (START_DATE + timedelta(days=rng.randrange(730))).isoformat()
+        status = "Active" if rng.random() < active_ratio else "Inactive"
+        site_rows.append((name, manager, phone, created, status))
+
+    employee_rows = []
+    for i in range(employees):
+        created = (START_DATE + timedelta(days=rng.randrange(730))).isoformat()
+        status = "Active" if rng.random() < active_ratio else "Inactive"
+        employee_rows.append((rng.choice(FIRST_NAMES), rng.choice(SURNAMES), f"SS-{100000 + i}", created, status))
+
+    active_site_ids = [i + 1 for i, row in enumerate(site_rows) if row[4] == "Active"] or \
+        list(range(1, sites + 1))
+    assignment_rows = []
+    if active_site_ids:
+        for emp_id in range(1, employees + 1):
+            if rng.random() < density:
+                assigned = (START_DATE + timedelta(days=rng.randrange(730))).isoformat() + " 08:00:00"
+                assignment_rows.append((rng.choice(active_site_ids), emp_id, assigned))
+
+    return site_rows, employee_rows, assignment_rows
+
+
+def existing_rows(db_path):
+    """
+    Rows already stored in db_path (0 when the file or its tables do not exist yet).
+
+    Returns:
+        int: Sites + employees + assignments
+    """
+    if not os.path.exists(db_path):
+        return 0
+    conn = sqlite3.connect(db_path)
+    try:
+        total = 0
+        for table in ("construction_sites", "employees", "assignments"):
+            try:
+                total += conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            except sqlite3.OperationalError:
+                pass  # tabla aún no creada
+        return total
+    finally:
+        conn.close()
+
+
+def populate(db_path, sites, employees, density, seed=42, replace=False):
+    """
+    Replace every site, employee and assignment of db_path with synthetic data.
+
+    Args:
+        replace (bool): Allow deleting the rows of a database that already has data
+
+    Returns:
+        dict: Number of rows inserted per table
+
+    Raises:
+        FileExistsError: db_path already has data and replace is False
+    """
+    if not replace and existing_rows(db_path):
+        raise FileExistsError(f"{db_path} already has data; pass replace=True (--replace) to delete it")
+    ConstructionDB(db_path).close()  # esquema, índices y migraciones
+    site_rows, employee_rows, assignment_rows = generate_rows(sites, employees, density, seed)
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("DELETE FROM assignments")
+        conn.execute("DELETE FROM employees")
+        conn.execute("DELETE FROM construction_sites")
+        # IDs desde 1 para que las posiciones de generate_rows sean los IDs reales
+        conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('assignments', 'employees', 'construction_sites')")
+        conn.executemany(
+            "INSERT INTO construction_sites (name, manager, phone, creation_date, status) VALUES (?, ?, ?, ?, ?)",
+            site_rows
+        )
+        conn.executemany(
+            "INSERT INTO employees (name, surname, employee_id, creation_date, status) VALUES (?, ?, ?, ?, ?)",
+            employee_rows
+        )
+        conn.executemany(
+            "INSERT INTO assignments (site_id, employee_id, assignment_date) VALUES (?, ?, ?)",
+            assignment_rows
+        )
+    conn.execute("ANALYZE")
+    conn.close()
+    return {"sites": len(site_rows), "employees": len(employee_rows), "assignments": len(assignment_rows)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Populate the database with deterministic synthetic data")
+    parser.add_argument("--db", required=True, help="SQLite database file (created if missing)")
+    parser.add_argument("--sites", type=int, default=1000, help="Number of construction sites")
+    parser.add_argument("--employees", type=int, default=10000, help="Number of employees")
+    parser.add_argument("--density", type=float, default=0.7, help="Fraction of employees assigned to a site")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed => same data)")
+    parser.add_argument("--replace", action="store_true",
+                        help="Delete the existing sites, employees and assignments of --db")
+    args = parser.parse_args(argv)
+
+    if not 0 <= args.density <= 1:
+        parser.error("--density must be between 0 and 1")
+
+    try:
+        counts = populate(args.db, args.sites, args.employees, args.density, args.seed, replace=args.replace)
+    except FileExistsError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(f"{args.db}: {counts['sites']} sites, {counts['employees']} employees, "
+          f"{counts['assignments']} assignments (seed {args.seed})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
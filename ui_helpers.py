@@ -2,21 +2,63 @@
 # Reusable UI components for Construction Management System
 import streamlit as st
 from datetime import datetime
+import contextlib
+import functools
+import hashlib
+import html
+import os
+import re
+from collections import OrderedDict
+from string import Template
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")
+
+
+# ========== PLANTILLAS HTML COMPILADAS ==========
+# Los componentes se construyen a partir de plantillas precompiladas (una por
+# esquema de color) y se memorizan por (componente, argumentos): una tarjeta
+# repetida en cada rerun cuesta una búsqueda en el LRU, no ensamblar strings.
+COLOR_SCHEMES = {
+    "blue": {
+        "bg_gradient": "#f0f7ff, #dbeafe",
+        "border_color": "#93c5fd",
+        "value_color": "#1e40af",
+        "accent_color": "#3b82f6"
+    },
+    "green": {
+        "bg_gradient": "#f0fff4, #dcfce7",
+        "border_color": "#86efac",
+        "value_color": "#065f46",
+        "accent_color": "#10b981"
+    },
+    "red": {
+        "bg_gradient": "#FFEBEE, #FFCDD2",
+        "border_color": "#ef9a9a",
+        "value_color": "#C62828",
+        "accent_color": "#ef4444"
+    },
+    "yellow": {
+        "bg_gradient": "#fef3c7, #fde68a",
+        "border_color": "#fcd34d",
+        "value_color": "#92400e",
+        "accent_color": "#f59e0b"
+    },
+    "gray": {
+        "bg_gradient": "#f3f4f6, #e5e7eb",
+        "border_color": "#d1d5db",
+        "value_color": "#374151",
+        "accent_color": "#6b7280"
+    }
+}
 
+MESSAGE_COLORS = {
+    "info": {"bg": "#E3F2FD", "border": "#2196F3", "title": "#0D47A1"},
+    "warning": {"bg": "#FFF3E0", "border": "#FF9800", "title": "#E65100"},
+    "success": {"bg": "#E8F5E9", "border": "#4CAF50", "title": "#1B5E20"},
+    "error": {"bg": "#FFEBEE", "border": "#F44336", "title": "#B71C1C"}
+}
 
-def render_page_header(title, subtitle="", icon="📋"):
-    """
-    Render a professional page header with gradient background.
-
-    Args:
-        title (str): Main header title
-        subtitle (str): Optional subtitle
-        icon (str): Emoji icon for the header
-
-    Returns:
-        str: HTML string for the header
-    """
-    return f"""
+PAGE_HEADER_TEMPLATE = Template("""
     <div style='
         text-align: center;
         margin-bottom: 30px;
@@ -33,7 +75,7 @@ def render_page_header(title, subtitle="", icon="📋"):
             justify-content: center;
             gap: 10px;
         '>
-            {icon} {title}
+            ${icon} ${title}
         </h1>
         <p style='
             color: #1565C0;
@@ -41,71 +83,17 @@ def render_page_header(title, subtitle="", icon="📋"):
             margin: 0;
             font-weight: 500;
         '>
-            {subtitle}
+            ${subtitle}
         </p>
     </div>
-    """
-
-
-def metric_card_simple(value, label, color_scheme="blue", icon=None):
-    """
-    Render a simple metric card with gradient background.
-
-    Args:
-        value (str/int): The main value to display
-        label (str): Label for the metric
-        color_scheme (str): One of "blue", "green", "red", "yellow", "gray"
-        icon (str): Optional emoji icon
-
-    Returns:
-        str: HTML string for the metric card
-    """
-    # Color schemes
-    colors = {
-        "blue": {
-            "bg_gradient": "#f0f7ff, #dbeafe",
-            "border_color": "#93c5fd",
-            "value_color": "#1e40af",
-            "icon_color": "#3b82f6"
-        },
-        "green": {
-            "bg_gradient": "#f0fff4, #dcfce7",
-            "border_color": "#86efac",
-            "value_color": "#065f46",
-            "icon_color": "#10b981"
-        },
-        "red": {
-            "bg_gradient": "#FFEBEE, #FFCDD2",
-            "border_color": "#ef9a9a",
-            "value_color": "#C62828",
-            "icon_color": "#ef4444"
-        },
-        "yellow": {
-            "bg_gradient": "#fef3c7, #fde68a",
-            "border_color": "#fcd34d",
-            "value_color": "#92400e",
-            "icon_color": "#f59e0b"
-        },
-        "gray": {
-            "bg_gradient": "#f3f4f6, #e5e7eb",
-            "border_color": "#d1d5db",
-            "value_color": "#374151",
-            "icon_color": "#6b7280"
-        }
-    }
-
-    # Get color scheme or default to blue
-    scheme = colors.get(color_scheme, colors["blue"])
-
-    # Build the HTML
-    icon_html = f"<div style='font-size: 20px; color: {scheme['icon_color']}; margin-bottom: 5px;'>{icon}</div>" if icon else ""
+    """)
 
-    return f"""
+METRIC_CARD_SOURCE = """
     <div style='
-        background: linear-gradient(135deg, {scheme['bg_gradient']});
+        background: linear-gradient(135deg, ${bg_gradient});
         border-radius: 12px;
         padding: 20px;
-        border: 1px solid {scheme['border_color']};
+        border: 1px solid ${border_color};
         text-align: center;
         height: 120px;
         display: flex;
@@ -113,14 +101,14 @@ def metric_card_simple(value, label, color_scheme="blue", icon=None):
         justify-content: center;
         margin-bottom: 1rem;
     '>
-        {icon_html}
+        ${icon_html}
         <div style='
             font-size: 28px;
             font-weight: 700;
-            color: {scheme['value_color']};
+            color: ${value_color};
             margin: 5px 0;
         '>
-            {value}
+            ${value}
         </div>
         <div style='
             font-size: 12px;
@@ -129,11 +117,144 @@ def metric_card_simple(value, label, color_scheme="blue", icon=None):
             text-transform: uppercase;
             letter-spacing: 0.5px;
         '>
-            {label}
+            ${label}
         </div>
+        ${percentage_html}
     </div>
     """
 
+METRIC_ICON_SOURCE = "<div style='font-size: 20px; color: ${accent_color}; margin-bottom: 5px;'>${icon}</div>"
+
+METRIC_PERCENTAGE_SOURCE = """<div style='
+            font-size: 11px;
+            color: ${accent_color};
+            font-weight: 500;
+            margin-top: 5px;
+        '>
+            ${percentage}
+        </div>"""
+
+INFO_MESSAGE_SOURCE = """
+    <div style='
+        background: ${bg};
+        border-left: 4px solid ${border};
+        padding: 15px;
+        border-radius: 8px;
+        margin: 15px 0;
+    '>
+        <h4 style='color: ${title_color}; margin: 0 0 10px 0;'>${title}</h4>
+        <p style='margin: 0; color: #555; font-size: 14px;'>${message}</p>
+    </div>
+    """
+
+SYSTEM_INFO_TEMPLATE = Template("""
+    <div style='
+        background: #f8f9fa;
+        border-radius: 8px;
+        padding: 10px;
+        margin: 10px 0;
+    '>
+        <div style='display: flex; justify-content: space-between;'>
+            <span style='color: #555; font-size: 13px;'>🕒 Time:</span>
+            <span style='color: #0D47A1; font-weight: 600; font-size: 13px;'>${current_time}</span>
+        </div>
+        <div style='display: flex; justify-content: space-between; margin-top: 5px;'>
+            <span style='color: #555; font-size: 13px;'>📅 Date:</span>
+            <span style='color: #0D47A1; font-weight: 600; font-size: 13px;'>${current_date}</span>
+        </div>
+    </div>
+    """)
+
+
+def _compile_per_scheme(source, schemes):
+    """Substitute the colors of each scheme once and keep one Template per scheme"""
+    return {name: Template(Template(source).safe_substitute(colors)) for name, colors in schemes.items()}
+
+
+METRIC_CARD_TEMPLATES = _compile_per_scheme(METRIC_CARD_SOURCE, COLOR_SCHEMES)
+METRIC_ICON_TEMPLATES = _compile_per_scheme(METRIC_ICON_SOURCE, COLOR_SCHEMES)
+METRIC_PERCENTAGE_TEMPLATES = _compile_per_scheme(METRIC_PERCENTAGE_SOURCE, COLOR_SCHEMES)
+INFO_MESSAGE_TEMPLATES = _compile_per_scheme(
+    INFO_MESSAGE_SOURCE,
+    {name: {"bg": c["bg"], "border": c["border"], "title_color": c["title"]} for name, c in MESSAGE_COLORS.items()}
+)
+
+
+def _escape(value):
+    """Escape user-provided values (site names, employee names...) for HTML"""
+    return html.escape(str(value), quote=True)
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_component(component, args):
+    """
+    Memoized renderer: one entry per (component, args).
+
+    Args:
+        component (str): Component name
+        args (tuple): Hashable arguments of the component
+
+    Returns:
+        str: HTML string
+    """
+    if component == "page_header":
+        title, subtitle, icon = args
+        return PAGE_HEADER_TEMPLATE.substitute(title=_escape(title), subtitle=_escape(subtitle), icon=_escape(icon))
+
+    if component == "metric_card":
+        value, label, color_scheme, icon, percentage = args
+        scheme = color_scheme if color_scheme in COLOR_SCHEMES else "blue"
+        icon_html = METRIC_ICON_TEMPLATES[scheme].substitute(icon=_escape(icon)) if icon else ""
+        percentage_html = (
+            METRIC_PERCENTAGE_TEMPLATES[scheme].substitute(percentage=_escape(percentage))
+            if percentage is not None else ""
+        )
+        return METRIC_CARD_TEMPLATES[scheme].substitute(
+            value=_escape(value), label=_escape(label), icon_html=icon_html, percentage_html=percentage_html
+        )
+
+    if component == "info_message":
+        title, message, message_type = args
+        template = INFO_MESSAGE_TEMPLATES.get(message_type, INFO_MESSAGE_TEMPLATES["info"])
+        return template.substitute(title=_escape(title), message=_escape(message))
+
+    if component == "system_info":
+        current_time, current_date = args
+        return SYSTEM_INFO_TEMPLATE.substitute(current_time=current_time, current_date=current_date)
+
+    raise ValueError(f"Unknown component: {component}")
+
+
+def render_page_header(title, subtitle="", icon="📋"):
+    """
+    Render a professional page header with gradient background.
+
+    Args:
+        title (str): Main header title
+        subtitle (str): Optional subtitle
+        icon (str): Emoji icon for the header
+
+    Returns:
+        str: HTML string for the header
+    """
+    return _render_component("page_header", (title, subtitle, icon))
+
+
+def metric_card_simple(value, label, color_scheme="blue", icon=None):
+    """
+    Render a simple metric card with gradient background.
+
+    Args:
+        value (str/int): The main value to display
+        label (str): Label for the metric
+        color_scheme (str): One of "blue", "green", "red", "yellow", "gray"
+        icon (str): Optional emoji icon
+
+    Returns:
+        str: HTML string for the metric card
+    """
+    return _render_component("metric_card", (value, label, color_scheme, icon, None))
+
 
 def metric_card_with_percentage(value, label, percentage, color_scheme="blue"):
     """
@@ -148,70 +269,7 @@ def metric_card_with_percentage(value, label, percentage, color_scheme="blue"):
     Returns:
         str: HTML string for the metric card
     """
-    # Color schemes
-    colors = {
-        "blue": {
-            "bg_gradient": "#f0f7ff, #dbeafe",
-            "border_color": "#93c5fd",
-            "value_color": "#1e40af",
-            "percentage_color": "#3b82f6"
-        },
-        "green": {
-            "bg_gradient": "#f0fff4, #dcfce7",
-            "border_color": "#86efac",
-            "value_color": "#065f46",
-            "percentage_color": "#10b981"
-        },
-        "yellow": {
-            "bg_gradient": "#fef3c7, #fde68a",
-            "border_color": "#fcd34d",
-            "value_color": "#92400e",
-            "percentage_color": "#f59e0b"
-        }
-    }
-
-    scheme = colors.get(color_scheme, colors["blue"])
-
-    return f"""
-    <div style='
-        background: linear-gradient(135deg, {scheme['bg_gradient']});
-        border-radius: 12px;
-        padding: 20px;
-        border: 1px solid {scheme['border_color']};
-        text-align: center;
-        height: 120px;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-        margin-bottom: 1rem;
-    '>
-        <div style='
-            font-size: 28px;
-            font-weight: 700;
-            color: {scheme['value_color']};
-            margin: 5px 0;
-        '>
-            {value}
-        </div>
-        <div style='
-            font-size: 12px;
-            color: #475569;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        '>
-            {label}
-        </div>
-        <div style='
-            font-size: 11px;
-            color: {scheme['percentage_color']};
-            font-weight: 500;
-            margin-top: 5px;
-        '>
-            {percentage}
-        </div>
-    </div>
-    """
+    return _render_component("metric_card", (value, label, color_scheme, None, percentage))
 
 
 def get_current_date(format="%Y-%m-%d"):
@@ -250,74 +308,79 @@ def get_timestamp_filename():
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 
-def apply_global_styles():
+@functools.lru_cache(maxsize=1)
+def load_stylesheets():
     """
-    Apply minimal global CSS styles that are used across all modules.
-    Call this function at the beginning of each module.
+    Read assets/styles.css once per process and split it into named sheets.
+
+    Returns:
+        dict: {sheet name: (content hash, minified css)}
     """
-    st.markdown("""
-    <style>
-    /* Consistent button styling */
-    .stButton > button {
-        border-radius: 8px !important;
-        padding: 8px 20px !important;
-        font-weight: 600 !important;
-    }
+    with open(STYLESHEET_PATH, encoding="utf-8") as f:
+        source = f.read()
 
-    /* Active tab styling */
-    .stTabs [aria-selected="true"] {
-        background-color: #1E88E5 !important;
-        color: white !important;
-    }
+    sheets = {}
+    parts = re.split(r"/\*\s*@sheet\s+(\w+)[^*]*\*/", source)
+    for name, css in zip(parts[1::2], parts[2::2]):
+        minified = _minify_css(css)
+        sheets[name] = (hashlib.sha1(minified.encode("utf-8")).hexdigest(), minified)
+    return sheets
 
-    /* Consistent tab styling */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
 
-    .stTabs [data-baseweb="tab"] {
-        border-radius: 8px 8px 0 0 !important;
-        padding: 10px 20px !important;
-        font-weight: 600 !important;
-    }
+def _minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
 
-    /* Consistent input styling */
-    .stTextInput input, .stSelectbox select, .stTextArea textarea {
-        border-radius: 8px !important;
-        border: 1px solid #cbd5e1 !important;
-    }
 
-    .stTextInput input:focus, .stSelectbox select:focus, .stTextArea textarea:focus {
-        border-color: #3b82f6 !important;
-        box-shadow: 0 0 0 2px rgba(59, 130, 246, 0.2) !important;
-    }
+def reset_stylesheets():
+    """
+    Start a new rerun for the stylesheet registry.
 
-    /* Consistent metric display */
-    .dataframe-container {
-        border-radius: 10px;
-        overflow: hidden;
-        border: 1px solid #e2e8f0;
-        margin: 20px 0;
-    }
+    Streamlit drops every element that a rerun does not emit again, so each
+    sheet is sent once per rerun (not once per call). Call this at the top
+    of the script before any inject_stylesheet().
+    """
+    st.session_state["_emitted_stylesheets"] = set()
+    st.session_state["_emitted_stylesheet_bytes"] = 0
 
-    /* Success and warning boxes */
-    .success-box {
-        background: #d1fae5;
-        border-left: 5px solid #10b981;
-        padding: 15px;
-        border-radius: 8px;
-        margin: 15px 0;
-    }
 
-    .warning-box {
-        background: #fef3c7;
-        border-left: 5px solid #f59e0b;
-        padding: 15px;
-        border-radius: 8px;
-        margin: 15px 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+def inject_stylesheet(*names):
+    """
+    Emit the named sheets of assets/styles.css in a single <style> block.
+
+    Sheets are deduplicated by content hash: a sheet already emitted during
+    the current rerun is skipped, so modules can declare the styles they
+    need without paying for them twice.
+
+    Args:
+        *names (str): Sheet names, e.g. "global", "kanban"
+    """
+    sheets = load_stylesheets()
+    emitted = st.session_state.setdefault("_emitted_stylesheets", set())
+
+    chunks = []
+    for name in names:
+        digest, css = sheets[name]
+        if digest not in emitted:
+            emitted.add(digest)
+            chunks.append(css)
+
+    if chunks:
+        html = f"<style>{''.join(chunks)}</style>"
+        st.session_state["_emitted_stylesheet_bytes"] = (
+            st.session_state.get("_emitted_stylesheet_bytes", 0) + len(html.encode("utf-8"))
+        )
+        st.markdown(html, unsafe_allow_html=True)
+
+
+def apply_global_styles():
+    """
+    Apply minimal global CSS styles that are used across all modules.
+    Call this function at the beginning of each module.
+    """
+    inject_stylesheet("global")
 
 
 def render_system_info_sidebar():
@@ -327,26 +390,8 @@ def render_system_info_sidebar():
     Returns:
         str: HTML string for system info
     """
-    current_time = datetime.now().strftime('%I:%M %p')
-    current_date = datetime.now().strftime('%d/%m/%Y')
-
-    return f"""
-    <div style='
-        background: #f8f9fa;
-        border-radius: 8px;
-        padding: 10px;
-        margin: 10px 0;
-    '>
-        <div style='display: flex; justify-content: space-between;'>
-            <span style='color: #555; font-size: 13px;'>🕒 Time:</span>
-            <span style='color: #0D47A1; font-weight: 600; font-size: 13px;'>{current_time}</span>
-        </div>
-        <div style='display: flex; justify-content: space-between; margin-top: 5px;'>
-            <span style='color: #555; font-size: 13px;'>📅 Date:</span>
-            <span style='color: #0D47A1; font-weight: 600; font-size: 13px;'>{current_date}</span>
-        </div>
-    </div>
-    """
+    now = datetime.now()
+    return _render_component("system_info", (now.strftime('%I:%M %p'), now.strftime('%d/%m/%Y')))
 
 
 def render_info_message(title, message, message_type="info"):
@@ -361,24 +406,231 @@ def render_info_message(title, message, message_type="info"):
     Returns:
         str: HTML string for the message
     """
-    colors = {
-        "info": {"bg": "#E3F2FD", "border": "#2196F3", "title": "#0D47A1"},
-        "warning": {"bg": "#FFF3E0", "border": "#FF9800", "title": "#E65100"},
-        "success": {"bg": "#E8F5E9", "border": "#4CAF50", "title": "#1B5E20"},
-        "error": {"bg": "#FFEBEE", "border": "#F44336", "title": "#B71C1C"}
+    return _render_component("info_message", (title, message, message_type))
+
+
+def keyset_pager_state(key, signature):
+    """
+    Cursor stack of a keyset-paginated table stored in session_state.
+
+    The stack holds the after_key used to load each visited page, so going
+    back is a pop and going forward pushes the next_key returned by the DB.
+    It is reset whenever the filters (signature) change.
+
+    Args:
+        key (str): session_state key for this table
+        signature (tuple): Current filters, sort and page size
+
+    Returns:
+        list: Cursor stack; the last element is the after_key of the current page
+    """
+    state = st.session_state.get(key)
+    if not state or state["signature"] != signature:
+        state = {"signature": signature, "cursors": [None]}
+        st.session_state[key] = state
+    return state["cursors"]
+
+
+def render_keyset_pager(key, cursors, next_key, total, page_size, shown, noun="records"):
+    """
+    Render Previous/Next controls and the "Showing X-Y of N" caption.
+
+    Args:
+        key (str): session_state key used with keyset_pager_state()
+        cursors (list): Cursor stack returned by keyset_pager_state()
+        next_key (tuple): next_key of the current page (None on the last page)
+        total (int): Exact number of rows matching the filters
+        page_size (int): Rows per page
+        shown (int): Rows on the current page
+        noun (str): What the rows are, for the caption
+    """
+    page_number = len(cursors)
+    first_row = (page_number - 1) * page_size + 1 if shown else 0
+    last_row = (page_number - 1) * page_size + shown
+    total_pages = max(1, -(-total // page_size))
+
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    with prev_col:
+        if st.button("◀ Previous", key=f"{key}_prev", disabled=page_number == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with info_col:
+        st.caption(f"📋 Showing {first_row}-{last_row} of {total} {noun} • Page {page_number} of {total_pages}")
+    with next_col:
+        if st.button("Next ▶", key=f"{key}_next", disabled=next_key is None, use_container_width=True):
+            cursors.append(next_key)
+            st.rerun()
+
+
+# ========== TABLAS CON BADGES DE ESTADO ==========
+STATUS_BADGE_COLORS = {"Active": "#10b981", "Inactive": "#ef4444"}
+
+
+def status_badge_frame(df, column="Status"):
+    """
+    Prepare a DataFrame so its status column renders as colored badges.
+
+    The badges are drawn by the dataframe component from column_config, so
+    no per-cell CSS is computed in Python (unlike Styler.applymap).
+
+    Args:
+        df (pd.DataFrame): Table to display (modified in place)
+        column (str): Name of the status column
+
+    Returns:
+        pd.DataFrame: The same DataFrame
+    """
+    if column in df.columns:
+        df[column] = [[value] if value else [] for value in df[column].tolist()]
+    return df
+
+
+def status_column_config(column="Status"):
+    """
+    column_config for st.dataframe that shows status values as badges.
+
+    Returns:
+        dict: {column: MultiselectColumn}
+    """
+    return {
+        column: st.column_config.MultiselectColumn(
+            column,
+            options=list(STATUS_BADGE_COLORS),
+            color=list(STATUS_BADGE_COLORS.values())
+        )
     }
 
-    color = colors.get(message_type, colors["info"])
 
-    return f"""
-    <div style='
-        background: {color['bg']};
-        border-left: 4px solid {color['border']};
-        padding: 15px;
-        border-radius: 8px;
-        margin: 15px 0;
-    '>
-        <h4 style='color: {color['title']}; margin: 0 0 10px 0;'>{title}</h4>
-        <p style='margin: 0; color: #555; font-size: 14px;'>{message}</p>
-    </div>
-    """
\ No newline at end of file
+# ========== SELECTOR DE REGISTROS (TYPE-AHEAD) ==========
+RECENT_RECORDS_MAX = 8
+
+
+def record_picker(label, key, search_function, load_record, format_label, data_version,
+                  placeholder="Type a name or ID..."):
+    """
+    Type-ahead picker for one record, backed by a limited prefix query.
+
+    Only the matches of the typed prefix reach the browser (never the full
+    ID list). The last RECENT_RECORDS_MAX picked records are kept in a
+    per-session LRU together with the data version they were read at, so
+    picking one again (or rerunning while editing it) skips the DB read
+    until the data changes. They are also offered as default options.
+
+    Args:
+        label (str): Widget label
+        key (str): Widget key (also prefixes the LRU key in session_state)
+        search_function (callable): term -> list of (label, id) tuples
+        load_record (callable): id -> record dict or None
+        format_label (callable): record -> human readable label
+        data_version (int): Current ConstructionDB.data_version()
+        placeholder (str): Placeholder text of the search box
+
+    Returns:
+        dict: Selected record, or None
+    """
+    from streamlit_searchbox import st_searchbox
+
+    recent = st.session_state.setdefault(f"{key}_recent", OrderedDict())
+
+    selected_id = st_searchbox(
+        search_function,
+        placeholder=placeholder,
+        label=label,
+        key=key,
+        default_options=[(entry["label"], record_id) for record_id, entry in reversed(recent.items())]
+    )
+    if selected_id is None:
+        return None
+
+    entry = recent.get(selected_id)
+    if entry is None or entry["version"] != data_version:
+        record = load_record(selected_id)
+        if record is None:
+            recent.pop(selected_id, None)
+            return None
+        entry = {"version": data_version, "record": record, "label": format_label(record)}
+        recent[selected_id] = entry
+
+    recent.move_to_end(selected_id)
+    while len(recent) > RECENT_RECORDS_MAX:
+        recent.popitem(last=False)
+    return entry["record"]
+
+
+# ========== CONCURRENCIA OPTIMISTA (EDICIÓN) ==========
+def editing_version(key, record):
+    """
+    Version of a record when the user started editing it.
+
+    Pass it as expected_version to update_*: if another session saved the
+    record meanwhile the write fails with ConflictError instead of silently
+    overwriting, even if this session re-read the record in between.
+
+    Args:
+        key (str): session_state key that remembers (id, version)
+        record (dict): Record being edited (with "id" and "version")
+
+    Returns:
+        int: Expected version for the compare-and-swap write
+    """
+    base = st.session_state.get(key)
+    if base is None or base[0] != record["id"]:
+        base = (record["id"], record["version"])
+        st.session_state[key] = base
+    return base[1]
+
+
+def render_conflict_message(error, fields, key=None):
+    """
+    Show a ConflictError with the record's current values.
+
+    Args:
+        error (ConflictError): Raised by update_*/delete_*
+        fields (dict): column -> label of the values to show
+        key (str): editing_version key; rebased on the current version so
+            submitting again deliberately overwrites the other change
+    """
+    current = error.current
+    details = "  \n".join(f"**{label}:** {current.get(column) or '—'}" for column, label in fields.items())
+    st.error(
+        "⚠️ **This record was changed by another session** and your change was not applied.  \n"
+        f"Current values (version {current['version']}):  \n{details}"
+    )
+    if key:
+        st.session_state[key] = (current["id"], current["version"])
+        st.info("Review the values and submit again to overwrite them.")
+
+
+# ========== DIAGNÓSTICO (HOOKS POR RERUN) ==========
+@contextlib.contextmanager
+def monitored_rerun(monitor, page):
+    """
+    Wrap one script run: monitor.rerun() for the data layer, plus the size
+    of every element this run sends to the browser (monitor.record_payload).
+
+    Args:
+        monitor (QueryMonitor): Process-wide monitor (instrumentation.monitor)
+        page (str): Page shown in this run
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    with monitor.rerun(page, session=ctx.session_id if ctx else None):
+        if ctx is None or not monitor.enabled:
+            yield
+            return
+
+        enqueue = ctx._enqueue
+
+        def measured_enqueue(msg):
+            # Referencias a mensajes ya cacheados en el navegador no llevan delta
+            if msg.HasField("delta") and msg.delta.HasField("new_element"):
+                monitor.record_payload(msg.delta.new_element.WhichOneof("type"),
+                                       tuple(msg.metadata.delta_path), msg.ByteSize())
+            enqueue(msg)
+
+        ctx._enqueue = measured_enqueue
+        try:
+            yield
+        finally:
+            ctx._enqueue = enqueue